@@ -0,0 +1,160 @@
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from metrics import ADMISSION_REJECTIONS
+from ratelimit import TokenBucket
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-user and global token-bucket quotas in front of an expensive route."""
+
+    def __init__(
+        self,
+        name: str,
+        user_rate: float,
+        user_burst: float,
+        global_rate: float,
+        global_burst: float,
+        max_users: int = 10000,
+    ):
+        self.name = name
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self.global_bucket = TokenBucket(rate=global_rate, capacity=global_burst)
+        self._users: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+
+    def _user_bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = TokenBucket(rate=self.user_rate, capacity=self.user_burst)
+            # Idle users are forgotten first; a forgotten user starts with a full bucket
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return bucket
+
+    def admit(self, user_id: str, cost: float = 1.0):
+        """Take `cost` tokens from the user's and the global bucket, or raise AdmissionRejected."""
+        self.settle(user_id, paid=0, cost=cost)
+        self.admitted += 1
+
+    def settle(self, user_id: str, paid: float, cost: float):
+        """Bring a request admitted at `paid` tokens to its actual `cost`, once that is known.
+
+        The difference is taken (raising AdmissionRejected) or refunded.
+        """
+        user_bucket = self._user_bucket(user_id)
+        # Work bigger than a full bucket is let through when the bucket is full
+        user_cost = min(cost, self.user_burst) - min(paid, self.user_burst)
+        global_cost = min(cost, self.global_bucket.capacity) - min(paid, self.global_bucket.capacity)
+        if user_cost <= 0 and global_cost <= 0:
+            user_bucket.refund(-user_cost)
+            self.global_bucket.refund(-global_cost)
+            return
+
+        if not user_bucket.try_acquire(user_cost):
+            self.rejected["user_quota"] += 1
+            raise AdmissionRejected("user_quota", user_bucket.seconds_until_available(user_cost))
+        if not self.global_bucket.try_acquire(global_cost):
+            user_bucket.refund(user_cost)
+            self.rejected["global_quota"] += 1
+            raise AdmissionRejected("global_quota", self.global_bucket.seconds_until_available(global_cost))
+
+    def record_rejection(self, reason: str):
+        """Count a rejection decided elsewhere, such as a full queue."""
+        self.rejected[reason] += 1
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "tracked_users": len(self._users),
+            "global_tokens": round(self.global_bucket.tokens, 2),
+        }
+
+
+class AdmissionMiddleware:
+    """Applies quotas and queue limits before the request body is read.
+
+    `rules` are (method, path pattern, controller, queue) tuples; `queue` may be
+    None for routes that do not enqueue work. `identify(scope)` returns the
+    caller's user id, or None to leave authentication to the route.
+
+    The charge is refunded when the route rejects the request with a 4xx other
+    than 429, since no work was queued; routes that re-settle a request
+    themselves must do so only once it has passed validation.
+    """
+
+    def __init__(self, app, rules: List[Tuple[str, str, AdmissionController, Any]], identify: Callable[[dict], Optional[str]]):
+        self.app = app
+        self.rules = [(method, re.compile(pattern), controller, queue) for method, pattern, controller, queue in rules]
+        self.identify = identify
+
+    def _check(self, controller: AdmissionController, queue, user_id: str) -> Optional[AdmissionRejected]:
+        # A full queue is reported before any quota is spent
+        if queue is not None and not queue.can_accept(user_id):
+            controller.record_rejection("queue_full")
+            return AdmissionRejected("queue_full", queue.estimated_wait())
+        try:
+            controller.admit(user_id)
+        except AdmissionRejected as rejection:
+            return rejection
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for method, pattern, controller, queue in self.rules:
+                if scope["method"] != method or not pattern.match(scope["path"]):
+                    continue
+                user_id = self.identify(scope)
+                rejection = self._check(controller, queue, user_id) if user_id else None
+                if rejection is not None:
+                    ADMISSION_REJECTIONS.inc(controller.name, rejection.reason)
+                    response = too_many_requests(rejection)
+                    await response(scope, receive, send)
+                    return
+                if user_id:
+                    await self._call_charged(scope, receive, send, controller, user_id)
+                    return
+                break
+        await self.app(scope, receive, send)
+
+    async def _call_charged(self, scope, receive, send, controller: AdmissionController, user_id: str):
+        status = None
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_with_status)
+        if status is not None and 400 <= status < 500 and status != 429:
+            controller.settle(user_id, paid=1, cost=0)
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, min(3600, math.ceil(seconds))))
+
+
+def too_many_requests(rejection: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Too many requests, please retry later", "reason": rejection.reason},
+        status_code=429,
+        headers={"Retry-After": retry_after_header(rejection.retry_after)},
+    )
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Fields copied between a cached analysis and a new DocumentAnalysis
+CACHED_FIELDS = (
+    "document_type",
+    "summary",
+    "key_terms",
+    "calculations",
+    "risk_assessment",
+    "fraud_indicators",
+    "suggested_questions",
+    "unusual_clauses",
+    "rule_findings",
+)
+
+
+class AnalysisCache:
+    """Content-addressed cache of analysis results keyed on (user, sha256, analysis version).
+
+    Entries are per user: a hit shared across users would tell one user that
+    another had uploaded the same document.
+    """
+
+    def __init__(self, collection, version: str, ttl_seconds: int = 30 * 24 * 3600):
+        self.collection = collection
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def index_specs(self) -> List[Dict[str, Any]]:
+        name = self.collection.name
+        return [
+            {"collection": name, "keys": [("user_id", 1), ("content_hash", 1), ("analysis_version", 1)],
+             "name": "user_id_content_hash_version", "unique": True, "replaces": "content_hash_version"},
+            {"collection": name, "keys": [("created_at", 1)],
+             "name": "created_at_ttl", "expireAfterSeconds": self.ttl_seconds},
+        ]
+
+    async def get(self, user_id: str, content_hash: str) -> Optional[Dict[str, Any]]:
+        entry = await self.collection.find_one(
+            {"user_id": user_id, "content_hash": content_hash, "analysis_version": self.version}, {"_id": 0}
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["analysis"]
+
+    async def put(self, user_id: str, content_hash: str, analysis: Dict[str, Any]):
+        payload = {field: analysis.get(field) for field in CACHED_FIELDS}
+        await self.collection.update_one(
+            {"user_id": user_id, "content_hash": content_hash, "analysis_version": self.version},
+            {"$set": {"analysis": payload, "created_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        self.stores += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import mmap
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+GC_BATCH_SIZE = 500
+
+
+class _MappedFile(mmap.mmap):
+    # mmap already reads and seeks like a file; zipfile (docx) also asks for these
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+
+@contextmanager
+def mapped_file(path: Union[str, Path]) -> Iterator[Union[mmap.mmap, bytes]]:
+    """Read-only memory map of a file; the page cache is shared instead of copying into the heap."""
+    with open(path, "rb") as f:
+        # Empty files cannot be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mapped = _MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+class BlobStore:
+    """Content-addressed store of uploaded originals, one file per SHA-256 under root/ab/cd/<sha>.
+
+    Uploads are written to root/tmp and renamed into place, so a blob is
+    either absent or complete. Reference counts live in `collection`, one
+    per Document that points at the blob.
+    """
+
+    def __init__(self, root: Union[str, Path], collection, gc_grace_seconds: int = 3600):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+        self.trash_dir = self.root / "trash"
+        self.collection = collection
+        self.gc_grace_seconds = gc_grace_seconds
+        self.stored = 0
+        self.deduplicated = 0
+
+    def prepare(self):
+        """Create the working directories; called at startup rather than on import."""
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.trash_dir.mkdir(parents=True, exist_ok=True)
+
+    def index_specs(self) -> List[Dict[str, Any]]:
+        name = self.collection.name
+        return [
+            {"collection": name, "keys": [("sha256", 1)], "name": "sha256_unique", "unique": True},
+            {"collection": name, "keys": [("refcount", 1), ("updated_at", 1)], "name": "refcount_updated_at"},
+        ]
+
+    def path_for(self, sha256: str) -> Path:
+        if not SHA256_PATTERN.match(sha256):
+            raise ValueError(f"Not a SHA-256 hex digest: {sha256!r}")
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def _commit(self, temp_path: str, sha256: str) -> bool:
+        final = self.path_for(sha256)
+        if final.exists():
+            os.unlink(temp_path)
+            return False
+        final.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, final)
+        return True
+
+    async def add(self, temp_path: str, sha256: str, size: int) -> str:
+        """Take a reference and move a fully written temp file into place. Returns the blob path."""
+        now = datetime.now(timezone.utc)
+        # Reference first, so a concurrent sweep cannot collect the blob underneath us
+        await self.collection.update_one(
+            {"sha256": sha256},
+            {"$inc": {"refcount": 1}, "$set": {"size": size, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+            upsert=True,
+        )
+        if await asyncio.to_thread(self._commit, temp_path, sha256):
+            self.stored += 1
+        else:
+            self.deduplicated += 1
+        return str(self.path_for(sha256))
+
+    async def release(self, sha256: str):
+        """Drop one reference; the blob is removed by the next sweep once unreferenced."""
+        await self.collection.update_one(
+            {"sha256": sha256},
+            {"$inc": {"refcount": -1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        )
+
+    def _trash(self, sha256: str) -> Optional[Path]:
+        trashed = self.trash_dir / f"{sha256}.{uuid.uuid4().hex}"
+        try:
+            os.replace(self.path_for(sha256), trashed)
+        except FileNotFoundError:
+            return None
+        return trashed
+
+    def _stale_files(self) -> Dict[str, List[Path]]:
+        cutoff = time.time() - self.gc_grace_seconds
+        found: Dict[str, List[Path]] = {"blobs": [], "tmp": [], "trash": []}
+        for directory in (self.tmp_dir, self.trash_dir):
+            for path in directory.iterdir():
+                if path.is_file() and path.stat().st_mtime < cutoff:
+                    found[directory.name].append(path)
+        for path in self.root.glob("??/??/*"):
+            if SHA256_PATTERN.match(path.name) and path.stat().st_mtime < cutoff:
+                found["blobs"].append(path)
+        return found
+
+    async def collect_garbage(self) -> Dict[str, int]:
+        """Delete unreferenced blobs, blobs with no record, and abandoned temp files."""
+        report = {"collected": 0, "orphans": 0, "abandoned_uploads": 0, "bytes_freed": 0, "kept": 0}
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.gc_grace_seconds)
+
+        async for record in self.collection.find(
+            {"refcount": {"$lte": 0}, "updated_at": {"$lt": cutoff}}, {"_id": 0, "sha256": 1, "size": 1}
+        ):
+            sha256 = record["sha256"]
+            # Move the file aside before dropping the record; an upload racing the sweep
+            # either bumps the refcount first (and the file is restored) or writes a fresh copy
+            trashed = await asyncio.to_thread(self._trash, sha256)
+            result = await self.collection.delete_one(
+                {"sha256": sha256, "refcount": {"$lte": 0}, "updated_at": {"$lt": cutoff}}
+            )
+            if trashed is None:
+                continue
+            if result.deleted_count:
+                await asyncio.to_thread(os.unlink, trashed)
+                report["collected"] += 1
+                report["bytes_freed"] += record.get("size", 0)
+            else:
+                await asyncio.to_thread(os.replace, trashed, self.path_for(sha256))
+                report["kept"] += 1
+
+        stale = await asyncio.to_thread(self._stale_files)
+        for path in stale["tmp"] + stale["trash"]:
+            report["bytes_freed"] += path.stat().st_size
+            path.unlink(missing_ok=True)
+            report["abandoned_uploads"] += 1
+
+        # Files with no record at all, e.g. after a crash between write and insert
+        candidates = stale["blobs"]
+        for start in range(0, len(candidates), GC_BATCH_SIZE):
+            batch = {path.name: path for path in candidates[start:start + GC_BATCH_SIZE]}
+            known = await self.collection.distinct("sha256", {"sha256": {"$in": list(batch)}})
+            for sha256 in set(batch) - set(known):
+                report["bytes_freed"] += batch[sha256].stat().st_size
+                batch[sha256].unlink(missing_ok=True)
+                report["orphans"] += 1
+
+        logger.info(f"Blob sweep: {report}")
+        return report
+
+    def stats(self) -> dict:
+        return {"root": str(self.root), "stored": self.stored, "deduplicated": self.deduplicated}
@@ -0,0 +1,112 @@
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List
+
+# Lines that open a new section: "ARTICLE IV", "Section 12.", "3.1 Payment", "TERMINATION"
+SECTION_HEADING = re.compile(
+    r"^\s*(?:"
+    r"(?i:article|section|clause|schedule|exhibit)\s+[\dIVXLC]+[.:)]?"
+    r"|\d+(?:\.\d+)*[.)]?\s+[A-Z]"
+    r"|[A-Z][A-Z0-9 ,&'/-]{2,79}$"
+    r")",
+    re.MULTILINE,
+)
+
+RISK_LEVELS = ["low", "medium", "high"]
+MAX_SUGGESTED_QUESTIONS = 7
+
+
+def split_sections(text: str) -> List[str]:
+    """Split text at section headings; text before the first heading is its own section."""
+    starts = sorted({match.start() for match in SECTION_HEADING.finditer(text)} | {0})
+    sections = [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+    return [section for section in sections if section.strip()]
+
+
+def _split_oversize(section: str, max_chars: int) -> List[str]:
+    pieces, current = [], ""
+    for paragraph in re.split(r"(\n\s*\n)", section):
+        if len(current) + len(paragraph) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        while len(paragraph) > max_chars:
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        current += paragraph
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """Pack whole sections into chunks of at most max_chars, splitting only oversize sections."""
+    chunks, current = [], ""
+    for section in split_sections(text):
+        if len(section) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_oversize(section, max_chars))
+        elif len(current) + len(section) > max_chars:
+            chunks.append(current)
+            current = section
+        else:
+            current += section
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def _unique(items: Iterable[Any], key=lambda item: str(item).strip().lower()) -> List[Any]:
+    seen, result = set(), []
+    for item in items:
+        marker = key(item)
+        if marker and marker not in seen:
+            seen.add(marker)
+            result.append(item)
+    return result
+
+
+def _risk_rank(level: Any) -> int:
+    level = str(level or "").lower()
+    return RISK_LEVELS.index(level) if level in RISK_LEVELS else -1
+
+
+def merge_analyses(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Reduce per-chunk analyses into one analysis payload."""
+    if len(partials) == 1:
+        return partials[0]
+
+    types = Counter(
+        p.get("document_type") for p in partials if p.get("document_type") not in (None, "", "unknown")
+    )
+    risks = [p.get("risk_assessment") or {} for p in partials]
+    calculations = [p.get("calculations") or {} for p in partials]
+    overall_risk = max((r.get("overall_risk") for r in risks), key=_risk_rank, default="medium")
+
+    return {
+        "document_type": types.most_common(1)[0][0] if types else "unknown",
+        "summary": "\n\n".join(str(p["summary"]).strip() for p in partials if p.get("summary")),
+        "key_terms": _unique(
+            (term for p in partials for term in p.get("key_terms") or [] if isinstance(term, dict)),
+            key=lambda term: str(term.get("term", "")).strip().lower(),
+        ),
+        "calculations": {
+            "has_calculations": any(c.get("has_calculations") for c in calculations),
+            "financial_details": _unique(
+                (detail for c in calculations for detail in c.get("financial_details") or []
+                 if isinstance(detail, dict)),
+                key=lambda detail: f"{detail.get('type')}|{detail.get('amount')}".lower(),
+            ),
+        },
+        "risk_assessment": {
+            "overall_risk": overall_risk if _risk_rank(overall_risk) >= 0 else "medium",
+            "risk_factors": _unique(f for r in risks for f in r.get("risk_factors") or []),
+            "recommendations": _unique(f for r in risks for f in r.get("recommendations") or []),
+        },
+        "fraud_indicators": _unique(i for p in partials for i in p.get("fraud_indicators") or []),
+        "unusual_clauses": _unique(c for p in partials for c in p.get("unusual_clauses") or []),
+        "suggested_questions": _unique(
+            q for p in partials for q in p.get("suggested_questions") or []
+        )[:MAX_SUGGESTED_QUESTIONS],
+    }
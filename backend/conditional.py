@@ -0,0 +1,82 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag over the values a response body is derived from."""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in candidates)
+
+
+def render_json(content: Any) -> bytes:
+    """Serialize like FastAPI's default JSONResponse."""
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def json_body_response(body: bytes, etag: str, cache_control: str) -> Response:
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+class SerializedBodyCache:
+    """LRU of rendered response bodies keyed on (key, version)."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[Any, bytes]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str, version: Any) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        # A version mismatch means another process changed the document
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, version: Any, body: bytes):
+        self._entries[key] = (version, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
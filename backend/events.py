@@ -0,0 +1,47 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Any, Dict, Set
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class StatusBroker:
+    """Fans out per-user events to the SSE connections of this process."""
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: Dict[str, Any]):
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                # A slow client loses its oldest event rather than blocking publishers
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+        self.published += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
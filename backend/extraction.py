@@ -0,0 +1,104 @@
+import re
+import unicodedata
+from typing import Any, Dict, List
+
+from blob_store import mapped_file
+from chunking import SECTION_HEADING
+
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TEXT_TYPE = "text/plain"
+
+PAGE_SEPARATOR = "\n\n"
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\x00", "")
+    # Re-join words hyphenated across line breaks
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    text = re.sub(r"[ \t\f\v]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+# Readers take a memory-mapped file, which supports the read/seek/tell the parsers need
+def _read_pdf_pages(data) -> List[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ExtractionError("pypdf is required for PDF extraction")
+    reader = PdfReader(data)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def _read_docx_pages(data) -> List[str]:
+    try:
+        import docx
+    except ImportError:
+        raise ExtractionError("python-docx is required for DOCX extraction")
+    document = docx.Document(data)
+    paragraphs = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        for row in table.rows:
+            paragraphs.append(" | ".join(cell.text for cell in row.cells))
+    # DOCX has no fixed pagination; the whole body is one page
+    return ["\n".join(paragraphs)]
+
+
+def _read_text_pages(data) -> List[str]:
+    # Decoding the mapping directly avoids an intermediate bytes copy
+    raw = memoryview(data)
+    try:
+        return [str(raw, "utf-8")]
+    except UnicodeDecodeError:
+        return [str(raw, "latin-1")]
+    finally:
+        raw.release()
+
+
+READERS = {
+    PDF_TYPE: _read_pdf_pages,
+    DOCX_TYPE: _read_docx_pages,
+    TEXT_TYPE: _read_text_pages,
+}
+
+
+def find_sections(text: str) -> List[Dict[str, Any]]:
+    starts = [match.start() for match in SECTION_HEADING.finditer(text)]
+    sections = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else len(text)
+        title = text[start:end].lstrip().split("\n", 1)[0][:120]
+        sections.append({"title": title, "start": start, "end": end})
+    return sections
+
+
+def extract_text(file_path: str, content_type: str) -> Dict[str, Any]:
+    """Normalized text with page and section character offsets.
+
+    Runs in a worker process, so it only takes and returns plain data.
+    """
+    reader = READERS.get(content_type)
+    if reader is None:
+        raise ExtractionError(f"Unsupported content type: {content_type}")
+
+    with mapped_file(file_path) as data:
+        raw_pages = reader(data)
+
+    parts, pages, offset = [], [], 0
+    for number, page_text in enumerate(raw_pages, start=1):
+        page_text = normalize_text(page_text)
+        if parts:
+            offset += len(PAGE_SEPARATOR)
+        pages.append({"page": number, "start": offset, "end": offset + len(page_text)})
+        parts.append(page_text)
+        offset += len(page_text)
+
+    text = PAGE_SEPARATOR.join(parts)
+    return {"text": text, "pages": pages, "sections": find_sections(text), "char_count": len(text)}
@@ -0,0 +1,200 @@
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+AMOUNT = r"\$\s?(\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)"
+PERCENT = r"(\d{1,2}(?:\.\d{1,4})?)\s?%"
+
+RATE_PATTERN = re.compile(
+    r"(?:interest\s+rate|annual\s+percentage\s+rate|\bAPR\b|rate\s+of\s+interest|interest)"
+    r"[^%.;\n]{0,60}?" + PERCENT,
+    re.IGNORECASE,
+)
+PRINCIPAL_PATTERN = re.compile(
+    r"(?:principal(?:\s+(?:amount|sum|balance))?|loan\s+amount|amount\s+financed|sum\s+of|borrow(?:s|ed)?)"
+    r"[^$\n]{0,60}?" + AMOUNT,
+    re.IGNORECASE,
+)
+TERM_PATTERN = re.compile(
+    r"(?:term|period|payable\s+over|repaid\s+over|amortized\s+over|for\s+a\s+period\s+of)"
+    r"[^\d\n]{0,40}?(\d{1,3})\s*(months?|years?)",
+    re.IGNORECASE,
+)
+PAYMENT_COUNT_PATTERN = re.compile(r"(\d{1,3})\s+(?:equal\s+)?(?:consecutive\s+)?monthly\s+(?:payments|installments)", re.IGNORECASE)
+FEE_PATTERN = re.compile(
+    r"((?:origination|processing|application|closing|documentation|underwriting|broker(?:age)?|"
+    r"administration|admin|service|prepaid\s+finance)\s+(?:fee|charge)s?)"
+    r"[^$%\n]{0,40}?(?:" + AMOUNT + r"|" + PERCENT + r")",
+    re.IGNORECASE,
+)
+
+
+def _money(value: str) -> float:
+    return float(value.replace(",", ""))
+
+
+def extract_loan_terms(text: str) -> Optional[Dict[str, Any]]:
+    """Principal, annual rate, term and upfront fees stated in the text, or None if incomplete."""
+    rate = RATE_PATTERN.search(text)
+    principal = PRINCIPAL_PATTERN.search(text)
+    term = TERM_PATTERN.search(text)
+    if term:
+        months = int(term.group(1)) * (12 if term.group(2).lower().startswith("year") else 1)
+    else:
+        payments = PAYMENT_COUNT_PATTERN.search(text)
+        months = int(payments.group(1)) if payments else None
+    if not (rate and principal and months):
+        return None
+
+    principal_amount = _money(principal.group(1))
+    fees = []
+    for match in FEE_PATTERN.finditer(text):
+        name = " ".join(match.group(1).lower().split())
+        if match.group(2):
+            amount = _money(match.group(2))
+        else:
+            amount = principal_amount * float(match.group(3)) / 100
+        fees.append({"name": name, "amount": round(amount, 2)})
+
+    return {
+        "principal": principal_amount,
+        "annual_rate": float(rate.group(1)),
+        "term_months": months,
+        "fees": fees,
+    }
+
+
+def _payment(principal, monthly_rate, months):
+    growth = np.power(1 + monthly_rate, months)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amortizing = principal * monthly_rate * growth / (growth - 1)
+    return np.where(monthly_rate == 0, principal / months, amortizing)
+
+
+def _solve_monthly_rate(net_principal, payment, months, guess, iterations: int = 50):
+    """Newton's method on PV(rate) = net_principal, run on every scenario at once."""
+    rate = np.maximum(guess, 1e-6)
+    for _ in range(iterations):
+        growth = np.power(1 + rate, -months)
+        present_value = payment * (1 - growth) / rate
+        derivative = payment * (months * growth / (1 + rate) - (1 - growth) / rate) / rate
+        step = (present_value - net_principal) / derivative
+        rate = np.maximum(rate - step, 1e-9)
+        if np.all(np.abs(step) < 1e-12):
+            break
+    return rate
+
+
+def compute_scenarios(principal, annual_rate, term_months, fees=0.0) -> Dict[str, np.ndarray]:
+    """Payment, interest, cost and APR for every broadcast combination of the inputs."""
+    principal, annual_rate, term_months, fees = np.broadcast_arrays(
+        np.asarray(principal, dtype=float),
+        np.asarray(annual_rate, dtype=float),
+        np.asarray(term_months, dtype=float),
+        np.asarray(fees, dtype=float),
+    )
+    monthly_rate = annual_rate / 1200
+    payment = _payment(principal, monthly_rate, term_months)
+    total_paid = payment * term_months
+    total_interest = total_paid - principal
+
+    # APR treats upfront fees as reducing the amount actually received
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        apr_monthly = _solve_monthly_rate(principal - fees, payment, term_months, monthly_rate)
+    apr = np.where(fees > 0, apr_monthly * 1200, annual_rate)
+    # No rate makes the payments worth a non-positive amount received, so the APR is undefined
+    apr = np.where((fees < principal) & np.isfinite(apr), apr, np.nan)
+
+    return {
+        "principal": principal,
+        "annual_rate": annual_rate,
+        "term_months": term_months,
+        "fees": fees,
+        "monthly_payment": payment,
+        "total_interest": total_interest,
+        "total_cost": total_interest + fees,
+        "total_paid": total_paid + fees,
+        "apr": apr,
+    }
+
+
+def amortization_schedule(principal: float, annual_rate: float, term_months: int) -> List[Dict[str, float]]:
+    monthly_rate = annual_rate / 1200
+    payment = float(_payment(np.float64(principal), np.float64(monthly_rate), term_months))
+    periods = np.arange(1, term_months + 1)
+    growth = np.power(1 + monthly_rate, periods)
+    if monthly_rate == 0:
+        balance = principal - payment * periods
+    else:
+        balance = principal * growth - payment * (growth - 1) / monthly_rate
+    balance = np.maximum(balance, 0)
+    opening = np.concatenate(([principal], balance[:-1]))
+    interest = opening * monthly_rate
+    principal_paid = payment - interest
+
+    rows = np.column_stack((periods, np.full(term_months, payment), interest, principal_paid, balance))
+    rows = np.round(rows, 2)
+    return [
+        {"period": int(row[0]), "payment": row[1], "interest": row[2], "principal": row[3], "balance": row[4]}
+        for row in rows.tolist()
+    ]
+
+
+def _format_money(amount: float) -> str:
+    return f"${amount:,.2f}"
+
+
+def analyze_financials(text: str) -> Optional[Dict[str, Any]]:
+    """Deterministic `calculations` block for DocumentAnalysis, or None when no loan terms are found."""
+    terms = extract_loan_terms(text)
+    if terms is None:
+        return None
+
+    total_fees = sum(fee["amount"] for fee in terms["fees"])
+    result = {key: float(value) for key, value in compute_scenarios(
+        terms["principal"], terms["annual_rate"], terms["term_months"], total_fees
+    ).items()}
+    # Stored analyses are served with allow_nan=False, so only finite figures are kept
+    apr = result.pop("apr")
+    apr = round(apr, 3) if math.isfinite(apr) else None
+    if not all(math.isfinite(value) for value in result.values()):
+        return None
+
+    details = [
+        {"type": "principal", "amount": _format_money(terms["principal"]),
+         "explanation": "Amount borrowed"},
+        {"type": "interest_rate", "amount": f"{terms['annual_rate']:g}%",
+         "explanation": "Stated annual interest rate"},
+        {"type": "payment", "amount": _format_money(result["monthly_payment"]),
+         "explanation": f"Monthly payment over {terms['term_months']} months"},
+        {"type": "total_interest", "amount": _format_money(result["total_interest"]),
+         "explanation": "Interest paid over the full term"},
+    ]
+    details += [
+        {"type": "fee", "amount": _format_money(fee["amount"]), "explanation": fee["name"].capitalize()}
+        for fee in terms["fees"]
+    ]
+    if apr is not None:
+        details.append({"type": "apr", "amount": f"{apr:.3f}%",
+                        "explanation": "Annual percentage rate including upfront fees"})
+    details += [
+        {"type": "total_cost", "amount": _format_money(result["total_cost"]),
+         "explanation": "Total cost of credit: interest plus fees"},
+    ]
+
+    return {
+        "has_calculations": True,
+        "source": "local",
+        "inputs": terms,
+        "monthly_payment": round(result["monthly_payment"], 2),
+        "total_interest": round(result["total_interest"], 2),
+        "total_fees": round(total_fees, 2),
+        "total_cost": round(result["total_cost"], 2),
+        "apr": apr,
+        "financial_details": details,
+        "amortization_schedule": amortization_schedule(
+            terms["principal"], terms["annual_rate"], terms["term_months"]
+        ),
+    }
@@ -0,0 +1,125 @@
+import logging
+from typing import Any, Dict, List
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Mongo error code for an existing index with the same name but different options
+INDEX_OPTIONS_CONFLICT = 85
+
+# One entry per index backing a query in server.py
+INDEX_SPECS: List[Dict[str, Any]] = [
+    # register/login: users.find_one({"email"})
+    {"collection": "users", "keys": [("email", 1)], "name": "email_unique", "unique": True},
+    {"collection": "users", "keys": [("id", 1)], "name": "id_unique", "unique": True},
+    # GET /documents: keyset pages over (uploaded_at, id), newest first
+    {"collection": "documents", "keys": [("user_id", 1), ("uploaded_at", -1), ("id", -1)],
+     "name": "user_id_uploaded_at_id"},
+    # ownership checks: documents.find_one({"id", "user_id"})
+    {"collection": "documents", "keys": [("id", 1)], "name": "id_unique", "unique": True},
+    # batch status: $lookup from document_batches into documents on batch_id
+    {"collection": "documents", "keys": [("batch_id", 1)], "name": "batch_id", "sparse": True},
+    # stalled analysis recovery: documents left pending/analyzing
+    {"collection": "documents", "keys": [("analysis_status", 1), ("status_updated_at", 1)],
+     "name": "analysis_status_status_updated_at"},
+    {"collection": "document_batches", "keys": [("id", 1)], "name": "id_unique", "unique": True},
+    # $lookup from documents into document_analyses on document_id; one analysis per document
+    {"collection": "document_analyses", "keys": [("document_id", 1)], "name": "document_id_unique", "unique": True,
+     "replaces": "document_id"},
+    {"collection": "document_analyses", "keys": [("id", 1)], "name": "id_unique", "unique": True},
+    # memoized replies: newest letter for (document, analysis, responses hash)
+    {"collection": "reply_letters",
+     "keys": [("document_id", 1), ("analysis_id", 1), ("responses_hash", 1), ("created_at", -1)],
+     "name": "document_analysis_responses_created_at"},
+    # extracted text reused by re-analysis, search and replies
+    {"collection": "document_texts", "keys": [("document_id", 1)], "name": "document_id_unique", "unique": True},
+    # near-duplicate candidates: multikey over the LSH band keys, scoped to the owner
+    {"collection": "document_texts", "keys": [("user_id", 1), ("lsh_bands", 1)], "name": "user_id_lsh_bands"},
+]
+
+
+async def ensure_indexes(db, specs: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Create any missing indexes. Safe to run on every startup."""
+    report = {"created": [], "existing": [], "updated": [], "failed": []}
+    existing_by_collection: Dict[str, Dict[str, Any]] = {}
+
+    for spec in specs:
+        options = {k: v for k, v in spec.items() if k not in ("collection", "keys", "replaces")}
+        collection = db[spec["collection"]]
+        label = f"{spec['collection']}.{spec['name']}"
+
+        if spec["collection"] not in existing_by_collection:
+            existing_by_collection[spec["collection"]] = await collection.index_information()
+        existing = existing_by_collection[spec["collection"]]
+
+        # An index on the same keys under its old name would conflict with the new one
+        replaced = spec.get("replaces")
+        if replaced and replaced in existing and spec["name"] not in existing:
+            await collection.drop_index(replaced)
+            del existing[replaced]
+
+        try:
+            await collection.create_index(spec["keys"], **options)
+        except OperationFailure as e:
+            if e.code == INDEX_OPTIONS_CONFLICT and "expireAfterSeconds" in options:
+                # TTL changed; collMod updates it in place without a rebuild
+                await db.command(
+                    "collMod",
+                    spec["collection"],
+                    index={"name": spec["name"], "expireAfterSeconds": options["expireAfterSeconds"]},
+                )
+                report["updated"].append(label)
+            else:
+                logger.error(f"Could not create index {label}: {e}")
+                report["failed"].append(label)
+            continue
+
+        if spec["name"] in existing:
+            report["existing"].append(label)
+        else:
+            report["created"].append(label)
+
+    if report["created"] or report["updated"]:
+        logger.info(f"Indexes created: {report['created']}, updated: {report['updated']}")
+    if report["failed"]:
+        logger.error(f"Indexes failed: {report['failed']}")
+    return report
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage", "")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def _winning_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    planner = explain.get("queryPlanner", {})
+    plan = planner.get("winningPlan", {})
+    # Slot-based engine nests the classic plan under queryPlan
+    return plan.get("queryPlan", plan)
+
+
+async def explain_route_queries(db) -> Dict[str, List[str]]:
+    """Explain each route's query and return the stages of its winning plan."""
+    sample_user = "explain-user"
+    sample_document = "explain-document"
+    queries = {
+        "login": db.users.find({"email": "explain@example.com"}).limit(1),
+        "list_documents": db.documents.find({"user_id": sample_user})
+        .sort([("uploaded_at", -1), ("id", -1)]).limit(51),
+        "document_ownership": db.documents.find({"id": sample_document, "user_id": sample_user}).limit(1),
+        "document_analysis": db.document_analyses.find({"document_id": sample_document}).limit(1),
+        "bulk_document_ownership": db.documents.find({"id": {"$in": [sample_document]}, "user_id": sample_user}),
+    }
+    plans = {}
+    for route, cursor in queries.items():
+        explain = await cursor.explain()
+        stages = _plan_stages(_winning_plan(explain))
+        plans[route] = stages
+        if "COLLSCAN" in stages:
+            logger.warning(f"Query for {route} is not using an index: {stages}")
+    return plans
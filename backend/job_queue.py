@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lane of the job a worker is running, for code that shares resources per lane
+current_lane: ContextVar[Any] = ContextVar("current_lane", default=None)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    """In-process job queue served by a fixed number of worker tasks.
+
+    Jobs are queued in lanes (one per user) and workers take from the lanes
+    round-robin, so a burst from one lane does not delay every other lane.
+    """
+
+    def __init__(self, workers: int = 4, max_depth: int = 100, name: str = "jobs", max_per_lane: Optional[int] = None):
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.max_per_lane = max(1, max_per_lane or self.max_depth)
+        self.name = name
+        self._lanes: "OrderedDict[Any, deque]" = OrderedDict()
+        # Queued weight per lane, which max_per_lane applies to
+        self._lane_depth: Dict[Any, int] = {}
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._depth = 0
+        self._unfinished = 0
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.average_job_seconds: Optional[float] = None
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._ready = asyncio.Semaphore(0)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._accepting = True
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} {self.name} workers (max depth {self.max_depth})")
+
+    def _weight(self, weight: int) -> int:
+        # A job heavier than the whole lane still fits in an empty queue
+        return max(1, min(weight, self.max_per_lane, self.max_depth))
+
+    def submit(self, func: Callable[..., Awaitable[Any]], *args, lane: Any = None, weight: int = 1, **kwargs):
+        """Enqueue a coroutine function without waiting. Raises QueueFullError when saturated.
+
+        `weight` is how many queue slots the job takes, e.g. one per file of a batch.
+        """
+        if not self._accepting or self._ready is None:
+            raise QueueFullError(f"{self.name} queue is not accepting jobs")
+        weight = self._weight(weight)
+        if self._depth + weight > self.max_depth:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name} queue is full")
+        if self._lane_depth.get(lane, 0) + weight > self.max_per_lane:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name} queue is full for this lane")
+        queue = self._lanes.get(lane)
+        if queue is None:
+            queue = self._lanes[lane] = deque()
+        queue.append((func, args, kwargs, weight))
+        self._lane_depth[lane] = self._lane_depth.get(lane, 0) + weight
+        self._depth += weight
+        self._unfinished += 1
+        self._idle.clear()
+        self._ready.release()
+        self.submitted += 1
+
+    def can_accept(self, lane: Any = None, weight: int = 1) -> bool:
+        weight = self._weight(weight)
+        return (
+            self._accepting
+            and self._depth + weight <= self.max_depth
+            and self._lane_depth.get(lane, 0) + weight <= self.max_per_lane
+        )
+
+    def estimated_wait(self) -> float:
+        """Rough seconds until a newly queued job would start."""
+        average = self.average_job_seconds or 1.0
+        return self._depth / self.workers * average
+
+    def _next_job(self):
+        # Oldest lane first; a lane with more work goes to the back of the rotation
+        lane, queue = next(iter(self._lanes.items()))
+        func, args, kwargs, weight = queue.popleft()
+        if queue:
+            self._lanes.move_to_end(lane)
+            self._lane_depth[lane] -= weight
+        else:
+            del self._lanes[lane]
+            del self._lane_depth[lane]
+        self._depth -= weight
+        return lane, (func, args, kwargs)
+
+    async def _worker(self, index: int):
+        while True:
+            await self._ready.acquire()
+            lane, (func, args, kwargs) = self._next_job()
+            token = current_lane.set(lane)
+            started_at = time.monotonic()
+            try:
+                await func(*args, **kwargs)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"{self.name} job failed: {e}")
+            finally:
+                current_lane.reset(token)
+                elapsed = time.monotonic() - started_at
+                if self.average_job_seconds is None:
+                    self.average_job_seconds = elapsed
+                else:
+                    self.average_job_seconds = 0.9 * self.average_job_seconds + 0.1 * elapsed
+                self._unfinished -= 1
+                if self._unfinished == 0:
+                    self._idle.set()
+
+    async def drain(self, timeout: float = 30.0):
+        """Stop accepting jobs, wait for queued work to finish, then stop the workers."""
+        self._accepting = False
+        if self._idle is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"{self.name} queue drain timed out with {self.depth} jobs pending")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "max_per_lane": self.max_per_lane,
+            "depth": self.depth,
+            "lanes": len(self._lanes),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "average_job_seconds": round(self.average_job_seconds or 0.0, 3),
+        }
@@ -0,0 +1,104 @@
+import asyncio
+import importlib
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class LazyModule:
+    """Module imported on first attribute access, for dependencies that are slow to import."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+
+class MongoConnection:
+    """Motor client created on first use from the MONGO_URL and DB_NAME environment variables."""
+
+    def __init__(self, client_options: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.client_options = client_options or dict
+        self._client = None
+        self._database = None
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Imported here so a patched client class (tests, benchmarks) is picked up
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self._client = AsyncIOMotorClient(os.environ['MONGO_URL'], **self.client_options())
+        return self._client
+
+    @property
+    def database(self):
+        if self._database is None:
+            self._database = self.client[os.environ['DB_NAME']]
+        return self._database
+
+    async def ping(self, timeout: float) -> float:
+        """Round trip in seconds; raises if the server does not answer within `timeout`."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.wait_for(self.database.command("ping"), timeout=timeout)
+        return loop.time() - started
+
+    async def warm(self, connections: int, timeout: float):
+        # Concurrent pings each need their own socket, so the pool opens `connections` of them
+        await asyncio.gather(*(self.ping(timeout) for _ in range(max(1, connections))))
+
+    def close(self):
+        # The client reconnects if it is used again, as a closed AsyncIOMotorClient does
+        if self._client is not None:
+            self._client.close()
+
+
+class LazyCollection:
+    """Stands in for a collection until the client exists; `name` is known without connecting."""
+
+    def __init__(self, connection: MongoConnection, name: str):
+        self._connection = connection
+        self.name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._connection.database[self.name], attr)
+
+
+class LazyDatabase:
+    """`db.<collection>` and `db[<collection>]` without connecting at import time."""
+
+    def __init__(self, connection: MongoConnection):
+        self._connection = connection
+        self._collections: Dict[str, LazyCollection] = {}
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = LazyCollection(self._connection, name)
+        return collection
+
+    def __getattr__(self, name: str) -> LazyCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, *args, **kwargs):
+        return await self._connection.database.command(*args, **kwargs)
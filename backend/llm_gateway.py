@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from metrics import LLM_CALL_DURATION, LLM_PROMPT_SIZE, LLM_RESPONSE_SIZE
+from ratelimit import FairSemaphore, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses of provider errors that are worth retrying
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504, 529})
+
+# Provider SDK exception classes for the same conditions, matched by name so no SDK is imported
+TRANSIENT_ERROR_TYPES = frozenset({
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "OverloadedError",
+    "ResourceExhausted",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+})
+
+# Fallback for errors that only carry a message; status codes must read as statuses, not amounts
+TRANSIENT_ERROR_PATTERN = re.compile(
+    r"\b(?:status(?: code)?|error(?: code)?|http)\W{0,3}(?:408|429|500|502|503|504|529)\b"
+    r"|\brate[ _-]?limit"
+    r"|\bresource[ _]exhausted\b"
+    r"|\boverloaded\b"
+    r"|\b(?:service|temporarily) unavailable\b"
+    r"|\btimed out\b"
+    r"|\bconnection (?:reset|refused|aborted|error)\b",
+    re.IGNORECASE,
+)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    for source in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "status", "http_status"):
+            value = getattr(source, attribute, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_transient_error(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in TRANSIENT_STATUS_CODES
+    if any(cls.__name__ in TRANSIENT_ERROR_TYPES for cls in type(error).__mro__):
+        return True
+    return TRANSIENT_ERROR_PATTERN.search(str(error)) is not None
+
+
+def _message_chars(message) -> int:
+    return len(getattr(message, "text", message) or "")
+
+
+class OperationStats:
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.queue_wait = deque(maxlen=window)
+        self.latency = deque(maxlen=window)
+
+    @staticmethod
+    def _summary(samples) -> dict:
+        if not samples:
+            return {"avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(samples)
+        return {
+            "avg_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "queue_wait": self._summary(self.queue_wait),
+            "latency": self._summary(self.latency),
+        }
+
+
+class LLMGateway:
+    """Shared entry point for model calls with concurrency, rate and retry control.
+
+    `chat_factory` builds the chat client for each call. The client keeps
+    conversation history per session, so instances are not reused.
+    Concurrency slots are shared fairly between keys (users); a call without
+    an explicit key uses `key_func()`.
+    """
+
+    def __init__(
+        self,
+        chat_factory: Callable[[], Any],
+        max_concurrency: int = 8,
+        rate_per_second: float = 5.0,
+        burst: int = 10,
+        max_retries: int = 3,
+        timeout: float = 120.0,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        key_func: Optional[Callable[[], Any]] = None,
+    ):
+        self.chat_factory = chat_factory
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.key_func = key_func
+        self._semaphore = FairSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate=rate_per_second, capacity=burst)
+        self.in_flight = 0
+        self.waiting = 0
+        self._stats: Dict[str, OperationStats] = defaultdict(OperationStats)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps retries from synchronising across callers
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @asynccontextmanager
+    async def _slot(self, stats: OperationStats, key: Any = None):
+        """Hold one of the concurrency slots and record how long it took to get one."""
+        if key is None and self.key_func is not None:
+            key = self.key_func()
+        enqueued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire(key)
+        finally:
+            self.waiting -= 1
+        stats.queue_wait.append(time.monotonic() - enqueued_at)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def send(self, message, operation: str = "default", key: Any = None) -> str:
+        stats = self._stats[operation]
+        stats.calls += 1
+        LLM_PROMPT_SIZE.observe(_message_chars(message), operation)
+        for attempt in range(self.max_retries + 1):
+            # The slot is given up between attempts so backoff does not hold back other callers
+            async with self._slot(stats, key):
+                await self._bucket.acquire()
+                started_at = time.monotonic()
+                try:
+                    chat = self.chat_factory()
+                    response = await asyncio.wait_for(chat.send_message(message), timeout=self.timeout)
+                    elapsed = time.monotonic() - started_at
+                    stats.latency.append(elapsed)
+                    LLM_CALL_DURATION.observe(elapsed, operation, "ok")
+                    LLM_RESPONSE_SIZE.observe(len(response or ""), operation)
+                    return response
+                except Exception as e:
+                    timed_out = isinstance(e, asyncio.TimeoutError)
+                    if timed_out:
+                        stats.timeouts += 1
+                    LLM_CALL_DURATION.observe(
+                        time.monotonic() - started_at, operation, "timeout" if timed_out else "error"
+                    )
+                    if attempt >= self.max_retries or not is_transient_error(e):
+                        stats.failures += 1
+                        raise
+                    stats.retries += 1
+                    delay = self._backoff(attempt)
+                    logger.warning(f"LLM {operation} call failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def stream(self, message, operation: str = "default", key: Any = None) -> AsyncIterator[str]:
+        """Yield response text as it is generated.
+
+        Clients without a streaming API fall back to one retried call yielded whole.
+        """
+        chat = self.chat_factory()
+        stream_message = getattr(chat, "stream_message", None)
+        if stream_message is None:
+            yield await self.send(message, operation, key)
+            return
+
+        stats = self._stats[operation]
+        stats.calls += 1
+        LLM_PROMPT_SIZE.observe(_message_chars(message), operation)
+        async with self._slot(stats, key):
+            await self._bucket.acquire()
+            started_at = time.monotonic()
+            response_chars = 0
+            try:
+                async for piece in stream_message(message):
+                    response_chars += len(piece)
+                    yield piece
+            except Exception:
+                stats.failures += 1
+                LLM_CALL_DURATION.observe(time.monotonic() - started_at, operation, "error")
+                raise
+            elapsed = time.monotonic() - started_at
+            stats.latency.append(elapsed)
+            LLM_CALL_DURATION.observe(elapsed, operation, "ok")
+            LLM_RESPONSE_SIZE.observe(response_chars, operation)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "operations": {name: stats.to_dict() for name, stats in self._stats.items()},
+        }
@@ -0,0 +1,187 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+FENCE_PATTERN = re.compile(r"```[a-zA-Z0-9_-]*\s*\n?(.*?)```", re.DOTALL)
+STRING_LITERAL = re.compile(r'("(?:\\.|[^"\\])*")')
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+class AnalysisPayload(BaseModel):
+    """Shape the analysis prompt asks for; coerces the near-misses models tend to produce."""
+
+    document_type: str = "unknown"
+    summary: str = ""
+    key_terms: List[Dict[str, str]] = []
+    calculations: Optional[Dict[str, Any]] = None
+    risk_assessment: Dict[str, Any] = {}
+    fraud_indicators: List[str] = []
+    suggested_questions: List[str] = []
+    unusual_clauses: List[str] = []
+
+    @field_validator("document_type", "summary", mode="before")
+    @classmethod
+    def _text(cls, value):
+        if value is None:
+            return ""
+        if isinstance(value, list):
+            return "\n\n".join(str(item) for item in value)
+        return str(value)
+
+    @field_validator("key_terms", mode="before")
+    @classmethod
+    def _key_terms(cls, value):
+        terms = []
+        for item in value or []:
+            if isinstance(item, dict):
+                terms.append({str(k): "" if v is None else str(v) for k, v in item.items()})
+            elif item:
+                terms.append({"term": str(item), "explanation": ""})
+        return terms
+
+    @field_validator("fraud_indicators", "suggested_questions", "unusual_clauses", mode="before")
+    @classmethod
+    def _strings(cls, value):
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [value] if value.strip() else []
+        return [item if isinstance(item, str) else json.dumps(item) for item in value if item]
+
+    @field_validator("risk_assessment", mode="before")
+    @classmethod
+    def _risk(cls, value):
+        if isinstance(value, str):
+            return {"overall_risk": value.lower(), "risk_factors": [], "recommendations": []}
+        return value or {}
+
+
+def strip_fences(text: str) -> str:
+    match = FENCE_PATTERN.search(text)
+    return match.group(1) if match else text
+
+
+def extract_balanced_object(text: str) -> Optional[str]:
+    """The first complete {...} block, honouring strings; an unterminated block is returned as-is."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth, in_string, escaped = 0, False, False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return text[start:]
+
+
+def _close_truncated(text: str) -> str:
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    return text + "".join(reversed(stack))
+
+
+def _outside_strings(text: str, fix) -> str:
+    # Odd-numbered parts of the split are string literals and are left untouched
+    parts = STRING_LITERAL.split(text)
+    return "".join(part if index % 2 else fix(part) for index, part in enumerate(parts))
+
+
+def _fix_syntax(segment: str) -> str:
+    segment = re.sub(r"//[^\n]*", "", segment)
+    segment = re.sub(r"/\*.*?\*/", "", segment, flags=re.DOTALL)
+    segment = re.sub(r"\bTrue\b", "true", segment)
+    segment = re.sub(r"\bFalse\b", "false", segment)
+    segment = re.sub(r"\bNone\b", "null", segment)
+    # Unquoted keys
+    segment = re.sub(r"([{,]\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*:)", r'\1"\2"\3', segment)
+    return segment
+
+
+def repair_json(text: str) -> str:
+    text = _close_truncated(text.translate(SMART_QUOTES))
+    text = _outside_strings(text, _fix_syntax)
+    # Trailing commas, including ones exposed by closing a truncated object
+    return _outside_strings(text, lambda segment: re.sub(r",(\s*[}\]])", r"\1", segment))
+
+
+class AnalysisParser:
+    """Parses analysis output with increasing effort, counting which step succeeded."""
+
+    def __init__(self):
+        self.counts = {"direct": 0, "cleaned": 0, "repaired": 0, "retried": 0, "retry_succeeded": 0, "failed": 0}
+
+    @staticmethod
+    def _validate(candidate: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        try:
+            return AnalysisPayload.model_validate(data).model_dump()
+        except ValidationError:
+            return None
+
+    def parse(self, text: str) -> Optional[Dict[str, Any]]:
+        """Parse without calling the model; None means only a retry can help."""
+        data = self._validate(text)
+        if data is not None:
+            self.counts["direct"] += 1
+            return data
+
+        candidate = extract_balanced_object(strip_fences(text))
+        if candidate is None:
+            return None
+        data = self._validate(candidate)
+        if data is not None:
+            self.counts["cleaned"] += 1
+            return data
+
+        data = self._validate(repair_json(candidate))
+        if data is not None:
+            self.counts["repaired"] += 1
+        return data
+
+    def record_retry(self, succeeded: bool):
+        self.counts["retried"] += 1
+        if succeeded:
+            self.counts["retry_succeeded"] += 1
+        else:
+            self.counts["failed"] += 1
+
+    def stats(self) -> dict:
+        counts = dict(self.counts)
+        # Each of these used to fall through to an empty analysis and a re-upload
+        counts["analyses_saved"] = counts["cleaned"] + counts["repaired"] + counts["retry_succeeded"]
+        return counts
@@ -0,0 +1,222 @@
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """Values live in one shard per thread, so recording never takes a lock.
+
+    A thread only ever writes its own shard; a scrape copies every shard and sums them.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        REGISTRY.append(self)
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = {}
+            # list.append is atomic, and happens once per thread
+            self._shards.append(shard)
+        return shard
+
+    def _snapshots(self) -> Iterable[dict]:
+        # dict.copy runs without releasing the GIL, so a writer cannot resize it mid-copy
+        return [shard.copy() for shard in list(self._shards)]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0.0) + amount
+
+    def collect(self) -> Dict[Tuple, float]:
+        totals: Dict[Tuple, float] = {}
+        for snapshot in self._snapshots():
+            for labelvalues, value in snapshot.items():
+                totals[labelvalues] = totals.get(labelvalues, 0.0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labelvalues, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labelvalues):
+        shard = self._shard()
+        # Per-bucket counts followed by sum and count; made cumulative at scrape time
+        series = shard.get(labelvalues)
+        if series is None:
+            series = shard[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def collect(self) -> Dict[Tuple, list]:
+        totals: Dict[Tuple, list] = {}
+        for snapshot in self._snapshots():
+            for labelvalues, series in snapshot.items():
+                series = list(series)
+                total = totals.get(labelvalues)
+                if total is None:
+                    totals[labelvalues] = series
+                else:
+                    totals[labelvalues] = [a + b for a, b in zip(total, series)]
+        return totals
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labelvalues, series in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.labelnames, labelvalues, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def render_gauge(name: str, documentation: str, labelnames: Sequence[str], samples: Dict[Tuple, float]) -> List[str]:
+    """Gauge computed at scrape time rather than recorded"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for labelvalues, value in sorted(samples.items()):
+        lines.append(f"{name}{_labels(labelnames, labelvalues)} {_number(value)}")
+    return lines
+
+
+def render(extra_lines: Iterable[str] = ()) -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUEST_DURATION = Histogram(
+    "legalai_http_request_duration_seconds", "HTTP request latency by route template and status",
+    ("method", "route", "status"),
+)
+LLM_CALL_DURATION = Histogram(
+    "legalai_llm_call_duration_seconds", "Duration of each model call attempt",
+    ("operation", "outcome"),
+)
+LLM_PROMPT_SIZE = Histogram(
+    "legalai_llm_prompt_chars", "Characters of prompt text sent per model call",
+    ("operation",), buckets=SIZE_BUCKETS,
+)
+LLM_RESPONSE_SIZE = Histogram(
+    "legalai_llm_response_chars", "Characters of text returned per model call",
+    ("operation",), buckets=SIZE_BUCKETS,
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "legalai_mongo_command_duration_seconds", "MongoDB command round trips by command name",
+    ("command", "outcome"),
+)
+ADMISSION_REJECTIONS = Counter(
+    "legalai_admission_rejections_total", "Requests rejected with 429 by admission control",
+    ("controller", "reason"),
+)
+UPLOAD_SIZE = Histogram(
+    "legalai_upload_size_bytes", "Size of uploaded documents",
+    buckets=SIZE_BUCKETS,
+)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command; pymongo calls this from whichever thread ran the command."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, "ok")
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, "error")
+
+
+class RouteMetricsMiddleware:
+    """Records request latency labelled by route template, so ids do not explode the label set."""
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+        self._templates = None
+
+    def _template(self, scope) -> str:
+        if self._templates is None:
+            self._templates = {
+                route.endpoint: route.path for route in self.routes if hasattr(route, "endpoint")
+            }
+        # The router stores the matched endpoint on the scope it was given
+        return self._templates.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started, scope["method"], self._template(scope), str(status)
+            )
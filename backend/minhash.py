@@ -0,0 +1,79 @@
+import hashlib
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+NUM_PERM = 128
+# 32 bands of 4 rows: pairs above ~0.42 Jaccard usually share a band
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+BLOCK_SHINGLES = 4096
+# Below this many shingles a handful of shared boilerplate phrases reads as a near-duplicate
+MIN_SHINGLES = 50
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+SHINGLE_MULTIPLIER = np.uint64(1099511628211)
+
+# Fixed seed: stored signatures must stay comparable across processes and restarts
+_random = np.random.RandomState(1)
+PERM_A = _random.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _random.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Distinct 32-bit hashes of overlapping word n-grams."""
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    # crc32 rather than hash(), which is salted per process
+    ids = np.fromiter((zlib.crc32(word.encode()) for word in words), dtype=np.uint64, count=len(words))
+    width = min(SHINGLE_WORDS, len(ids))
+    count = len(ids) - width + 1
+    hashes = ids[:count].copy()
+    # Polynomial combination of each window; uint64 wraps around
+    with np.errstate(over="ignore"):
+        for offset in range(1, width):
+            hashes = hashes * SHINGLE_MULTIPLIER + ids[offset:offset + count]
+    return np.unique(hashes & MAX_HASH)
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM minimum hashes, or None for text with fewer than MIN_SHINGLES shingles."""
+    shingles = shingle_hashes(text)
+    if shingles.size < MIN_SHINGLES:
+        return None
+    minimums = np.full(NUM_PERM, MAX_HASH, dtype=np.uint64)
+    # Blocks keep the permutation matrix small for long documents
+    for start in range(0, shingles.size, BLOCK_SHINGLES):
+        block = shingles[start:start + BLOCK_SHINGLES]
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(PERM_A, block) + PERM_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+        np.minimum(minimums, permuted.min(axis=1), out=minimums)
+    return minimums.astype(np.uint32)
+
+
+def band_keys(sig: np.ndarray) -> List[str]:
+    """One key per band; documents sharing any key are candidate near-duplicates."""
+    return [
+        f"{band}:{hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).hexdigest()}"
+        for band in range(BANDS)
+    ]
+
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4")
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets."""
+    return float(np.mean(first == second))
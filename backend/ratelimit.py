@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def seconds_until_available(self, tokens: float = 1.0) -> float:
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0):
+        # The lock keeps waiters in arrival order
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.seconds_until_available(tokens))
+
+    def refund(self, tokens: float = 1.0):
+        """Return tokens taken for work that was not done after all."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+class FairSemaphore:
+    """Semaphore that hands freed slots to waiting keys in turn.
+
+    Waiters are queued per key and served round-robin, so a key with many
+    waiters cannot hold every slot while other keys wait.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_use = 0
+        self._waiters: "OrderedDict[Any, deque]" = OrderedDict()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiters.values())
+
+    async def acquire(self, key: Any = None):
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter was cancelled
+                self.release()
+            else:
+                queue = self._waiters.get(key)
+                if queue is not None and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiters[key]
+            raise
+
+    def release(self):
+        # Freed slots pass straight to the next key's oldest waiter
+        while self._waiters:
+            key, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
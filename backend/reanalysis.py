@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from job_queue import current_lane
+
+logger = logging.getLogger(__name__)
+
+# LLM gateway lane for re-analysis calls, so users' uploads are served in turn with it
+REANALYSIS_LANE = "reanalysis"
+MAX_RECORDED_ERRORS = 20
+
+
+class ReanalysisJobRunning(Exception):
+    pass
+
+
+class ReanalysisJobs:
+    """Admin-started jobs that refresh analyses made with an older prompt or model.
+
+    Stale analyses are visited in document_id order in batches of `batch_size`,
+    `concurrency` at a time, with a pause between batches and while `busy()`
+    says user work is backed up. Progress is checkpointed after every batch,
+    so a job interrupted by a restart resumes where it left off.
+    `reanalyze(analysis)` does the work for one analysis and returns an outcome
+    ("reanalyzed", "cached" or "skipped").
+
+    At most one job runs across all processes. The process running it holds a
+    lease on the job document that it renews every `lease_seconds / 3`; a job
+    whose lease has lapsed is claimed by the next `resume()` anywhere, and a
+    process that loses its lease (the job was cancelled or claimed elsewhere)
+    stops its run.
+    """
+
+    def __init__(
+        self,
+        jobs_collection,
+        analyses_collection,
+        reanalyze: Callable[[dict], Awaitable[str]],
+        target: Dict[str, str],
+        batch_size: int = 20,
+        concurrency: int = 2,
+        pause_seconds: float = 1.0,
+        busy: Optional[Callable[[], bool]] = None,
+        lease_seconds: float = 60.0,
+    ):
+        self.jobs = jobs_collection
+        self.analyses = analyses_collection
+        self.reanalyze = reanalyze
+        self.target = target
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.pause_seconds = pause_seconds
+        self.busy = busy or (lambda: False)
+        self.lease_seconds = lease_seconds
+        self.owner = str(uuid.uuid4())
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._start_lock = asyncio.Lock()
+
+    def index_specs(self) -> List[Dict[str, Any]]:
+        return [
+            # Stale lookups: one equality branch per old (prompt_version, model), merged in document_id order
+            {"collection": self.analyses.name, "keys": [("prompt_version", 1), ("model", 1), ("document_id", 1)],
+             "name": "prompt_version_model_document_id"},
+            {"collection": self.jobs.name, "keys": [("id", 1)], "name": "id_unique", "unique": True},
+            {"collection": self.jobs.name, "keys": [("status", 1)], "name": "status"},
+            # The cluster-wide "one job at a time" rule
+            {"collection": self.jobs.name, "keys": [("status", 1)], "name": "one_running", "unique": True,
+             "partialFilterExpression": {"status": "running"}},
+        ]
+
+    async def _distinct(self, field: str, query: dict) -> List[Optional[str]]:
+        values = await self.analyses.distinct(field, query)
+        # distinct leaves out documents without the field, which count as None
+        if None not in values and await self.analyses.find_one({**query, field: None}, {"_id": 0, "document_id": 1}):
+            values.append(None)
+        return values
+
+    async def stale_versions(self) -> List[Dict[str, Optional[str]]]:
+        """Every (prompt_version, model) pair in use other than the target; missing stamps count as None.
+
+        Read as distinct scans of the prompt_version_model_document_id prefix, one per prompt version.
+        """
+        versions = [
+            {"prompt_version": prompt_version, "model": model}
+            for prompt_version in await self._distinct("prompt_version", {})
+            for model in await self._distinct("model", {"prompt_version": prompt_version})
+        ]
+        return [version for version in versions if version != self.target]
+
+    @staticmethod
+    def stale_query(versions: List[Dict[str, Optional[str]]], after: Optional[str] = None) -> dict:
+        query: Dict[str, Any] = {"$or": versions, "analysis_mode": {"$ne": "fast"}}
+        if after is not None:
+            query["document_id"] = {"$gt": after}
+        return query
+
+    async def start(self, requested_by: str) -> dict:
+        async with self._start_lock:
+            if any(not task.done() for task in self._tasks.values()) or await self.jobs.find_one(
+                {"status": "running"}, {"_id": 0, "id": 1}
+            ):
+                raise ReanalysisJobRunning("A re-analysis job is already running")
+            return await self._create(requested_by)
+
+    def _lease_expiry(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+
+    async def _create(self, requested_by: str) -> dict:
+        versions = await self.stale_versions()
+        total = await self.analyses.count_documents(self.stale_query(versions)) if versions else 0
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "running" if total else "completed",
+            "requested_by": requested_by,
+            "target": self.target,
+            "stale_versions": versions,
+            "total": total,
+            "last_document_id": None,
+            "reanalyzed": 0,
+            "cached": 0,
+            "skipped": 0,
+            "failed": 0,
+            "errors": [],
+            "elapsed_seconds": 0.0,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None if total else now,
+            "owner": self.owner if total else None,
+            "lease_expires_at": self._lease_expiry() if total else None,
+        }
+        try:
+            await self.jobs.insert_one(dict(job))
+        except DuplicateKeyError:
+            # Another process started one between the check and the insert
+            raise ReanalysisJobRunning("A re-analysis job is already running")
+        if total:
+            self._spawn(job)
+        logger.info(f"Re-analysis job {job['id']} started for {total} analyses")
+        return job
+
+    async def resume(self):
+        """Claim and restart running jobs whose lease has lapsed; jobs aimed at another version are superseded.
+
+        Safe to call repeatedly and from every process: each job is claimed by exactly one.
+        """
+        while True:
+            job = await self.jobs.find_one_and_update(
+                {"status": "running", "$or": [
+                    {"lease_expires_at": {"$lt": datetime.now(timezone.utc)}},
+                    # Jobs created before leases existed
+                    {"lease_expires_at": None},
+                ]},
+                {"$set": {"owner": self.owner, "lease_expires_at": self._lease_expiry()}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None:
+                return
+            job.pop("_id")
+            # Still running here; its lease lapsed while the event loop was held up
+            if job["id"] in self._tasks and not self._tasks[job["id"]].done():
+                continue
+            if job["target"] != self.target:
+                await self._finish(job, "superseded")
+                continue
+            logger.info(f"Resuming re-analysis job {job['id']} after {job['last_document_id']}")
+            self._spawn(job)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a job; a run in another process notices on its next lease renewal."""
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        job = await self.jobs.find_one({"id": job_id}, {"_id": 0})
+        if job is not None and job["status"] == "running":
+            job = await self._finish(job, "cancelled")
+        return job
+
+    async def stop(self):
+        """Stop running jobs for shutdown; they stay "running", with their lease released for the next resume()."""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
+        await self.jobs.update_many(
+            {"owner": self.owner, "status": "running"}, {"$set": {"lease_expires_at": None}}
+        )
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await self.jobs.find_one({"id": job_id}, {"_id": 0})
+        return self.progress(job) if job else None
+
+    @staticmethod
+    def progress(job: dict) -> dict:
+        done = job["reanalyzed"] + job["cached"] + job["skipped"] + job["failed"]
+        elapsed = job["elapsed_seconds"]
+        throughput = done / elapsed if elapsed else 0.0
+        remaining = max(0, job["total"] - done)
+        return {
+            **job,
+            "processed": done,
+            "remaining": remaining,
+            "throughput_per_minute": round(throughput * 60, 2),
+            "eta_seconds": round(remaining / throughput) if throughput and job["status"] == "running" else None,
+        }
+
+    def _spawn(self, job: dict):
+        self._tasks[job["id"]] = asyncio.create_task(self._run(job), name=f"reanalysis-{job['id']}")
+
+    async def _finish(self, job: dict, status: str) -> dict:
+        changes = {
+            "status": status,
+            "completed_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc),
+            "lease_expires_at": None,
+        }
+        # A job that has already ended (e.g. cancelled elsewhere) keeps its status
+        await self.jobs.update_one({"id": job["id"], "status": "running"}, {"$set": changes})
+        logger.info(f"Re-analysis job {job['id']} {status}")
+        return {**job, **changes}
+
+    async def _keep_lease(self, job_id: str, run: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            result = await self.jobs.update_one(
+                {"id": job_id, "owner": self.owner, "status": "running"},
+                {"$set": {"lease_expires_at": self._lease_expiry()}},
+            )
+            if result.matched_count == 0:
+                logger.info(f"Re-analysis job {job_id} is no longer held by this process; stopping")
+                run.cancel()
+                return
+
+    async def _run(self, job: dict):
+        current_lane.set(REANALYSIS_LANE)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process(analysis: dict) -> str:
+            async with semaphore:
+                return await self.reanalyze(analysis)
+
+        lease = asyncio.create_task(self._keep_lease(job["id"], asyncio.current_task()))
+        # Wall time, so pauses and waits for user work show up in the throughput and ETA
+        last_checkpoint = time.monotonic()
+        try:
+            while True:
+                # Users' own uploads come first
+                while self.busy():
+                    await asyncio.sleep(self.pause_seconds or 1.0)
+                batch = await self.analyses.find(
+                    self.stale_query(job["stale_versions"], job["last_document_id"]),
+                    {"_id": 0, "document_id": 1},
+                ).sort("document_id", 1).limit(self.batch_size).to_list(self.batch_size)
+                if not batch:
+                    await self._finish(job, "completed")
+                    return
+
+                outcomes = await asyncio.gather(*(process(analysis) for analysis in batch), return_exceptions=True)
+                for analysis, outcome in zip(batch, outcomes):
+                    if isinstance(outcome, asyncio.CancelledError):
+                        raise outcome
+                    if isinstance(outcome, Exception):
+                        job["failed"] += 1
+                        job["errors"] = (job["errors"] + [
+                            {"document_id": analysis["document_id"], "error": str(outcome)}
+                        ])[-MAX_RECORDED_ERRORS:]
+                    else:
+                        job[outcome] += 1
+                job["last_document_id"] = batch[-1]["document_id"]
+                now = time.monotonic()
+                job["elapsed_seconds"] += now - last_checkpoint
+                last_checkpoint = now
+
+                # Checkpoint: a restart picks up after the last document of this batch
+                await self.jobs.update_one({"id": job["id"], "owner": self.owner}, {"$set": {
+                    field: job[field]
+                    for field in ("last_document_id", "reanalyzed", "cached", "skipped", "failed", "errors", "elapsed_seconds")
+                } | {"updated_at": datetime.now(timezone.utc)}})
+                if self.pause_seconds:
+                    await asyncio.sleep(self.pause_seconds)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Re-analysis job {job['id']} failed: {e}")
+            await self._finish(job, "failed")
+        finally:
+            lease.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "target": self.target,
+            "running": sorted(job_id for job_id, task in self._tasks.items() if not task.done()),
+        }
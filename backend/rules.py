@@ -0,0 +1,196 @@
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+# Bump when the catalogue changes so stored findings can be told apart
+RULES_VERSION = "1"
+
+SEVERITY_LEVELS = ["low", "medium", "high"]
+EXCERPT_CHARS = 80
+
+RULES: List[Dict[str, str]] = [
+    # Fraud indicators
+    {"id": "wire_transfer_demand", "category": "fraud", "severity": "high",
+     "description": "Demands payment by wire transfer, gift cards or cryptocurrency",
+     "triggers": ["wire", "western", "moneygram", "gift", "crypto", "bitcoin"],
+     "pattern": r"\bwire\s+(?:the\s+)?(?:funds|payment|money|transfer)\b|western\s+union|moneygram"
+                r"|\bgift\s+cards?\b|\bcrypto(?:currency)?\b|\bbitcoin\b"},
+    {"id": "advance_fee", "category": "fraud", "severity": "high",
+     "description": "Requires a fee before the loan is approved or funded",
+     "triggers": ["advance", "upfront", "up", "processing", "insurance"],
+     "pattern": r"(?:advance|upfront|up-front|processing|insurance)\s+fee[^.]{0,60}"
+                r"\b(?:before|prior\s+to)\s+(?:approval|funding|disbursement|release)"},
+    {"id": "guaranteed_approval", "category": "fraud", "severity": "high",
+     "description": "Promises guaranteed approval or no credit check",
+     "triggers": ["guaranteed", "no"],
+     "pattern": r"guaranteed\s+(?:approval|loan|acceptance)|no\s+credit\s+check"},
+    {"id": "pressure_tactics", "category": "fraud", "severity": "medium",
+     "description": "Pressures the reader to sign or pay immediately",
+     "triggers": ["act", "respond", "sign", "pay", "within", "offer", "limited"],
+     "pattern": r"\b(?:act|respond|sign|pay)\s+(?:now|immediately|today)\b|within\s+24\s+hours"
+                r"|offer\s+expires\s+(?:today|tonight)|limited\s+time\s+offer"},
+    {"id": "secrecy_request", "category": "fraud", "severity": "high",
+     "description": "Asks the reader not to discuss the agreement with others",
+     "triggers": ["do", "must", "shall"],
+     "pattern": r"(?:do\s+not|must\s+not|shall\s+not)\s+(?:tell|disclose|discuss)[^.]{0,40}"
+                r"\b(?:anyone|bank|lawyer|attorney|family)"},
+    {"id": "personal_account_payment", "category": "fraud", "severity": "high",
+     "description": "Directs payments to a personal account",
+     "triggers": ["payable"],
+     "pattern": r"payable\s+to[^.]{0,40}personal\s+(?:bank\s+)?account"},
+    {"id": "blank_terms", "category": "fraud", "severity": "medium",
+     "description": "Leaves material terms blank or to be decided later",
+     "triggers": ["to", "left"],
+     "pattern": r"\bto\s+be\s+(?:determined|filled\s+in|agreed)\s+(?:later|after\s+signing)|left\s+blank"},
+    # Unusual clauses
+    {"id": "auto_renewal", "category": "unusual", "severity": "medium",
+     "description": "Renews automatically unless cancelled",
+     "triggers": ["automatic", "renew", "evergreen"],
+     "pattern": r"automatic(?:ally)?\s+renew(?:s|ed|al)?|renews?\s+automatically|evergreen\s+(?:clause|term)"},
+    {"id": "arbitration_waiver", "category": "unusual", "severity": "medium",
+     "description": "Requires binding arbitration or waives jury trial or class actions",
+     "triggers": ["binding", "waive", "class"],
+     "pattern": r"binding\s+arbitration|waive[sd]?[^.]{0,40}\b(?:jury\s+trial|trial\s+by\s+jury)"
+                r"|class\s+action\s+waiver|waive[sd]?[^.]{0,30}class\s+action"},
+    {"id": "balloon_payment", "category": "unusual", "severity": "high",
+     "description": "Ends with a large balloon payment",
+     "triggers": ["balloon"],
+     "pattern": r"balloon\s+payment"},
+    {"id": "confession_of_judgment", "category": "unusual", "severity": "high",
+     "description": "Confession of judgment lets the lender win in court without a hearing",
+     "triggers": ["confession", "cognovit"],
+     "pattern": r"confession\s+of\s+judge?ment|cognovit"},
+    {"id": "prepayment_penalty", "category": "unusual", "severity": "medium",
+     "description": "Charges a penalty for paying off early",
+     "triggers": ["prepayment", "early"],
+     "pattern": r"prepayment\s+(?:penalty|fee|charge)|early\s+(?:repayment|payoff)\s+(?:penalty|fee)"},
+    {"id": "variable_rate", "category": "unusual", "severity": "medium",
+     "description": "Interest rate can change over the term",
+     "triggers": ["variable", "adjustable", "floating", "rate"],
+     "pattern": r"(?:variable|adjustable|floating)\s+(?:interest\s+)?rate|rate\s+may\s+(?:increase|change|be\s+adjusted)"},
+    {"id": "acceleration", "category": "unusual", "severity": "medium",
+     "description": "Lets the full balance become due at once",
+     "triggers": ["accelerat", "immediately"],
+     "pattern": r"accelerat(?:e|ion)\s+(?:clause|of\s+the\s+(?:loan|debt|balance))|immediately\s+due\s+and\s+payable"},
+    {"id": "unilateral_changes", "category": "unusual", "severity": "medium",
+     "description": "One party may change the terms without consent",
+     "triggers": ["may", "reserves"],
+     "pattern": r"(?:may|reserves\s+the\s+right\s+to)\s+(?:change|modify|amend)[^.]{0,60}"
+                r"(?:at\s+any\s+time|without\s+(?:prior\s+)?notice|sole\s+discretion)"},
+    {"id": "nonrefundable_deposit", "category": "unusual", "severity": "medium",
+     "description": "Deposit is non-refundable",
+     "triggers": ["non"],
+     "pattern": r"non-?\s?refundable\s+(?:security\s+)?deposit"},
+    {"id": "liability_waiver", "category": "unusual", "severity": "medium",
+     "description": "Waives claims or shifts liability onto the reader",
+     "triggers": ["hold", "waive"],
+     "pattern": r"hold\s+harmless|waive[sd]?\s+(?:any\s+and\s+)?all\s+(?:claims|rights|liability)"},
+    {"id": "wage_assignment", "category": "unusual", "severity": "high",
+     "description": "Assigns wages or allows garnishment without a court order",
+     "triggers": ["assignment", "wage"],
+     "pattern": r"assignment\s+of\s+(?:wages|salary|earnings)|wage\s+(?:assignment|garnishment)"},
+    {"id": "non_compete", "category": "unusual", "severity": "medium",
+     "description": "Restricts future work with a non-compete",
+     "triggers": ["non", "shall"],
+     "pattern": r"non-?\s?compet(?:e|ition)|shall\s+not\s+(?:directly\s+or\s+indirectly\s+)?compete"},
+    {"id": "tenant_all_repairs", "category": "unusual", "severity": "medium",
+     "description": "Makes the tenant responsible for all repairs",
+     "triggers": ["tenant"],
+     "pattern": r"tenant\s+(?:shall\s+be|is)\s+(?:solely\s+)?responsible\s+for\s+all\s+repairs"},
+]
+
+# Keywords used by fast mode to guess the document type
+DOCUMENT_TYPE_KEYWORDS = {
+    "lease": r"\b(?:lease|landlord|tenant|premises|rent)\b",
+    "loan": r"\b(?:loan|borrower|lender|principal|interest\s+rate)\b",
+    "employment": r"\b(?:employer|employee|employment|salary|wages)\b",
+    "terms_of_service": r"\b(?:terms\s+of\s+service|user\s+agreement|subscriber)\b",
+}
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Regex for a set of words with shared prefixes factored out, e.g. pay|payable -> pay(?:able)?"""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        optional = "" in node
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if optional else "")
+
+    return build(trie)
+
+
+def compile_rules(rules: List[Dict[str, str]], flags: int = 0) -> re.Pattern:
+    """All rules as one alternation of named groups, so a scan is a single pass over the text.
+
+    The leading lookahead only lets the engine try the alternatives at word starts that
+    begin with a trigger, which skips almost every position in ordinary prose.
+    """
+    triggers = sorted({trigger for rule in rules for trigger in rule["triggers"]})
+    alternatives = "|".join(f"(?P<{rule['id']}>{rule['pattern']})" for rule in rules)
+    return re.compile(rf"\b(?={_trie_pattern(triggers)})(?:{alternatives})", flags)
+
+
+# Patterns are lowercase and scanned against lowercased text; IGNORECASE is far slower
+MATCHER = compile_rules(RULES)
+FALLBACK_MATCHER = compile_rules(RULES, re.IGNORECASE)
+RULES_BY_ID = {rule["id"]: rule for rule in RULES}
+TYPE_MATCHERS = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in DOCUMENT_TYPE_KEYWORDS.items()}
+
+
+def _excerpt(text: str, start: int, end: int) -> str:
+    left = max(0, start - EXCERPT_CHARS // 2)
+    right = min(len(text), end + EXCERPT_CHARS // 2)
+    return " ".join(text[left:right].split())
+
+
+def scan_text(text: str) -> Dict[str, Any]:
+    findings: Dict[str, Dict[str, Any]] = {}
+    lowered = text.lower()
+    # A few characters change length when lowercased, which would shift the offsets
+    if len(lowered) == len(text):
+        matches = MATCHER.finditer(lowered)
+    else:
+        matches = FALLBACK_MATCHER.finditer(text)
+    for match in matches:
+        rule_id = match.lastgroup
+        finding = findings.get(rule_id)
+        if finding is None:
+            rule = RULES_BY_ID[rule_id]
+            findings[rule_id] = {
+                "rule_id": rule_id,
+                "category": rule["category"],
+                "severity": rule["severity"],
+                "description": rule["description"],
+                "excerpt": _excerpt(text, match.start(), match.end()),
+                "start": match.start(),
+                "count": 1,
+            }
+        else:
+            finding["count"] += 1
+
+    ordered = list(findings.values())
+    risk = max((f["severity"] for f in ordered), key=SEVERITY_LEVELS.index, default="low")
+    return {"version": RULES_VERSION, "risk": risk, "findings": ordered}
+
+
+def classify_document(text: str) -> str:
+    counts = Counter({name: len(matcher.findall(text)) for name, matcher in TYPE_MATCHERS.items()})
+    name, count = counts.most_common(1)[0]
+    return name if count else "unknown"
+
+
+def finding_labels(scan: Dict[str, Any], category: str) -> List[str]:
+    return [
+        f"{finding['description']}: \"{finding['excerpt']}\""
+        for finding in scan["findings"] if finding["category"] == category
+    ]
@@ -0,0 +1,270 @@
+import asyncio
+import heapq
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or shall that the this to was were will with
+""".split())
+
+# Matches in titles and analysis fields count for more than matches in the body text
+FIELD_WEIGHTS = {"filename": 3.0, "summary": 2.0, "key_terms": 2.0, "clauses": 2.0, "text": 1.0}
+# Kept in memory for snippets; body text is fetched only for the hits that need it
+STORED_FIELDS = ("summary", "clauses", "key_terms", "filename")
+SNIPPET_CHARS = 160
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def snippet(text: str, terms: List[str], width: int = SNIPPET_CHARS) -> Optional[Dict[str, Any]]:
+    """Window around the first match with the offsets of every match inside it."""
+    if not text or not terms:
+        return None
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\w*", re.IGNORECASE)
+    first = pattern.search(text)
+    if first is None:
+        return None
+    start = max(0, first.start() - width // 3)
+    end = min(len(text), start + width)
+    # Start and end on word boundaries
+    if start > 0:
+        space = text.find(" ", start, first.start())
+        start = space + 1 if space >= 0 else start
+    if end < len(text):
+        space = text.rfind(" ", first.end(), end)
+        end = space if space >= 0 else end
+    window = text[start:end]
+    highlights = [[match.start(), match.end()] for match in pattern.finditer(window)]
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    if prefix:
+        highlights = [[s + len(prefix), e + len(prefix)] for s, e in highlights]
+    return {"text": prefix + window + suffix, "highlights": highlights}
+
+
+class UserIndex:
+    """Inverted index over one user's documents, scored with BM25."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.lengths: Dict[str, float] = {}
+        self.total_length = 0.0
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        # Each document's terms, so removing it touches only its own postings
+        self.terms: Dict[str, List[str]] = {}
+        # (term, document) entries; what the index's memory grows with
+        self.posting_count = 0
+        # Shared version stamp of the user's searchable documents this index reflects
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, doc_id: str, fields: Dict[str, str], meta: Dict[str, Any]):
+        """Index a document, replacing any previous version of it."""
+        self.remove(doc_id)
+        weights: Counter = Counter()
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for token in tokenize(text or ""):
+                weights[token] += weight
+        for term, frequency in weights.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.terms[doc_id] = list(weights)
+        self.posting_count += len(weights)
+        length = sum(weights.values())
+        self.lengths[doc_id] = length
+        self.total_length += length
+        self.documents[doc_id] = {
+            "meta": meta,
+            "fields": {field: fields[field] for field in STORED_FIELDS if fields.get(field)},
+        }
+
+    def remove(self, doc_id: str):
+        if doc_id not in self.lengths:
+            return
+        for term in self.terms.pop(doc_id):
+            postings = self.postings[term]
+            del postings[doc_id]
+            self.posting_count -= 1
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+        del self.documents[doc_id]
+
+    def search(self, terms: List[str], limit: int) -> Tuple[List[Tuple[str, float]], int]:
+        """Top `limit` (doc_id, score) pairs and the number of matching documents."""
+        if not self.lengths:
+            return [], 0
+        count = len(self.lengths)
+        average_length = self.total_length / count or 1.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            lengths = self.lengths
+            for doc_id, frequency in postings.items():
+                norm = 1 - BM25_B + BM25_B * lengths[doc_id] / average_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return top, len(scores)
+
+
+class SearchIndex:
+    """Per-user indexes built on first search and kept current as analyses complete.
+
+    `loader(user_id)` yields (doc_id, fields, meta) for every searchable document.
+    Least recently searched users are evicted past `max_users`, or while the
+    loaded indexes hold more than `max_postings` postings in total.
+
+    With several worker processes each holds its own indexes. `stamps` is a
+    collection of per-user version stamps that every update bumps; an index
+    whose stamp has moved on is reloaded before it is searched. Without it, an
+    index only sees updates made in its own process, which is correct for a
+    single worker only.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], AsyncIterator[Tuple[str, Dict[str, str], Dict[str, Any]]]],
+        max_users: int = 100,
+        max_postings: int = 5_000_000,
+        stamps=None,
+    ):
+        self.loader = loader
+        self.stamps = stamps
+        self.max_users = max(1, max_users)
+        self.max_postings = max(1, max_postings)
+        self._users: "OrderedDict[str, UserIndex]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Updates (and the stamps they were given) that arrive while a user's index is being loaded
+        self._pending: Dict[str, Dict[str, tuple]] = {}
+        self._pending_stamps: Dict[str, List[int]] = {}
+        self.loads = 0
+        self.reloads = 0
+        self.updates = 0
+        self.searches = 0
+
+    def index_specs(self) -> List[Dict[str, Any]]:
+        if self.stamps is None:
+            return []
+        return [{"collection": self.stamps.name, "keys": [("user_id", 1)], "name": "user_id_unique", "unique": True}]
+
+    async def _stamp(self, user_id: str) -> int:
+        if self.stamps is None:
+            return 0
+        row = await self.stamps.find_one({"user_id": user_id}, {"_id": 0, "version": 1})
+        return row["version"] if row else 0
+
+    async def get(self, user_id: str) -> UserIndex:
+        index = self._users.get(user_id)
+        if index is not None:
+            if await self._stamp(user_id) == index.version:
+                self._users.move_to_end(user_id)
+                return index
+            # Changed by another process since it was loaded
+            self.reloads += 1
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            current = self._users.get(user_id)
+            if current is None or current is index:
+                index = await self._load(user_id)
+            else:
+                index = current
+        self._locks.pop(user_id, None)
+        return index
+
+    async def _load(self, user_id: str) -> UserIndex:
+        index = UserIndex()
+        self._users.pop(user_id, None)
+        self._pending[user_id] = {}
+        self._pending_stamps[user_id] = []
+        try:
+            # Read first: anything stored after this bumps the stamp again
+            index.version = await self._stamp(user_id)
+            async for doc_id, fields, meta in self.loader(user_id):
+                # Tokenizing is CPU work, kept off the event loop; the index is not shared until loaded
+                await asyncio.to_thread(index.add, doc_id, fields, meta)
+            for doc_id, (fields, meta) in self._pending[user_id].items():
+                index.add(doc_id, fields, meta)
+            for stamp in sorted(self._pending_stamps[user_id]):
+                if stamp == index.version + 1:
+                    index.version = stamp
+        finally:
+            self._pending.pop(user_id, None)
+            self._pending_stamps.pop(user_id, None)
+        self._users[user_id] = index
+        self._evict()
+        self.loads += 1
+        return index
+
+    def _evict(self):
+        # The most recently used index stays even when it alone is over the budget
+        while len(self._users) > 1 and (
+            len(self._users) > self.max_users
+            or sum(index.posting_count for index in self._users.values()) > self.max_postings
+        ):
+            self._users.popitem(last=False)
+
+    async def update(self, user_id: str, doc_id: str, fields: Dict[str, str], meta: Dict[str, Any]):
+        """Apply a completed analysis; users whose index is not loaded pick it up on their next load."""
+        stamp = None
+        if self.stamps is not None:
+            row = await self.stamps.find_one_and_update(
+                {"user_id": user_id}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+            stamp = row["version"]
+        index = self._users.get(user_id)
+        if index is not None:
+            index.add(doc_id, fields, meta)
+            # Otherwise another process updated in between, and the next get() reloads
+            if stamp is not None and stamp == index.version + 1:
+                index.version = stamp
+            self.updates += 1
+            self._evict()
+        elif user_id in self._pending:
+            self._pending[user_id][doc_id] = (fields, meta)
+            if stamp is not None:
+                self._pending_stamps[user_id].append(stamp)
+            self.updates += 1
+
+    async def search(self, user_id: str, query: str, limit: int = 10) -> Dict[str, Any]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        index = await self.get(user_id)
+        self.searches += 1
+        top, total = index.search(terms, limit)
+        results = []
+        for doc_id, score in top:
+            document = index.documents[doc_id]
+            best = None
+            for field, text in document["fields"].items():
+                best = snippet(text, terms)
+                if best is not None:
+                    best["field"] = field
+                    break
+            results.append({**document["meta"], "document_id": doc_id, "score": round(score, 4), "snippet": best})
+        return {"terms": terms, "total": total, "results": results}
+
+    def stats(self) -> dict:
+        return {
+            "loaded_users": len(self._users),
+            "documents": sum(len(index) for index in self._users.values()),
+            "terms": sum(len(index.postings) for index in self._users.values()),
+            "postings": sum(index.posting_count for index in self._users.values()),
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "updates": self.updates,
+            "searches": self.searches,
+        }
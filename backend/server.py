@@ -1,47 +1,193 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Depends, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import Annotated, Any, Awaitable, Callable, Dict, List, Optional, Set
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import tempfile
+import multiprocessing
 import hashlib
-from passlib.context import CryptContext
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import jwt
 import json
+import base64
+import numpy as np
+from pymongo.errors import DocumentTooLarge
+from job_queue import JobQueue, QueueFullError, current_lane
+from lazy import LazyDatabase, LazyModule, MongoConnection
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, retry_after_header
+from analysis_cache import AnalysisCache
+from blob_store import BlobStore
+from indexes import INDEX_SPECS, ensure_indexes, explain_route_queries
+from llm_gateway import LLMGateway
+from chunking import chunk_text, merge_analyses
+from conditional import SerializedBodyCache, etag_matches, json_body_response, make_etag, not_modified, render_json
+from extraction import extract_text
+from events import StatusBroker, format_sse
+from singleflight import SingleFlight
+from search_index import SearchIndex, snippet
+import minhash
+from llm_parsing import AnalysisParser
+from reanalysis import ReanalysisJobRunning, ReanalysisJobs
+from financial import analyze_financials, compute_scenarios
+import metrics
+from metrics import ADMISSION_REJECTIONS, MongoCommandListener, RouteMetricsMiddleware, UPLOAD_SIZE
+from rules import RULES_VERSION, SEVERITY_LEVELS, classify_document, finding_labels, scan_text
 
-# Load environment variables
+# Load environment variables; the settings below are read from them at import time
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, created on first use so importing the module needs no MONGO_URL
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '4'))
+MONGO_WARM_TIMEOUT = float(os.environ.get('MONGO_WARM_TIMEOUT', '5'))
+WARM_UP_MAX_BACKOFF = float(os.environ.get('WARM_UP_MAX_BACKOFF', '30'))
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', '2'))
+mongo = MongoConnection(lambda: {
+    # Command timings feed /api/metrics
+    "event_listeners": [MongoCommandListener()],
+    "minPoolSize": MONGO_MIN_POOL_SIZE,
+})
+db = LazyDatabase(mongo)
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def password_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt is CPU-bound, so it runs on its own pool instead of the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '4')),
+    thread_name_prefix="password-hash"
+)
 security = HTTPBearer()
 SECRET_KEY = "your-secret-key-change-in-production"
 
-# Create the main app without a prefix
-app = FastAPI()
+# Background analysis workers
+analysis_queue = JobQueue(
+    workers=int(os.environ.get('ANALYSIS_WORKERS', '4')),
+    max_depth=int(os.environ.get('ANALYSIS_QUEUE_SIZE', '100')),
+    # One user's backlog cannot fill the whole queue
+    max_per_lane=int(os.environ.get('ANALYSIS_QUEUE_PER_USER', '20')),
+    name="analysis"
+)
+ANALYSIS_DRAIN_TIMEOUT = float(os.environ.get('ANALYSIS_DRAIN_TIMEOUT', '30'))
+# Documents stuck in pending/analyzing this long (e.g. a worker stopped mid-job) are re-queued
+ANALYSIS_RECOVERY_GRACE = int(os.environ.get('ANALYSIS_RECOVERY_GRACE_SECONDS', '900'))
+ANALYSIS_RECOVERY_INTERVAL = int(os.environ.get('ANALYSIS_RECOVERY_INTERVAL', '300'))
+# Queued and running analyses refresh status_updated_at this often; must stay well under the grace period
+ANALYSIS_HEARTBEAT_INTERVAL = int(os.environ.get('ANALYSIS_HEARTBEAT_INTERVAL', '60'))
+# Documents this process has queued or is analyzing
+active_analyses: Set[str] = set()
+
+# Text extraction is CPU-bound parsing, so it runs in separate processes.
+# Forking the running server would copy its event loop, threads and Mongo sockets into the workers.
+extraction_executor = ProcessPoolExecutor(
+    max_workers=int(os.environ.get('EXTRACTION_WORKERS', '2')),
+    mp_context=multiprocessing.get_context(
+        "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    )
+)
+# Stored text stays well under MongoDB's 16MB document limit even at 4 bytes per character
+MAX_STORED_TEXT_CHARS = int(os.environ.get('MAX_STORED_TEXT_CHARS', str(3 * 1024 * 1024)))
+REPLY_CONTEXT_CHARS = int(os.environ.get('REPLY_CONTEXT_CHARS', '6000'))
+
+# Reply letters are memoized per (document, analysis, normalized responses)
+REPLY_CACHE_TTL = int(os.environ.get('REPLY_CACHE_TTL', str(24 * 3600)))
+reply_flights = SingleFlight()
+
+# Analysis status transitions pushed to SSE clients
+status_broker = StatusBroker()
+SSE_KEEPALIVE_SECONDS = 15
+# EventSource cannot send headers, so the status stream takes a short-lived token in the query string
+EVENTS_TOKEN_TTL = int(os.environ.get('EVENTS_TOKEN_TTL_SECONDS', '60'))
+EVENTS_TOKEN_SCOPE = "events"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Tolerant parsing of model output
+analysis_parser = AnalysisParser()
+
+# Upload limits
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Full-text search
+SEARCH_TEXT_CHARS = int(os.environ.get('SEARCH_TEXT_CHARS', '20000'))
+SEARCH_MAX_USERS = int(os.environ.get('SEARCH_MAX_USERS', '100'))
+# Bounds the memory of loaded indexes across users
+SEARCH_MAX_POSTINGS = int(os.environ.get('SEARCH_MAX_POSTINGS', '5000000'))
+
+# Near-duplicate detection
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.85'))
+# Above this the other analysis's summary and terms are reused verbatim; below it they may name
+# the wrong parties, dates or amounts, so only its structure is kept
+NEAR_DUPLICATE_VERBATIM_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_VERBATIM_THRESHOLD', '0.98'))
+SIMILAR_CANDIDATE_LIMIT = int(os.environ.get('SIMILAR_CANDIDATE_LIMIT', '100'))
+
+# Conditional reads: completed analyses only change through an admin re-analysis
+ANALYSIS_MAX_AGE = int(os.environ.get('ANALYSIS_MAX_AGE', '86400'))
+COMPLETED_ANALYSIS_CACHE_CONTROL = f"private, max-age={ANALYSIS_MAX_AGE}, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+analysis_bodies = SerializedBodyCache(max_entries=int(os.environ.get('ANALYSIS_BODY_CACHE_SIZE', '1000')))
+
+# Batch uploads
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', '50'))
+MAX_BATCH_BYTES = int(os.environ.get('MAX_BATCH_BYTES', str(200 * 1024 * 1024)))
+BATCH_ANALYSIS_CONCURRENCY = int(os.environ.get('BATCH_ANALYSIS_CONCURRENCY', '4'))
+
+# Uploaded originals, stored once per distinct content; kept out of the source tree
+BLOB_STORE_DIR = Path(os.environ.get(
+    'BLOB_STORE_DIR', str(Path.home() / '.local' / 'share' / 'legal-ai' / 'blobs')
+))
+blob_store = BlobStore(
+    BLOB_STORE_DIR,
+    db.blobs,
+    gc_grace_seconds=int(os.environ.get('BLOB_GC_GRACE_SECONDS', '3600'))
+)
+# Seconds between background sweeps; 0 leaves collection to the admin route
+BLOB_GC_INTERVAL = int(os.environ.get('BLOB_GC_INTERVAL', str(6 * 3600)))
+blob_gc_task: Optional[asyncio.Task] = None
+recovery_task: Optional[asyncio.Task] = None
+# Comma-separated emails allowed to call the /api/admin routes
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# AI Integration
-from emergentintegrations.llm.chat import LlmChat, UserMessage, FileContentWithMimeType
+# AI Integration; the SDK is slow to import, so it loads on first use (or during warm-up)
+llm_chat = LazyModule("emergentintegrations.llm.chat")
+
+ANALYSIS_MODEL = os.environ.get('ANALYSIS_MODEL', "gemini-2.0-flash")
+# Bump whenever the analysis prompt changes so cached results are not reused
+# and existing analyses show up as stale for re-analysis
+ANALYSIS_PROMPT_VERSION = "2"
+ANALYSIS_VERSION = f"{ANALYSIS_PROMPT_VERSION}:{ANALYSIS_MODEL}:{RULES_VERSION}"
+# Stamped on every analysis the model contributed to
+ANALYSIS_STAMP = {"prompt_version": ANALYSIS_PROMPT_VERSION, "model": ANALYSIS_MODEL}
+
+# Analyses reused across identical uploads
+analysis_cache = AnalysisCache(
+    db.analysis_cache,
+    version=ANALYSIS_VERSION,
+    ttl_seconds=int(os.environ.get('ANALYSIS_CACHE_TTL', str(30 * 24 * 3600)))
+)
 
 # Initialize AI chat
 def get_ai_chat():
-    return LlmChat(
+    return llm_chat.LlmChat(
         api_key=os.environ.get('EMERGENT_LLM_KEY'),
         session_id=str(uuid.uuid4()),
         system_message="""You are a legal document analysis expert. Your role is to analyze legal documents and provide clear, actionable insights. You can:
@@ -55,7 +201,35 @@ def get_ai_chat():
 7. GENERATE reply letters when needed
 
 Always respond in JSON format with structured data. Be thorough but accessible to non-lawyers."""
-    ).with_model("gemini", "gemini-2.0-flash")
+    ).with_model("gemini", ANALYSIS_MODEL)
+
+# Every model call goes through the gateway
+llm_gateway = LLMGateway(
+    get_ai_chat,
+    max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '8')),
+    rate_per_second=float(os.environ.get('LLM_RATE_PER_SECOND', '5')),
+    burst=int(os.environ.get('LLM_BURST', '10')),
+    max_retries=int(os.environ.get('LLM_MAX_RETRIES', '3')),
+    timeout=float(os.environ.get('LLM_TIMEOUT', '120')),
+    # Analysis jobs run in their user's lane, so slots are shared fairly between users
+    key_func=current_lane.get
+)
+
+# Admission control: per-user and global quotas on the routes that call the LLM
+upload_admission = AdmissionController(
+    "upload",
+    user_rate=float(os.environ.get('UPLOAD_RATE_PER_USER', '0.2')),
+    user_burst=float(os.environ.get('UPLOAD_BURST_PER_USER', '10')),
+    global_rate=float(os.environ.get('UPLOAD_RATE_GLOBAL', '5')),
+    global_burst=float(os.environ.get('UPLOAD_BURST_GLOBAL', '50'))
+)
+reply_admission = AdmissionController(
+    "reply",
+    user_rate=float(os.environ.get('REPLY_RATE_PER_USER', '0.1')),
+    user_burst=float(os.environ.get('REPLY_BURST_PER_USER', '5')),
+    global_rate=float(os.environ.get('REPLY_RATE_GLOBAL', '2')),
+    global_burst=float(os.environ.get('REPLY_BURST_GLOBAL', '20'))
+)
 
 # Models
 class User(BaseModel):
@@ -78,8 +252,23 @@ class Document(BaseModel):
     filename: str
     file_type: str
     file_size: int
+    content_hash: Optional[str] = None
+    batch_id: Optional[str] = None
     uploaded_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     analysis_status: str = "pending"  # pending, analyzing, completed, failed
+    analysis_mode: str = "full"
+    status_updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Bumped on every status change; ETags are derived from it
+    version: int = 0
+
+class DocumentBatch(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    analysis_mode: str = "full"
+    total: int
+    rejected: List[Dict[str, str]] = []
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    completed_at: Optional[datetime] = None
     
 class DocumentAnalysis(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -92,31 +281,253 @@ class DocumentAnalysis(BaseModel):
     fraud_indicators: List[str]
     suggested_questions: List[str]
     unusual_clauses: List[str]
+    analysis_mode: str = "full"  # full, fast, near_duplicate
+    rule_findings: Optional[Dict[str, Any]] = None
+    reused_from: Optional[str] = None
+    similarity: Optional[float] = None
+    # Prompt and model that produced the analysis; None for rule-only (fast) analyses
+    prompt_version: Optional[str] = None
+    model: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class DocumentIdsRequest(BaseModel):
+    document_ids: List[str] = Field(..., min_length=1, max_length=100)
+
+MAX_SCENARIOS = 1000
+
+class ScenarioRequest(BaseModel):
+    # Omitted inputs default to the figures extracted from the document
+    principals: Optional[List[Annotated[float, Field(gt=0, le=1e12)]]] = Field(None, max_length=50)
+    annual_rates: Optional[List[Annotated[float, Field(gt=0, le=100)]]] = Field(None, max_length=50)
+    term_months: Optional[List[Annotated[int, Field(gt=0, le=600)]]] = Field(None, max_length=50)
+    fees: Optional[float] = Field(None, ge=0, le=1e12)
+
 class ReplyLetter(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     document_id: str
+    analysis_id: Optional[str] = None
     user_responses: Dict[str, str]
+    responses_hash: Optional[str] = None
     generated_letter: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Upload helpers
+class UploadSizeLimitMiddleware:
+    """Rejects oversize upload bodies with 413 before they are buffered by the form parser."""
+
+    def __init__(self, app, paths, max_body_bytes: int):
+        self.app = app
+        self.paths = set(paths)
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        # Declared length is checked up front so the body is never read
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and int(content_length) > self.max_body_bytes:
+            response = JSONResponse({"detail": "File too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        
+        # Chunked bodies are counted as they arrive
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+async def save_upload_to_temp_file(file: UploadFile):
+    """Copy an upload to disk in fixed-size chunks, hashing and counting on the same pass."""
+    digest = hashlib.sha256()
+    size = 0
+    # Same filesystem as the blob store, so committing the blob is a rename
+    with tempfile.NamedTemporaryFile(delete=False, dir=blob_store.tmp_dir, prefix="upload-") as temp_file:
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="File too large")
+                digest.update(chunk)
+                temp_file.write(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        except BaseException:
+            temp_file.close()
+            os.unlink(temp_file.name)
+            raise
+    return temp_file.name, size, digest.hexdigest()
+
+async def store_upload(file: UploadFile):
+    """Stream an upload into the blob store; returns the blob path, size and SHA-256."""
+    temp_file_path, size, content_hash = await save_upload_to_temp_file(file)
+    try:
+        file_path = await blob_store.add(temp_file_path, content_hash, size)
+    except BaseException:
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+        raise
+    return file_path, size, content_hash
+
+# Pagination helpers
+DOCUMENT_LIST_FIELDS = set(Document.model_fields)
+
+def encode_cursor(document: dict) -> str:
+    payload = json.dumps({"uploaded_at": document["uploaded_at"].isoformat(), "id": document["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {"uploaded_at": datetime.fromisoformat(payload["uploaded_at"]), "id": str(payload["id"])}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def document_list_projection(fields: Optional[str]) -> dict:
+    projection = {"_id": 0}
+    if not fields:
+        return projection
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - DOCUMENT_LIST_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # The cursor and the ETag are built from these, so they are always returned
+    for field in requested | {"id", "uploaded_at", "version"}:
+        projection[field] = 1
+    return projection
+
+# Analysis status helpers
+def publish_status(user_id: str, document_id: str, status: str):
+    status_broker.publish(user_id, {"document_id": document_id, "analysis_status": status})
+
+async def set_analysis_status(document_id: str, status: str) -> Optional[str]:
+    """Returns the owner's user id, or None when the document is gone."""
+    document = await db.documents.find_one_and_update(
+        {"id": document_id},
+        {"$set": {"analysis_status": status, "status_updated_at": datetime.now(timezone.utc)}, "$inc": {"version": 1}},
+        projection={"_id": 0, "user_id": 1}
+    )
+    analysis_bodies.invalidate(document_id)
+    if not document:
+        return None
+    publish_status(document["user_id"], document_id, status)
+    return document["user_id"]
+
+# Document lookup helpers
+async def find_documents_with_analyses(match: dict, limit: int) -> List[dict]:
+    """Fetch documents and their analyses in one round trip; ownership is part of `match`."""
+    pipeline = [
+        {"$match": match},
+        {"$limit": limit},
+        {"$lookup": {
+            "from": "document_analyses",
+            "localField": "id",
+            "foreignField": "document_id",
+            "as": "analysis"
+        }},
+        {"$project": {"_id": 0, "analysis._id": 0}}
+    ]
+    results = []
+    async for document in db.documents.aggregate(pipeline):
+        analyses = document.pop("analysis")
+        results.append({"document": document, "analysis": analyses[0] if analyses else None})
+    return results
+
+async def get_owned_document_with_analysis(document_id: str, user_id: str) -> dict:
+    results = await find_documents_with_analyses({"id": document_id, "user_id": user_id}, limit=1)
+    if not results:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if results[0]["analysis"] is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return results[0]
+
 # Authentication helpers
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, password_context().hash, password)
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, password_context().verify, password, password_hash)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm="HS256")
     return encoded_jwt
 
+def user_id_from_scope(scope) -> Optional[str]:
+    """User id from a valid bearer token, for middleware that runs before the route."""
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=["HS256"]).get("user_id")
+    except jwt.PyJWTError:
+        return None
+
+def queue_full_error() -> HTTPException:
+    # Lost the race with another request after admission let this one through
+    upload_admission.record_rejection("queue_full")
+    ADMISSION_REJECTIONS.inc(upload_admission.name, "queue_full")
+    return HTTPException(
+        status_code=429,
+        detail="Analysis queue is full, please retry shortly",
+        headers={"Retry-After": retry_after_header(analysis_queue.estimated_wait())}
+    )
+
+def quota_exceeded_error(rejection: AdmissionRejected) -> HTTPException:
+    ADMISSION_REJECTIONS.inc(upload_admission.name, rejection.reason)
+    return HTTPException(
+        status_code=429,
+        detail="Too many requests, please retry later",
+        headers={"Retry-After": retry_after_header(rejection.retry_after)}
+    )
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
         user_id: str = payload.get("user_id")
-        if user_id is None:
+        # Scoped tokens travel in URLs and only open their own route
+        if user_id is None or "scope" in payload:
             raise HTTPException(status_code=401, detail="Invalid token")
         return user_id
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def create_events_token(user_id: str) -> str:
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=EVENTS_TOKEN_TTL)
+    return jwt.encode({"user_id": user_id, "scope": EVENTS_TOKEN_SCOPE, "exp": expires_at}, SECRET_KEY, algorithm="HS256")
+
+def verify_events_token(token: str = Query(...)):
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("scope") != EVENTS_TOKEN_SCOPE or payload.get("user_id") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload["user_id"]
+
+async def verify_admin(user_id: str = Depends(verify_token)):
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "email": 1})
+    if not user or user["email"].lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_id
+
 # Authentication routes
 @api_router.post("/auth/register")
 async def register(user_data: UserCreate):
@@ -126,7 +537,7 @@ async def register(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password and create user
-    password_hash = pwd_context.hash(user_data.password)
+    password_hash = await hash_password(user_data.password)
     user = User(email=user_data.email, password_hash=password_hash)
     await db.users.insert_one(user.dict())
     
@@ -138,7 +549,7 @@ async def register(user_data: UserCreate):
 async def login(user_data: UserLogin):
     # Find user
     user = await db.users.find_one({"email": user_data.email})
-    if not user or not pwd_context.verify(user_data.password, user["password_hash"]):
+    if not user or not await verify_password(user_data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Create token
@@ -146,190 +557,920 @@ async def login(user_data: UserLogin):
     return {"access_token": token, "token_type": "bearer", "user_id": user["id"]}
 
 # Document routes
-@api_router.post("/documents/upload")
+ALLOWED_UPLOAD_TYPES = ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "text/plain"]
+
+@api_router.post("/documents/upload", status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
+    mode: str = Query("full", pattern="^(full|fast)$"),
     user_id: str = Depends(verify_token)
 ):
     # Validate file type
-    allowed_types = ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "text/plain"]
-    if file.content_type not in allowed_types:
+    if file.content_type not in ALLOWED_UPLOAD_TYPES:
         raise HTTPException(status_code=400, detail="Unsupported file type")
     
-    # Save file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as temp_file:
-        content = await file.read()
-        temp_file.write(content)
-        temp_file_path = temp_file.name
+    # Stream file to disk
+    file_path, file_size, content_hash = await store_upload(file)
+    UPLOAD_SIZE.observe(file_size)
     
     # Create document record
     document = Document(
         user_id=user_id,
         filename=file.filename,
         file_type=file.content_type,
-        file_size=len(content)
+        file_size=file_size,
+        content_hash=content_hash,
+        analysis_mode=mode
     )
+    
+    # Reuse the analysis of an identical upload instead of calling the LLM again
+    cached_analysis = await analysis_cache.get(user_id, content_hash)
+    if cached_analysis is not None:
+        document.analysis_status = "completed"
+        await db.documents.insert_one(document.dict())
+        analysis = DocumentAnalysis(document_id=document.id, **cached_analysis, **ANALYSIS_STAMP)
+        await db.document_analyses.update_one(
+            {"document_id": document.id}, {"$set": analysis.dict()}, upsert=True
+        )
+        publish_status(user_id, document.id, document.analysis_status)
+        # The text is still extracted so search and replies can use it
+        try:
+            analysis_queue.submit(run_extraction_job, document.id, file_path, file.content_type, lane=user_id)
+        except QueueFullError:
+            # The original is kept for a later extraction
+            pass
+        return {
+            "document_id": document.id,
+            "analysis_status": document.analysis_status,
+            "message": "Document uploaded and analysis reused from your earlier identical upload"
+        }
+    
     await db.documents.insert_one(document.dict())
     
-    # Start analysis (in background)
+    # Hand analysis off to the background workers; clients follow analysis_status
     try:
-        await analyze_document(document.id, temp_file_path, file.content_type)
-    except Exception as e:
-        logging.error(f"Analysis failed: {e}")
-        await db.documents.update_one(
-            {"id": document.id},
-            {"$set": {"analysis_status": "failed"}}
-        )
+        submit_analysis(document.id, file_path, file.content_type, content_hash, mode, lane=user_id)
+    except QueueFullError:
+        await db.documents.delete_one({"id": document.id})
+        await blob_store.release(content_hash)
+        upload_admission.settle(user_id, paid=1, cost=0)
+        raise queue_full_error()
+    publish_status(user_id, document.id, document.analysis_status)
+    
+    return {
+        "document_id": document.id,
+        "analysis_status": document.analysis_status,
+        "analysis_mode": mode,
+        "message": "Document uploaded and analysis queued"
+    }
+
+async def run_extraction_job(document_id: str, file_path: str, content_type: str):
+    await extract_document_text(document_id, file_path, content_type)
+    # The analysis was reused, so the text is the last piece search needs
+    await index_document_for_search(document_id)
+
+async def run_analysis_job(
+    document_id: str,
+    file_path: str,
+    content_type: str,
+    content_hash: Optional[str] = None,
+    mode: str = "full"
+):
+    try:
+        await analyze_document(document_id, file_path, content_type, content_hash, mode)
     finally:
-        # Clean up temp file
-        os.unlink(temp_file_path)
+        active_analyses.discard(document_id)
+
+def submit_analysis(document_id: str, file_path: str, content_type: str, content_hash: Optional[str], mode: str, lane: str):
+    # Tracked from the moment it is queued, so the stalled-analysis sweep leaves it alone
+    active_analyses.add(document_id)
+    try:
+        analysis_queue.submit(run_analysis_job, document_id, file_path, content_type, content_hash, mode, lane=lane)
+    except QueueFullError:
+        active_analyses.discard(document_id)
+        raise
+
+@api_router.post("/documents/batch", status_code=202)
+async def upload_document_batch(
+    files: List[UploadFile] = File(...),
+    mode: str = Query("full", pattern="^(full|fast)$"),
+    user_id: str = Depends(verify_token)
+):
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch")
+    # Admission charged one upload before the body was read; a batch costs one per file
+    if not analysis_queue.can_accept(user_id, weight=len(files)):
+        upload_admission.settle(user_id, paid=1, cost=0)
+        raise queue_full_error()
+    try:
+        upload_admission.settle(user_id, paid=1, cost=len(files))
+    except AdmissionRejected as rejection:
+        upload_admission.settle(user_id, paid=1, cost=0)
+        raise quota_exceeded_error(rejection)
+    
+    batch = DocumentBatch(user_id=user_id, analysis_mode=mode, total=len(files))
+    documents: List[Document] = []
+    analyses: List[DocumentAnalysis] = []
+    jobs: List[dict] = []
+    
+    # Stream each file to disk; a bad file is reported without failing the rest
+    for file in files:
+        if file.content_type not in ALLOWED_UPLOAD_TYPES:
+            batch.rejected.append({"filename": file.filename, "error": "Unsupported file type"})
+            continue
+        try:
+            file_path, file_size, content_hash = await store_upload(file)
+        except HTTPException as e:
+            batch.rejected.append({"filename": file.filename, "error": e.detail})
+            continue
+        UPLOAD_SIZE.observe(file_size)
+        
+        document = Document(
+            user_id=user_id,
+            filename=file.filename,
+            file_type=file.content_type,
+            file_size=file_size,
+            content_hash=content_hash,
+            analysis_mode=mode,
+            batch_id=batch.id
+        )
+        cached_analysis = await analysis_cache.get(user_id, content_hash)
+        if cached_analysis is not None:
+            document.analysis_status = "completed"
+            analyses.append(DocumentAnalysis(document_id=document.id, **cached_analysis, **ANALYSIS_STAMP))
+        documents.append(document)
+        jobs.append({
+            "document_id": document.id,
+            "file_path": file_path,
+            "content_type": file.content_type,
+            "content_hash": content_hash,
+            "cached": cached_analysis is not None
+        })
+    # Rejected files are not charged
+    if batch.rejected:
+        upload_admission.settle(user_id, paid=len(files), cost=len(jobs))
+    
+    if documents:
+        await db.documents.insert_many([document.dict() for document in documents])
+    if analyses:
+        await db.document_analyses.insert_many([analysis.dict() for analysis in analyses])
+    await db.document_batches.insert_one(batch.dict())
     
-    return {"document_id": document.id, "message": "Document uploaded and analysis started"}
+    # One job fans out under its own cap, but takes a queue slot per file
+    if jobs:
+        queued = [job["document_id"] for job in jobs if not job["cached"]]
+        active_analyses.update(queued)
+        try:
+            analysis_queue.submit(run_batch_job, batch.id, jobs, mode, lane=user_id, weight=len(jobs))
+        except QueueFullError:
+            active_analyses.difference_update(queued)
+            await db.documents.delete_many({"batch_id": batch.id})
+            await db.document_analyses.delete_many({"document_id": {"$in": [job["document_id"] for job in jobs]}})
+            await db.document_batches.delete_one({"id": batch.id})
+            for job in jobs:
+                await blob_store.release(job["content_hash"])
+            upload_admission.settle(user_id, paid=len(jobs), cost=0)
+            raise queue_full_error()
+    for document in documents:
+        publish_status(user_id, document.id, document.analysis_status)
+    
+    return {
+        "batch_id": batch.id,
+        "total": batch.total,
+        "accepted": len(documents),
+        "analysis_mode": mode,
+        "files": [
+            {"filename": document.filename, "document_id": document.id, "analysis_status": document.analysis_status}
+            for document in documents
+        ] + [
+            {"filename": rejected["filename"], "analysis_status": "rejected", "error": rejected["error"]}
+            for rejected in batch.rejected
+        ]
+    }
+
+async def run_batch_job(batch_id: str, jobs: List[dict], mode: str):
+    semaphore = asyncio.Semaphore(BATCH_ANALYSIS_CONCURRENCY)
+    
+    async def run(job: dict):
+        async with semaphore:
+            if job["cached"]:
+                await run_extraction_job(job["document_id"], job["file_path"], job["content_type"])
+            else:
+                await run_analysis_job(
+                    job["document_id"], job["file_path"], job["content_type"], job["content_hash"], mode
+                )
+    
+    results = await asyncio.gather(*(run(job) for job in jobs), return_exceptions=True)
+    for job, result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.error(f"Batch {batch_id} job for document {job['document_id']} failed: {result}")
+    await db.document_batches.update_one(
+        {"id": batch_id}, {"$set": {"completed_at": datetime.now(timezone.utc)}}
+    )
 
-async def analyze_document(document_id: str, file_path: str, content_type: str):
+@api_router.get("/documents/batch/{batch_id}")
+async def get_document_batch(batch_id: str, user_id: str = Depends(verify_token)):
+    # Batch record and every document's status in one query
+    pipeline = [
+        {"$match": {"id": batch_id, "user_id": user_id}},
+        {"$lookup": {
+            "from": "documents",
+            "localField": "id",
+            "foreignField": "batch_id",
+            "as": "documents"
+        }},
+        {"$project": {
+            "_id": 0,
+            "documents._id": 0,
+            "documents.user_id": 0,
+            "documents.content_hash": 0,
+            "documents.batch_id": 0
+        }}
+    ]
+    batches = await db.document_batches.aggregate(pipeline).to_list(1)
+    if not batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    batch = batches[0]
+    status_counts: Dict[str, int] = {}
+    for document in batch["documents"]:
+        status_counts[document["analysis_status"]] = status_counts.get(document["analysis_status"], 0) + 1
+    if batch["rejected"]:
+        status_counts["rejected"] = len(batch["rejected"])
+    batch["status_counts"] = status_counts
+    batch["done"] = all(d["analysis_status"] in ("completed", "failed") for d in batch["documents"])
+    return batch
+
+ANALYSIS_PROMPT = """
+Analyze this legal document comprehensively and return a JSON response with the following structure:
+{
+    "document_type": "string (lease, loan, employment, terms_of_service, contract, etc.)",
+    "summary": "string (2-3 paragraph plain English summary)",
+    "key_terms": [
+        {"term": "legal term", "explanation": "plain English explanation"}
+    ],
+    "calculations": {
+        "has_calculations": boolean,
+        "financial_details": [
+            {"type": "interest_rate/payment/fee", "amount": "value", "explanation": "description"}
+        ]
+    },
+    "risk_assessment": {
+        "overall_risk": "low/medium/high",
+        "risk_factors": ["list of risk factors"],
+        "recommendations": ["list of recommendations"]
+    },
+    "fraud_indicators": ["list of potential fraud indicators found"],
+    "unusual_clauses": ["list of unusual or concerning clauses"],
+    "suggested_questions": ["list of 5-7 questions user might want to ask about this document"]
+}
+
+Focus on making everything accessible to non-lawyers while being thorough and accurate.
+"""
+
+# Appended when the local engine already produced the calculations block
+LOCAL_CALCULATIONS_NOTE = """
+The loan figures in this document have already been calculated separately.
+Return "calculations": null and do not compute or list any financial figures.
+"""
+
+CHUNK_ANALYSIS_PROMPT = """
+The text below is part {part} of {total} of a longer legal document.
+Analyze only this part; the parts are analyzed separately and merged afterwards,
+so keep the summary to one paragraph about this part.
+{prompt}
+DOCUMENT PART {part} OF {total}:
+{text}
+"""
+
+# Long documents are analyzed section by section and merged
+CHUNKED_ANALYSIS_THRESHOLD = int(os.environ.get('CHUNKED_ANALYSIS_THRESHOLD', '40000'))
+ANALYSIS_CHUNK_CHARS = int(os.environ.get('ANALYSIS_CHUNK_CHARS', '20000'))
+ANALYSIS_CHUNK_CONCURRENCY = int(os.environ.get('ANALYSIS_CHUNK_CONCURRENCY', '4'))
+
+FIX_JSON_PROMPT = """
+The text below was meant to be a single JSON object matching this structure:
+{prompt}
+Fix only the JSON. Keep the content as it is, do not re-analyze anything,
+and return the JSON object alone with no markdown fences or commentary.
+
+TEXT:
+{response}
+"""
+
+async def parse_analysis_response(response: str):
+    """Returns the analysis payload and whether the model output parsed cleanly."""
+    analysis_data = analysis_parser.parse(response)
+    if analysis_data is not None:
+        return analysis_data, True
+    
+    # Last resort: a small repair call instead of a full re-analysis
     try:
-        # Update status to analyzing
-        await db.documents.update_one(
-            {"id": document_id},
-            {"$set": {"analysis_status": "analyzing"}}
+        fixed = await llm_gateway.send(
+            llm_chat.UserMessage(text=FIX_JSON_PROMPT.format(prompt=ANALYSIS_PROMPT, response=response)),
+            operation="analysis_repair"
         )
-        
-        # Get AI chat instance
-        chat = get_ai_chat()
-        
-        # Create file content object
-        file_content = FileContentWithMimeType(
+        analysis_data = analysis_parser.parse(fixed)
+    except Exception as e:
+        logging.warning(f"Analysis JSON repair call failed: {e}")
+    analysis_parser.record_retry(analysis_data is not None)
+    if analysis_data is not None:
+        return analysis_data, True
+    
+    # If response isn't valid JSON, create a basic analysis
+    return {
+        "document_type": "unknown",
+        "summary": response,
+        "key_terms": [],
+        "calculations": {"has_calculations": False, "financial_details": []},
+        "risk_assessment": {"overall_risk": "medium", "risk_factors": [], "recommendations": []},
+        "fraud_indicators": [],
+        "unusual_clauses": [],
+        "suggested_questions": []
+    }, False
+
+def search_pipeline(match: dict) -> List[dict]:
+    """Completed documents joined with the analysis fields and text that search indexes."""
+    return [
+        {"$match": {**match, "analysis_status": "completed"}},
+        {"$lookup": {
+            "from": "document_analyses",
+            "localField": "id",
+            "foreignField": "document_id",
+            "as": "analysis"
+        }},
+        {"$lookup": {
+            "from": "document_texts",
+            "localField": "id",
+            "foreignField": "document_id",
+            "as": "extracted"
+        }},
+        {"$project": {
+            "_id": 0, "id": 1, "user_id": 1, "filename": 1, "uploaded_at": 1,
+            "analysis.document_type": 1, "analysis.summary": 1, "analysis.key_terms": 1,
+            "analysis.unusual_clauses": 1, "analysis.fraud_indicators": 1,
+            "extracted.text": 1
+        }}
+    ]
+
+def search_entry(row: dict):
+    analysis = row["analysis"][0] if row["analysis"] else {}
+    text = row["extracted"][0].get("text", "") if row["extracted"] else ""
+    key_terms = [
+        f"{term.get('term', '')}: {term.get('explanation', '')}" for term in analysis.get("key_terms", [])
+    ]
+    fields = {
+        "filename": row["filename"],
+        "summary": analysis.get("summary", ""),
+        "key_terms": "\n".join(key_terms),
+        "clauses": "\n".join(analysis.get("unusual_clauses", []) + analysis.get("fraud_indicators", [])),
+        "text": text[:SEARCH_TEXT_CHARS]
+    }
+    meta = {
+        "filename": row["filename"],
+        "document_type": analysis.get("document_type", "unknown"),
+        "uploaded_at": row["uploaded_at"]
+    }
+    return fields, meta
+
+async def load_search_documents(user_id: str):
+    async for row in db.documents.aggregate(search_pipeline({"user_id": user_id})):
+        fields, meta = search_entry(row)
+        yield row["id"], fields, meta
+
+async def index_document_for_search(document_id: str):
+    try:
+        async for row in db.documents.aggregate(search_pipeline({"id": document_id})):
+            fields, meta = search_entry(row)
+            await search_index.update(row["user_id"], row["id"], fields, meta)
+    except Exception as e:
+        logging.warning(f"Search indexing failed for {document_id}: {e}")
+
+search_index = SearchIndex(
+    load_search_documents,
+    max_users=SEARCH_MAX_USERS,
+    max_postings=SEARCH_MAX_POSTINGS,
+    # Keeps each worker's in-memory indexes in step with the others
+    stamps=db.search_index_versions
+)
+
+async def extract_document_text(document_id: str, file_path: str, content_type: str) -> Optional[dict]:
+    """Extract normalized text in the process pool and store it against the document."""
+    loop = asyncio.get_running_loop()
+    try:
+        extracted = await loop.run_in_executor(extraction_executor, extract_text, file_path, content_type)
+    except Exception as e:
+        logging.warning(f"Text extraction failed for {document_id}: {e}")
+        return None
+    
+    # MinHash signature and LSH band keys for near-duplicate lookups
+    signature = await asyncio.to_thread(minhash.signature, extracted["text"])
+    if signature is not None:
+        extracted["minhash"] = minhash.to_bytes(signature)
+        extracted["lsh_bands"] = minhash.band_keys(signature)
+    owner = await db.documents.find_one({"id": document_id}, {"_id": 0, "user_id": 1})
+    
+    try:
+        await db.document_texts.update_one(
+            {"document_id": document_id},
+            {"$set": {
+                **truncate_for_storage(extracted),
+                "document_id": document_id,
+                "user_id": owner["user_id"] if owner else None,
+                "extracted_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+    except DocumentTooLarge as e:
+        # The analysis still runs on the in-memory text
+        logging.warning(f"Extracted text of {document_id} is too large to store: {e}")
+    return extracted
+
+def truncate_for_storage(extracted: dict) -> dict:
+    """Copy of the extraction with the text cut to MAX_STORED_TEXT_CHARS; `char_count` keeps the full length."""
+    limit = MAX_STORED_TEXT_CHARS
+    if len(extracted["text"]) <= limit:
+        return extracted
+    clip = lambda spans: [{**span, "end": min(span["end"], limit)} for span in spans if span["start"] < limit]
+    return {
+        **extracted,
+        "text": extracted["text"][:limit],
+        "pages": clip(extracted["pages"]),
+        "sections": clip(extracted["sections"]),
+        "truncated": True
+    }
+
+async def find_similar_documents(
+    document_id: str,
+    user_id: str,
+    signature: bytes,
+    bands: List[str],
+    min_similarity: float
+) -> List[tuple]:
+    """(document_id, similarity) for the user's documents sharing an LSH band, most similar first."""
+    candidates = await db.document_texts.find(
+        {"user_id": user_id, "lsh_bands": {"$in": bands}, "document_id": {"$ne": document_id}},
+        {"_id": 0, "document_id": 1, "minhash": 1}
+    ).limit(SIMILAR_CANDIDATE_LIMIT).to_list(SIMILAR_CANDIDATE_LIMIT)
+    
+    own = minhash.from_bytes(signature)
+    scored = [
+        (candidate["document_id"], minhash.similarity(own, minhash.from_bytes(candidate["minhash"])))
+        for candidate in candidates if candidate.get("minhash")
+    ]
+    return sorted([pair for pair in scored if pair[1] >= min_similarity], key=lambda pair: pair[1], reverse=True)
+
+async def find_reusable_analysis(document_id: str, extracted: dict) -> Optional[tuple]:
+    """Best full analysis of a near-duplicate document above NEAR_DUPLICATE_THRESHOLD."""
+    owner = await db.documents.find_one({"id": document_id}, {"_id": 0, "user_id": 1})
+    if not owner:
+        return None
+    similar = await find_similar_documents(
+        document_id, owner["user_id"], extracted["minhash"], extracted["lsh_bands"], NEAR_DUPLICATE_THRESHOLD
+    )
+    if not similar:
+        return None
+    
+    analyses = await db.document_analyses.find(
+        {"document_id": {"$in": [doc_id for doc_id, _ in similar]}, "analysis_mode": {"$ne": "fast"}, **ANALYSIS_STAMP},
+        {"_id": 0}
+    ).to_list(len(similar))
+    by_document = {analysis["document_id"]: analysis for analysis in analyses}
+    for doc_id, score in similar:
+        if doc_id in by_document:
+            return by_document[doc_id], score
+    return None
+
+def adapt_analysis(existing: dict, similarity: float, text: str, scan: dict) -> dict:
+    """Analysis for a near-duplicate of `existing`, without the other document's specific findings."""
+    if similarity < NEAR_DUPLICATE_VERBATIM_THRESHOLD:
+        # Document type from the match; findings from the rule engine on this text
+        analysis_data = fast_analysis(text, scan)
+        analysis_data["document_type"] = existing.get("document_type") or analysis_data["document_type"]
+        analysis_data["summary"] = f"Closely matches a document analyzed earlier. {analysis_data['summary']}"
+        # Rule labels are merged in by build_analysis
+        analysis_data["fraud_indicators"], analysis_data["unusual_clauses"] = [], []
+        return analysis_data
+    
+    analysis_data = {
+        field: existing.get(field)
+        for field in ("document_type", "summary", "key_terms", "risk_assessment", "suggested_questions")
+    }
+    # Rule labels and figures belong to the other document and are recomputed for this one
+    old_scan = existing.get("rule_findings") or {"findings": []}
+    for field, category in (("fraud_indicators", "fraud"), ("unusual_clauses", "unusual")):
+        stale = set(finding_labels(old_scan, category))
+        analysis_data[field] = [item for item in existing.get(field) or [] if item not in stale]
+    analysis_data["calculations"] = {"has_calculations": False, "financial_details": []}
+    return analysis_data
+
+async def get_document_text(document_id: str) -> Optional[str]:
+    stored = await db.document_texts.find_one({"document_id": document_id}, {"_id": 0, "text": 1})
+    return stored["text"] if stored else None
+
+async def analyze_in_chunks(text: str, analysis_prompt: str):
+    chunks = chunk_text(text, ANALYSIS_CHUNK_CHARS)
+    semaphore = asyncio.Semaphore(ANALYSIS_CHUNK_CONCURRENCY)
+    
+    async def analyze_chunk(index: int, chunk: str):
+        async with semaphore:
+            prompt = CHUNK_ANALYSIS_PROMPT.format(
+                part=index + 1, total=len(chunks), prompt=analysis_prompt, text=chunk
+            )
+            response = await llm_gateway.send(llm_chat.UserMessage(text=prompt), operation="analysis_chunk")
+            return await parse_analysis_response(response)
+    
+    results = await asyncio.gather(
+        *(analyze_chunk(i, chunk) for i, chunk in enumerate(chunks)),
+        return_exceptions=True
+    )
+    partials = [result for result in results if not isinstance(result, BaseException)]
+    failures = len(results) - len(partials)
+    if not partials:
+        raise results[0]
+    if failures:
+        logging.warning(f"Chunked analysis merged {len(partials)} of {len(chunks)} parts")
+    
+    merged = merge_analyses([data for data, _ in partials])
+    return merged, failures == 0 and all(parsed for _, parsed in partials)
+
+def merge_rule_findings(analysis_data: dict, scan: dict) -> dict:
+    """Fold deterministic rule matches into a model-produced analysis."""
+    for field, category in (("fraud_indicators", "fraud"), ("unusual_clauses", "unusual")):
+        analysis_data[field] = list(analysis_data.get(field) or []) + finding_labels(scan, category)
+    
+    risk_assessment = dict(analysis_data.get("risk_assessment") or {})
+    levels = [str(risk_assessment.get("overall_risk", "")).lower()]
+    if scan["findings"]:
+        levels.append(scan["risk"])
+    levels = [level for level in levels if level in SEVERITY_LEVELS]
+    risk_assessment["overall_risk"] = max(levels, key=SEVERITY_LEVELS.index) if levels else "medium"
+    analysis_data["risk_assessment"] = risk_assessment
+    return analysis_data
+
+def fast_analysis(text: str, scan: dict) -> dict:
+    """Rule-only analysis for fast mode; no model call."""
+    high = [f["description"] for f in scan["findings"] if f["severity"] == "high"]
+    summary = f"Fast scan found {len(scan['findings'])} potential issue(s)"
+    summary += f", {len(high)} of them high risk." if high else "."
+    return {
+        "document_type": classify_document(text),
+        "summary": summary + " Run a full analysis for a plain-English summary.",
+        "key_terms": [],
+        "calculations": None,
+        "risk_assessment": {
+            "overall_risk": scan["risk"],
+            "risk_factors": [f["description"] for f in scan["findings"]],
+            "recommendations": ["Have the flagged clauses reviewed before signing"] if high else []
+        },
+        "fraud_indicators": finding_labels(scan, "fraud"),
+        "unusual_clauses": finding_labels(scan, "unusual"),
+        "suggested_questions": []
+    }
+
+async def build_analysis(
+    document_id: str,
+    file_path: Optional[str],
+    content_type: str,
+    mode: str = "full"
+) -> tuple:
+    """Run the analysis pipeline and return (DocumentAnalysis, parsed) without storing it.
+    
+    Without `file_path` the stored text is analyzed instead of the original.
+    """
+    if file_path:
+        extracted = await extract_document_text(document_id, file_path, content_type)
+    else:
+        extracted = await db.document_texts.find_one({"document_id": document_id}, {"_id": 0})
+        if not extracted:
+            raise ValueError(f"No original or stored text for document {document_id}")
+    text = extracted["text"] if extracted else None
+    
+    # Loan maths is computed locally, so the model does not have to
+    calculations = await asyncio.to_thread(analyze_financials, text) if text else None
+    analysis_prompt = ANALYSIS_PROMPT + LOCAL_CALCULATIONS_NOTE if calculations else ANALYSIS_PROMPT
+    scan = await asyncio.to_thread(scan_text, text) if text else None
+    if mode == "fast" and scan is None:
+        logging.warning(f"No text for fast analysis of {document_id}; running full analysis")
+        mode = "full"
+    
+    # A near-duplicate of an analyzed document reuses its analysis instead of calling the model
+    reusable = None
+    if mode == "full" and extracted and extracted.get("minhash"):
+        reusable = await find_reusable_analysis(document_id, extracted)
+    
+    reused_from, similarity = None, None
+    if mode == "fast":
+        analysis_data, parsed = fast_analysis(text, scan), False
+    elif reusable:
+        existing, score = reusable
+        reused_from, similarity = existing["document_id"], round(score, 3)
+        analysis_data, parsed = adapt_analysis(existing, score, text, scan), False
+        mode = "near_duplicate"
+    elif text and (len(text) > CHUNKED_ANALYSIS_THRESHOLD or not file_path):
+        analysis_data, parsed = await analyze_in_chunks(text, analysis_prompt)
+    else:
+        # Send message with file
+        file_content = llm_chat.FileContentWithMimeType(
             file_path=file_path,
             mime_type=content_type
         )
-        
-        # Analysis prompt
-        analysis_prompt = """
-        Analyze this legal document comprehensively and return a JSON response with the following structure:
-        {
-            "document_type": "string (lease, loan, employment, terms_of_service, contract, etc.)",
-            "summary": "string (2-3 paragraph plain English summary)",
-            "key_terms": [
-                {"term": "legal term", "explanation": "plain English explanation"}
-            ],
-            "calculations": {
-                "has_calculations": boolean,
-                "financial_details": [
-                    {"type": "interest_rate/payment/fee", "amount": "value", "explanation": "description"}
-                ]
-            },
-            "risk_assessment": {
-                "overall_risk": "low/medium/high",
-                "risk_factors": ["list of risk factors"],
-                "recommendations": ["list of recommendations"]
-            },
-            "fraud_indicators": ["list of potential fraud indicators found"],
-            "unusual_clauses": ["list of unusual or concerning clauses"],
-            "suggested_questions": ["list of 5-7 questions user might want to ask about this document"]
-        }
-        
-        Focus on making everything accessible to non-lawyers while being thorough and accurate.
-        """
-        
-        # Send message with file
-        user_message = UserMessage(
+        user_message = llm_chat.UserMessage(
             text=analysis_prompt,
             file_contents=[file_content]
         )
+        response = await llm_gateway.send(user_message, operation="analysis")
+        analysis_data, parsed = await parse_analysis_response(response)
+    
+    if calculations:
+        analysis_data["calculations"] = calculations
+    if scan and mode in ("full", "near_duplicate"):
+        analysis_data = merge_rule_findings(analysis_data, scan)
+    
+    # Create analysis record
+    analysis = DocumentAnalysis(
+        document_id=document_id,
+        document_type=analysis_data.get("document_type", "unknown"),
+        summary=analysis_data.get("summary", ""),
+        key_terms=analysis_data.get("key_terms", []),
+        calculations=analysis_data.get("calculations"),
+        risk_assessment=analysis_data.get("risk_assessment", {}),
+        fraud_indicators=analysis_data.get("fraud_indicators", []),
+        suggested_questions=analysis_data.get("suggested_questions", []),
+        unusual_clauses=analysis_data.get("unusual_clauses", []),
+        analysis_mode=mode,
+        rule_findings=scan,
+        reused_from=reused_from,
+        similarity=similarity,
+        **(ANALYSIS_STAMP if mode != "fast" else {})
+    )
+    return analysis, parsed
+
+async def analyze_document(
+    document_id: str,
+    file_path: str,
+    content_type: str,
+    content_hash: Optional[str] = None,
+    mode: str = "full"
+):
+    try:
+        # Update status to analyzing
+        user_id = await set_analysis_status(document_id, "analyzing")
         
-        response = await chat.send_message(user_message)
-        
-        # Parse JSON response
-        import json
-        try:
-            analysis_data = json.loads(response)
-        except json.JSONDecodeError:
-            # If response isn't valid JSON, create a basic analysis
-            analysis_data = {
-                "document_type": "unknown",
-                "summary": response,
-                "key_terms": [],
-                "calculations": {"has_calculations": False, "financial_details": []},
-                "risk_assessment": {"overall_risk": "medium", "risk_factors": [], "recommendations": []},
-                "fraud_indicators": [],
-                "unusual_clauses": [],
-                "suggested_questions": []
-            }
-        
-        # Create analysis record
-        analysis = DocumentAnalysis(
-            document_id=document_id,
-            document_type=analysis_data.get("document_type", "unknown"),
-            summary=analysis_data.get("summary", ""),
-            key_terms=analysis_data.get("key_terms", []),
-            calculations=analysis_data.get("calculations"),
-            risk_assessment=analysis_data.get("risk_assessment", {}),
-            fraud_indicators=analysis_data.get("fraud_indicators", []),
-            suggested_questions=analysis_data.get("suggested_questions", []),
-            unusual_clauses=analysis_data.get("unusual_clauses", [])
+        analysis, parsed = await build_analysis(document_id, file_path, content_type, mode)
+        # Upserted, so a duplicate run (e.g. a recovered analysis) cannot leave two analyses
+        await db.document_analyses.update_one(
+            {"document_id": document_id}, {"$set": analysis.dict()}, upsert=True
         )
         
-        await db.document_analyses.insert_one(analysis.dict())
+        # Only well-formed analyses are worth reusing for identical uploads
+        if content_hash and parsed and user_id:
+            await analysis_cache.put(user_id, content_hash, analysis.dict())
         
         # Update document status
-        await db.documents.update_one(
-            {"id": document_id},
-            {"$set": {"analysis_status": "completed"}}
-        )
+        await set_analysis_status(document_id, "completed")
+        await index_document_for_search(document_id)
         
     except Exception as e:
         logging.error(f"Document analysis failed: {e}")
-        await db.documents.update_one(
-            {"id": document_id},
-            {"$set": {"analysis_status": "failed"}}
-        )
+        await set_analysis_status(document_id, "failed")
+
+async def reanalyze_document(stale: dict) -> str:
+    """Replace a stale analysis with one from the current prompt and model."""
+    document_id = stale["document_id"]
+    document = await db.documents.find_one(
+        {"id": document_id}, {"_id": 0, "user_id": 1, "file_type": 1, "content_hash": 1}
+    )
+    if not document:
+        return "skipped"
+    content_hash = document.get("content_hash")
+    
+    # An identical document of the same user may already have been refreshed
+    cached_analysis = await analysis_cache.get(document["user_id"], content_hash) if content_hash else None
+    if cached_analysis is not None:
+        analysis = DocumentAnalysis(document_id=document_id, **cached_analysis, **ANALYSIS_STAMP)
+        parsed, outcome = False, "cached"
+    else:
+        # Documents uploaded before the blob store fall back to their stored text
+        file_path = None
+        if content_hash and blob_store.path_for(content_hash).exists():
+            file_path = str(blob_store.path_for(content_hash))
+        analysis, parsed = await build_analysis(document_id, file_path, document["file_type"], "full")
+        outcome = "reanalyzed"
+        # A fallback analysis is no better than the stale one; the job counts the document as failed
+        if not parsed and analysis.analysis_mode != "near_duplicate":
+            raise ValueError("Model response could not be parsed; the previous analysis was kept")
+    
+    # The old analysis stays readable until the new one replaces it
+    await db.document_analyses.replace_one({"document_id": document_id}, analysis.dict(), upsert=True)
+    if content_hash and parsed:
+        await analysis_cache.put(document["user_id"], content_hash, analysis.dict())
+    await set_analysis_status(document_id, "completed")
+    await index_document_for_search(document_id)
+    return outcome
+
+reanalysis_jobs = ReanalysisJobs(
+    db.reanalysis_jobs,
+    db.document_analyses,
+    reanalyze_document,
+    target=ANALYSIS_STAMP,
+    batch_size=int(os.environ.get('REANALYSIS_BATCH_SIZE', '20')),
+    concurrency=int(os.environ.get('REANALYSIS_CONCURRENCY', '2')),
+    pause_seconds=float(os.environ.get('REANALYSIS_PAUSE_SECONDS', '1')),
+    # Hold off while the upload queue is more than half full
+    busy=lambda: analysis_queue.depth > analysis_queue.max_depth // 2
+)
 
 @api_router.get("/documents")
-async def get_user_documents(user_id: str = Depends(verify_token)):
-    documents = await db.documents.find({"user_id": user_id}, {"_id": 0}).sort("uploaded_at", -1).to_list(100)
-    return documents
+async def get_user_documents(
+    request: Request,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    user_id: str = Depends(verify_token)
+):
+    # Keyset pagination on (uploaded_at, id), newest first
+    query: Dict[str, Any] = {"user_id": user_id}
+    if cursor:
+        position = decode_cursor(cursor)
+        query["$or"] = [
+            {"uploaded_at": {"$lt": position["uploaded_at"]}},
+            {"uploaded_at": position["uploaded_at"], "id": {"$lt": position["id"]}}
+        ]
+    
+    documents = await db.documents.find(query, document_list_projection(fields)) \
+        .sort([("uploaded_at", -1), ("id", -1)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1])
+    
+    # Every other listed field is fixed at upload, so ids and versions determine the body
+    etag = make_etag(fields, next_cursor, *(f"{document['id']}:{document.get('version', 0)}" for document in documents))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, REVALIDATE_CACHE_CONTROL)
+    body = render_json({"documents": documents, "next_cursor": next_cursor})
+    return json_body_response(body, etag, REVALIDATE_CACHE_CONTROL)
+
+@api_router.get("/documents/search")
+async def search_documents(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    user_id: str = Depends(verify_token)
+):
+    # Declared before the /documents/{document_id} routes
+    started = time.perf_counter()
+    found = await search_index.search(user_id, q, limit)
+    
+    # Hits that only matched the body text get their snippet from the stored text
+    missing = [result for result in found["results"] if result["snippet"] is None]
+    if missing:
+        texts = db.document_texts.find(
+            {"document_id": {"$in": [result["document_id"] for result in missing]}},
+            {"_id": 0, "document_id": 1, "text": 1}
+        )
+        by_id = {stored["document_id"]: stored.get("text", "") async for stored in texts}
+        for result in missing:
+            result["snippet"] = snippet(by_id.get(result["document_id"], ""), found["terms"])
+            if result["snippet"] is not None:
+                result["snippet"]["field"] = "text"
+    
+    return {
+        "query": q,
+        "total": found["total"],
+        "results": found["results"],
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+@api_router.get("/documents/{document_id}/status")
+async def get_document_status(document_id: str, user_id: str = Depends(verify_token)):
+    # Cheap enough to poll while the analysis runs
+    document = await db.documents.find_one(
+        {"id": document_id, "user_id": user_id},
+        {"_id": 0, "id": 1, "analysis_status": 1, "version": 1}
+    )
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {
+        "document_id": document["id"],
+        "analysis_status": document["analysis_status"],
+        "version": document.get("version", 0)
+    }
+
+def analysis_cache_control(document: dict) -> str:
+    if document.get("analysis_status") == "completed":
+        return COMPLETED_ANALYSIS_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
 
 @api_router.get("/documents/{document_id}/analysis")
-async def get_document_analysis(document_id: str, user_id: str = Depends(verify_token)):
-    # Verify document belongs to user
-    document = await db.documents.find_one({"id": document_id, "user_id": user_id}, {"_id": 0})
+async def get_document_analysis(document_id: str, request: Request, user_id: str = Depends(verify_token)):
+    # A point lookup decides whether the client's copy is current before anything is rebuilt
+    document = await db.documents.find_one(
+        {"id": document_id, "user_id": user_id}, {"_id": 0, "version": 1, "analysis_status": 1}
+    )
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
+    version = document.get("version", 0)
+    etag = make_etag(document_id, version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, analysis_cache_control(document))
     
-    analysis = await db.document_analyses.find_one({"document_id": document_id}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Analysis not found")
-    
+    body = analysis_bodies.get(document_id, version)
+    if body is None:
+        # Ownership check and analysis lookup in a single query
+        result = await get_owned_document_with_analysis(document_id, user_id)
+        body = render_json(result)
+        # The document may have moved on since the lookup above; tag the body with what it was built from
+        document = result["document"]
+        version = document.get("version", 0)
+        etag = make_etag(document_id, version)
+        analysis_bodies.put(document_id, version, body)
+    return json_body_response(body, etag, analysis_cache_control(document))
+
+@api_router.post("/documents/analyses")
+async def get_document_analyses(request: DocumentIdsRequest, user_id: str = Depends(verify_token)):
+    document_ids = list(dict.fromkeys(request.document_ids))
+    results = await find_documents_with_analyses(
+        {"id": {"$in": document_ids}, "user_id": user_id},
+        limit=len(document_ids)
+    )
+    found = {result["document"]["id"] for result in results}
     return {
-        "document": document,
-        "analysis": analysis
+        "results": results,
+        "missing": [document_id for document_id in document_ids if document_id not in found]
     }
 
-@api_router.post("/documents/{document_id}/reply")
-async def generate_reply_letter(
+@api_router.get("/documents/{document_id}/text")
+async def get_document_extracted_text(document_id: str, user_id: str = Depends(verify_token)):
+    document = await db.documents.find_one({"id": document_id, "user_id": user_id}, {"_id": 0, "id": 1})
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    extracted = await db.document_texts.find_one(
+        {"document_id": document_id},
+        {"_id": 0, "minhash": 0, "lsh_bands": 0, "user_id": 0}
+    )
+    if not extracted:
+        raise HTTPException(status_code=404, detail="Extracted text not found")
+    return extracted
+
+@api_router.get("/documents/{document_id}/similar")
+async def get_similar_documents(
     document_id: str,
-    user_responses: Dict[str, str],
+    min_similarity: float = Query(0.5, ge=0.3, le=1.0),
+    limit: int = Query(10, ge=1, le=50),
     user_id: str = Depends(verify_token)
 ):
-    # Verify document belongs to user
-    document = await db.documents.find_one({"id": document_id, "user_id": user_id}, {"_id": 0})
+    document = await db.documents.find_one({"id": document_id, "user_id": user_id}, {"_id": 0, "id": 1})
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Get analysis
-    analysis = await db.document_analyses.find_one({"document_id": document_id}, {"_id": 0})
-    if not analysis:
-        raise HTTPException(status_code=404, detail="Analysis not found")
-    
-    # Generate reply letter
-    chat = get_ai_chat()
+    stored = await db.document_texts.find_one(
+        {"document_id": document_id}, {"_id": 0, "minhash": 1, "lsh_bands": 1}
+    )
+    if not stored:
+        raise HTTPException(status_code=404, detail="Extracted text not found")
+    # Too little text for a meaningful signature
+    if not stored.get("minhash"):
+        return {"document_id": document_id, "similar": []}
     
+    similar = (await find_similar_documents(
+        document_id, user_id, stored["minhash"], stored["lsh_bands"], min_similarity
+    ))[:limit]
+    documents = await db.documents.find(
+        {"id": {"$in": [doc_id for doc_id, _ in similar]}, "user_id": user_id},
+        {"_id": 0, "id": 1, "filename": 1, "uploaded_at": 1, "analysis_status": 1}
+    ).to_list(len(similar))
+    by_id = {document["id"]: document for document in documents}
+    return {
+        "document_id": document_id,
+        "similar": [
+            {**by_id[doc_id], "similarity": round(score, 3)} for doc_id, score in similar if doc_id in by_id
+        ]
+    }
+
+def hash_user_responses(user_responses: Dict[str, str]) -> str:
+    """Canonical hash, so whitespace and key order do not defeat memoization."""
+    normalized = {
+        " ".join(str(key).split()): " ".join(str(value).split())
+        for key, value in user_responses.items()
+    }
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def build_reply_message(analysis: dict, document_text: str, user_responses: Dict[str, str]):
     reply_prompt = f"""
     Based on the document analysis and user responses, generate a professional reply letter.
     
     Document Type: {analysis['document_type']}
     Document Summary: {analysis['summary']}
     
+    Document Excerpt:
+    {document_text[:REPLY_CONTEXT_CHARS]}
+    
     User Responses to Questions:
     {json.dumps(user_responses, indent=2)}
     
@@ -338,35 +1479,244 @@ async def generate_reply_letter(
     
     Return only the letter content, no additional formatting or JSON.
     """
-    
-    user_message = UserMessage(text=reply_prompt)
-    generated_letter = await chat.send_message(user_message)
-    
-    # Save reply letter
+    return llm_chat.UserMessage(text=reply_prompt)
+
+async def find_memoized_reply(document_id: str, analysis_id: str, responses_hash: str) -> Optional[dict]:
+    return await db.reply_letters.find_one(
+        {
+            "document_id": document_id,
+            "analysis_id": analysis_id,
+            "responses_hash": responses_hash,
+            "created_at": {"$gte": datetime.now(timezone.utc) - timedelta(seconds=REPLY_CACHE_TTL)}
+        },
+        {"_id": 0},
+        sort=[("created_at", -1)]
+    )
+
+async def save_reply_letter(
+    document_id: str,
+    analysis_id: str,
+    user_responses: Dict[str, str],
+    responses_hash: str,
+    generated_letter: str
+) -> ReplyLetter:
     reply = ReplyLetter(
         document_id=document_id,
+        analysis_id=analysis_id,
         user_responses=user_responses,
+        responses_hash=responses_hash,
         generated_letter=generated_letter
     )
     await db.reply_letters.insert_one(reply.dict())
+    return reply
+
+@api_router.post("/documents/{document_id}/calculations/scenarios")
+async def calculate_scenarios(
+    document_id: str,
+    request: ScenarioRequest,
+    user_id: str = Depends(verify_token)
+):
+    analysis = (await get_owned_document_with_analysis(document_id, user_id))["analysis"]
+    inputs = (analysis.get("calculations") or {}).get("inputs") or {}
+    principals = request.principals or ([inputs["principal"]] if "principal" in inputs else None)
+    rates = request.annual_rates or ([inputs["annual_rate"]] if "annual_rate" in inputs else None)
+    terms = request.term_months or ([inputs["term_months"]] if "term_months" in inputs else None)
+    if not (principals and rates and terms):
+        raise HTTPException(status_code=400, detail="Principal, rate and term are required for this document")
+    fees = request.fees if request.fees is not None else sum(fee["amount"] for fee in inputs.get("fees", []))
+    if len(principals) * len(rates) * len(terms) > MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SCENARIOS} scenarios per request")
     
-    return {"reply_id": reply.id, "letter": generated_letter}
+    # Every principal x rate x term combination in one vectorized pass
+    grid = np.meshgrid(principals, rates, terms, indexing="ij")
+    results = compute_scenarios(*(axis.ravel() for axis in grid), fees)
+    # The APR is undefined (NaN) when the fees swallow the principal
+    scenarios = [
+        {name: round(float(values[i]), 3 if name == "apr" else 2) if np.isfinite(values[i]) else None
+         for name, values in results.items()}
+        for i in range(len(results["monthly_payment"]))
+    ]
+    return {"document_id": document_id, "scenarios": scenarios}
+
+@api_router.post("/documents/{document_id}/reply")
+async def generate_reply_letter(
+    document_id: str,
+    user_responses: Dict[str, str],
+    user_id: str = Depends(verify_token)
+):
+    # Verify document belongs to user and get its analysis
+    analysis = (await get_owned_document_with_analysis(document_id, user_id))["analysis"]
+    responses_hash = hash_user_responses(user_responses)
+    
+    async def generate():
+        # Resubmissions of the same answers reuse the stored letter
+        memoized = await find_memoized_reply(document_id, analysis["id"], responses_hash)
+        if memoized:
+            return memoized["id"], memoized["generated_letter"], True
+        
+        document_text = await get_document_text(document_id) or ""
+        user_message = build_reply_message(analysis, document_text, user_responses)
+        generated_letter = await llm_gateway.send(user_message, operation="reply", key=user_id)
+        
+        # Save reply letter
+        reply = await save_reply_letter(document_id, analysis["id"], user_responses, responses_hash, generated_letter)
+        return reply.id, generated_letter, False
+    
+    # Concurrent identical requests share a single generation
+    (reply_id, letter, cached), shared = await reply_flights.run(
+        (document_id, analysis["id"], responses_hash), generate
+    )
+    return {"reply_id": reply_id, "letter": letter, "cached": cached or shared}
+
+@api_router.post("/documents/{document_id}/reply/stream")
+async def stream_reply_letter(
+    document_id: str,
+    user_responses: Dict[str, str],
+    user_id: str = Depends(verify_token)
+):
+    # Ownership and analysis errors surface as normal HTTP errors before streaming starts
+    analysis = (await get_owned_document_with_analysis(document_id, user_id))["analysis"]
+    responses_hash = hash_user_responses(user_responses)
+    memoized = await find_memoized_reply(document_id, analysis["id"], responses_hash)
+    
+    async def letter_events():
+        yield format_sse("start", {"document_id": document_id})
+        if memoized:
+            yield format_sse("token", {"text": memoized["generated_letter"]})
+            yield format_sse("done", {"reply_id": memoized["id"], "cached": True})
+            return
+        
+        document_text = await get_document_text(document_id) or ""
+        user_message = build_reply_message(analysis, document_text, user_responses)
+        pieces = []
+        try:
+            async for piece in llm_gateway.stream(user_message, operation="reply", key=user_id):
+                pieces.append(piece)
+                yield format_sse("token", {"text": piece})
+        except Exception as e:
+            logging.error(f"Reply streaming failed: {e}")
+            yield format_sse("error", {"detail": "Reply generation failed"})
+            return
+        reply = await save_reply_letter(document_id, analysis["id"], user_responses, responses_hash, "".join(pieces))
+        yield format_sse("done", {"reply_id": reply.id, "cached": False})
+    
+    return StreamingResponse(letter_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@api_router.post("/documents/events/token")
+async def issue_events_token(user_id: str = Depends(verify_token)):
+    return {"token": create_events_token(user_id), "expires_in": EVENTS_TOKEN_TTL}
+
+@api_router.get("/documents/events")
+async def stream_document_events(request: Request, user_id: str = Depends(verify_events_token)):
+    queue = status_broker.subscribe(user_id)
+    
+    async def status_events():
+        try:
+            # Documents still in flight, so clients start from a consistent view
+            in_progress = await db.documents.find(
+                {"user_id": user_id, "analysis_status": {"$in": ["pending", "analyzing"]}},
+                {"_id": 0, "id": 1, "analysis_status": 1}
+            ).to_list(100)
+            for document in in_progress:
+                yield format_sse("status", {"document_id": document["id"], "analysis_status": document["analysis_status"]})
+            
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse("status", event)
+        finally:
+            status_broker.unsubscribe(user_id, queue)
+    
+    return StreamingResponse(status_events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 # Health check
 @api_router.get("/")
 async def root():
     return {"message": "Legal Document Analyzer API", "status": "active"}
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/stats")
+async def get_stats():
+    return {
+        "analysis_queue": analysis_queue.stats(),
+        "admission": {"upload": upload_admission.stats(), "reply": reply_admission.stats()},
+        "analysis_cache": analysis_cache.stats(),
+        "llm": llm_gateway.stats(),
+        "analysis_parser": analysis_parser.stats(),
+        "status_events": status_broker.stats(),
+        "reply_flights": {"coalesced": reply_flights.coalesced},
+        "search": search_index.stats(),
+        "blobs": blob_store.stats(),
+        "analysis_bodies": analysis_bodies.stats(),
+        "reanalysis": reanalysis_jobs.stats(),
+        "indexes": index_report
+    }
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.post("/admin/blobs/gc")
+async def collect_blob_garbage(user_id: str = Depends(verify_admin)):
+    return await blob_store.collect_garbage()
+
+@api_router.post("/admin/reanalysis", status_code=202)
+async def start_reanalysis(user_id: str = Depends(verify_admin)):
+    try:
+        job = await reanalysis_jobs.start(requested_by=user_id)
+    except ReanalysisJobRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return ReanalysisJobs.progress(job)
+
+@api_router.get("/admin/reanalysis/{job_id}")
+async def get_reanalysis(job_id: str, user_id: str = Depends(verify_admin)):
+    job = await reanalysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Re-analysis job not found")
+    return job
+
+@api_router.post("/admin/reanalysis/{job_id}/cancel")
+async def cancel_reanalysis(job_id: str, user_id: str = Depends(verify_admin)):
+    job = await reanalysis_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Re-analysis job not found")
+    return ReanalysisJobs.progress(job)
+
+ANALYSIS_STATUSES = ["pending", "analyzing", "completed", "failed"]
+# The status distribution scans every document, so scrapes within this many seconds share one count
+METRICS_STATUS_TTL = float(os.environ.get('METRICS_STATUS_TTL', '60'))
+status_counts_cache: Dict[str, Any] = {"counted_at": None, "counts": None}
+status_counts_lock = asyncio.Lock()
+
+async def document_status_counts() -> Dict[tuple, int]:
+    async with status_counts_lock:
+        counted_at = status_counts_cache["counted_at"]
+        if counted_at is None or time.monotonic() - counted_at >= METRICS_STATUS_TTL:
+            counts = {(status,): 0 for status in ANALYSIS_STATUSES}
+            async for row in db.documents.aggregate([{"$group": {"_id": "$analysis_status", "count": {"$sum": 1}}}]):
+                counts[(row["_id"] or "unknown",)] = row["count"]
+            status_counts_cache.update(counted_at=time.monotonic(), counts=counts)
+        return status_counts_cache["counts"]
+
+@api_router.get("/metrics")
+async def get_metrics():
+    status_counts = await document_status_counts()
+    queue = analysis_queue.stats()
+    llm = llm_gateway.stats()
+    extra = metrics.render_gauge(
+        "legalai_documents", "Documents by analysis status", ("analysis_status",), status_counts
+    )
+    extra += metrics.render_gauge(
+        "legalai_analysis_queue_depth", "Analysis jobs waiting for a worker", (), {(): queue["depth"]}
+    )
+    extra += metrics.render_gauge(
+        "legalai_analysis_queue_lanes", "Users with analysis jobs waiting", (), {(): queue["lanes"]}
+    )
+    extra += metrics.render_gauge(
+        "legalai_llm_in_flight", "Model calls holding a concurrency slot", (), {(): llm["in_flight"]}
+    )
+    extra += metrics.render_gauge(
+        "legalai_llm_waiting", "Model calls waiting for a concurrency slot", (), {(): llm["waiting"]}
+    )
+    return PlainTextResponse(metrics.render(extra), media_type=metrics.CONTENT_TYPE)
 
 # Configure logging
 logging.basicConfig(
@@ -375,6 +1725,249 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
+index_report: Dict[str, List[str]] = {}
+
+async def provision_indexes():
+    specs = (
+        INDEX_SPECS + analysis_cache.index_specs() + blob_store.index_specs()
+        + reanalysis_jobs.index_specs() + search_index.index_specs()
+    )
+    index_report.update(await ensure_indexes(db, specs))
+    if os.environ.get('VERIFY_QUERY_PLANS', '').lower() in ('1', 'true', 'yes'):
+        plans = await explain_route_queries(db)
+        logger.info(f"Query plans: {plans}")
+
+def start_analysis_workers():
+    analysis_queue.start()
+
+async def sweep_blobs_periodically():
+    while True:
+        await asyncio.sleep(BLOB_GC_INTERVAL)
+        try:
+            await blob_store.collect_garbage()
+        except Exception as e:
+            logger.error(f"Blob sweep failed: {e}")
+
+def start_blob_sweeper():
+    global blob_gc_task
+    if BLOB_GC_INTERVAL > 0:
+        blob_gc_task = asyncio.create_task(sweep_blobs_periodically(), name="blob-gc")
+
+async def recover_stalled_documents() -> Dict[str, int]:
+    """Re-queue analyses lost with a stopped worker; fail them when the original is gone."""
+    report = {"requeued": 0, "completed": 0, "failed": 0}
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ANALYSIS_RECOVERY_GRACE)
+    # Live workers refresh status_updated_at of everything they hold, so only orphans are this old
+    stalled_query = {"analysis_status": {"$in": ["pending", "analyzing"]}, "$or": [
+        {"status_updated_at": {"$lt": cutoff}},
+        # Documents stored before status_updated_at existed
+        {"status_updated_at": {"$exists": False}, "uploaded_at": {"$lt": cutoff}}
+    ]}
+    stalled = await db.documents.find(
+        stalled_query,
+        {"_id": 0, "id": 1, "user_id": 1, "file_type": 1, "content_hash": 1, "analysis_mode": 1, "version": 1}
+    ).to_list(None)
+    
+    for document in stalled:
+        if document["id"] in active_analyses:
+            continue
+        # Claim through the version, and only while still stalled, so one worker recovers each document
+        version = {"version": document["version"]} if "version" in document else {"version": {"$exists": False}}
+        claimed = await db.documents.find_one_and_update(
+            {"id": document["id"], **version, **stalled_query},
+            {"$set": {"status_updated_at": datetime.now(timezone.utc)}, "$inc": {"version": 1}}
+        )
+        if claimed is None:
+            continue
+        
+        # Stopped after storing the analysis but before marking it completed
+        if await db.document_analyses.find_one({"document_id": document["id"]}, {"_id": 0, "id": 1}):
+            await set_analysis_status(document["id"], "completed")
+            report["completed"] += 1
+            continue
+        
+        content_hash = document.get("content_hash")
+        file_path = blob_store.path_for(content_hash) if content_hash else None
+        if file_path is None or not file_path.exists():
+            await set_analysis_status(document["id"], "failed")
+            report["failed"] += 1
+            continue
+        try:
+            submit_analysis(
+                document["id"], str(file_path), document["file_type"], content_hash,
+                document.get("analysis_mode", "full"), lane=document["user_id"]
+            )
+            report["requeued"] += 1
+        except QueueFullError:
+            # Picked up again by a later sweep
+            break
+    
+    if any(report.values()):
+        logger.info(f"Recovered stalled analyses: {report}")
+    return report
+
+async def refresh_active_analyses():
+    """Heartbeat for the analyses this process holds, queued or running."""
+    if active_analyses:
+        await db.documents.update_many(
+            {"id": {"$in": list(active_analyses)}, "analysis_status": {"$in": ["pending", "analyzing"]}},
+            {"$set": {"status_updated_at": datetime.now(timezone.utc)}}
+        )
+
+async def recover_stalled_documents_periodically():
+    recovered_at = None
+    while True:
+        try:
+            await refresh_active_analyses()
+        except Exception as e:
+            logger.error(f"Analysis heartbeat failed: {e}")
+        if recovered_at is None or time.monotonic() - recovered_at >= ANALYSIS_RECOVERY_INTERVAL:
+            recovered_at = time.monotonic()
+            try:
+                await recover_stalled_documents()
+                # Re-analysis jobs whose process died are picked up here too
+                await reanalysis_jobs.resume()
+            except Exception as e:
+                logger.error(f"Stalled analysis recovery failed: {e}")
+        await asyncio.sleep(min(ANALYSIS_HEARTBEAT_INTERVAL, ANALYSIS_RECOVERY_INTERVAL))
+
+def start_stalled_document_recovery():
+    global recovery_task
+    recovery_task = asyncio.create_task(recover_stalled_documents_periodically(), name="analysis-recovery")
+
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    if blob_gc_task is not None:
+        blob_gc_task.cancel()
+    if recovery_task is not None:
+        recovery_task.cancel()
+    await reanalysis_jobs.stop()
+    await analysis_queue.drain(timeout=ANALYSIS_DRAIN_TIMEOUT)
+    password_executor.shutdown(wait=False)
+    extraction_executor.shutdown(wait=False, cancel_futures=True)
+    mongo.close()
+
+# Readiness, filled in by the warm-up that runs after startup
+startup_state: Dict[str, Any] = {"started_at": None, "warm_up_seconds": None, "warm_up_error": None}
+warm_up_task: Optional[asyncio.Task] = None
+
+async def warm_up_step(name: str, step: Callable[[], Awaitable[Any]]):
+    # Retried until it succeeds: Mongo and the other dependencies may still be coming up alongside this worker
+    delay = 0.5
+    while True:
+        try:
+            return await step()
+        except Exception as e:
+            startup_state["warm_up_error"] = f"{name}: {e}"
+            logger.warning(f"Warm-up step {name} failed, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARM_UP_MAX_BACKOFF)
+
+async def warm_up():
+    """Connect and load everything the first requests would otherwise wait for."""
+    started = time.monotonic()
+    await warm_up_step("mongo", lambda: mongo.warm(MONGO_MIN_POOL_SIZE, timeout=MONGO_WARM_TIMEOUT))
+    await warm_up_step("indexes", provision_indexes)
+    # Jobs interrupted by the last shutdown continue from their checkpoint
+    await warm_up_step("reanalysis", reanalysis_jobs.resume)
+    await warm_up_step("llm_sdk", lambda: asyncio.to_thread(llm_chat.load))
+    # Loads the bcrypt backend, which passlib otherwise does on the first login
+    await warm_up_step("password_hashing", lambda: asyncio.get_running_loop().run_in_executor(
+        password_executor, password_context().dummy_verify
+    ))
+    
+    startup_state["warm_up_error"] = None
+    startup_state["warm_up_seconds"] = round(time.monotonic() - started, 3)
+    logger.info(f"Warm-up finished in {startup_state['warm_up_seconds']}s")
+
+async def readiness_checks() -> Dict[str, Dict[str, Any]]:
+    checks: Dict[str, Dict[str, Any]] = {}
+    try:
+        latency = await mongo.ping(timeout=READINESS_TIMEOUT)
+        checks["mongo"] = {"ok": True, "latency_ms": round(latency * 1000, 2)}
+    except Exception as e:
+        checks["mongo"] = {"ok": False, "error": str(e) or type(e).__name__}
+    # A full queue is answered with 429s by admission control; it does not make the worker unready
+    checks["analysis_queue"] = {"ok": analysis_queue.running, "depth": analysis_queue.depth}
+    checks["warm_up"] = {
+        "ok": startup_state["warm_up_seconds"] is not None,
+        "seconds": startup_state["warm_up_seconds"],
+        "error": startup_state["warm_up_error"],
+    }
+    checks["indexes"] = {"ok": bool(index_report) and not index_report.get("failed"), "failed": index_report.get("failed", [])}
+    return checks
+
+@api_router.get("/health/live")
+async def health_live():
+    # Only says the event loop is serving; dependencies are covered by /health/ready
+    uptime = time.monotonic() - startup_state["started_at"] if startup_state["started_at"] else 0.0
+    return {"status": "alive", "uptime_seconds": round(uptime, 3)}
+
+@api_router.get("/health/ready")
+async def health_ready():
+    checks = await readiness_checks()
+    # Index failures are reported but do not take the worker out of rotation
+    ready = all(check["ok"] for name, check in checks.items() if name != "indexes")
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "checks": checks},
+        status_code=200 if ready else 503
+    )
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    global warm_up_task
+    startup_state["started_at"] = time.monotonic()
+    blob_store.prepare()
+    start_analysis_workers()
+    start_blob_sweeper()
+    start_stalled_document_recovery()
+    # Serving starts right away; /api/health/ready reports when the warm-up is done
+    warm_up_task = asyncio.create_task(warm_up(), name="warm-up")
+    try:
+        yield
+    finally:
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+        await shutdown_db_client()
+
+def create_app() -> FastAPI:
+    """Build the app. Connections are made and dependencies loaded in its lifespan, not at import."""
+    application = FastAPI(lifespan=lifespan)
+    application.include_router(api_router)
+    
+    # Quotas are checked before upload bodies are read
+    application.add_middleware(
+        AdmissionMiddleware,
+        rules=[
+            ("POST", r"^/api/documents/upload$", upload_admission, analysis_queue),
+            ("POST", r"^/api/documents/batch$", upload_admission, analysis_queue),
+            ("POST", r"^/api/documents/[^/]+/reply(?:/stream)?$", reply_admission, None),
+        ],
+        identify=user_id_from_scope
+    )
+
+    # Outside admission, so a declared oversize body is turned away without spending quota
+    application.add_middleware(
+        UploadSizeLimitMiddleware,
+        paths=["/api/documents/upload"],
+        max_body_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+    )
+
+    application.add_middleware(
+        UploadSizeLimitMiddleware,
+        paths=["/api/documents/batch"],
+        max_body_bytes=MAX_BATCH_BYTES + MAX_BATCH_FILES * MULTIPART_OVERHEAD_BYTES
+    )
+
+    application.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Outermost, so rejected and failed requests are timed too
+    application.add_middleware(RouteMetricsMiddleware, routes=application.routes)
+    return application
+
+app = create_app()
@@ -0,0 +1,508 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+SAMPLE_CLAUSES = [
+    "The Borrower shall repay the principal amount together with interest at the rate stated above. ",
+    "This Agreement shall renew automatically for successive one-year terms unless terminated. ",
+    "Any dispute shall be resolved by binding arbitration and the parties waive trial by jury. ",
+    "Tenant shall maintain the premises in good condition and return all keys upon termination. ",
+    "A balloon payment of the remaining balance is due on the maturity date. ",
+    "Notices shall be delivered in writing to the addresses set out in Schedule A. ",
+]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+    }
+
+
+class LegalAIBenchmark:
+    def __init__(self, base_url="http://localhost:8001"):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+
+    def register_user(self):
+        email = f"bench_{uuid.uuid4().hex[:12]}@example.com"
+        password = "BenchPass123!"
+        response = requests.post(f"{self.api_url}/auth/register", json={"email": email, "password": password})
+        response.raise_for_status()
+        return email, password
+
+    def probe_latency(self, stop_event, samples, endpoint="/"):
+        """Hit a cheap endpoint in a loop until stop_event is set"""
+        session = requests.Session()
+        while not stop_event.is_set():
+            started = time.perf_counter()
+            session.get(f"{self.api_url}{endpoint}")
+            samples.append(time.perf_counter() - started)
+
+    def measure_baseline(self, duration=2.0):
+        samples = []
+        stop_event = threading.Event()
+        prober = threading.Thread(target=self.probe_latency, args=(stop_event, samples))
+        prober.start()
+        time.sleep(duration)
+        stop_event.set()
+        prober.join()
+        return summarize(samples)
+
+    def login_burst(self, logins=200, concurrency=50):
+        """p99 of an unrelated endpoint while a burst of logins runs"""
+        email, password = self.register_user()
+
+        def login(_):
+            started = time.perf_counter()
+            response = requests.post(f"{self.api_url}/auth/login", json={"email": email, "password": password})
+            return response.status_code, time.perf_counter() - started
+
+        probe_samples = []
+        stop_event = threading.Event()
+        prober = threading.Thread(target=self.probe_latency, args=(stop_event, probe_samples))
+        prober.start()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(login, range(logins)))
+        elapsed = time.perf_counter() - started
+
+        stop_event.set()
+        prober.join()
+
+        login_samples = [duration for status, duration in results if status == 200]
+        return {
+            "logins": logins,
+            "concurrency": concurrency,
+            "failed_logins": sum(1 for status, _ in results if status != 200),
+            "logins_per_second": round(logins / elapsed, 2),
+            "login_latency": summarize(login_samples),
+            "unrelated_endpoint_latency": summarize(probe_samples),
+        }
+
+
+def rules_throughput(megabytes=5, rounds=5):
+    """Single-pass rule scan throughput over a synthetic contract corpus"""
+    sys.path.insert(0, BACKEND_DIR)
+    from rules import RULES, scan_text
+
+    paragraph = "".join(SAMPLE_CLAUSES)
+    text = paragraph * (megabytes * 1024 * 1024 // len(paragraph) + 1)
+    size_mb = len(text.encode()) / (1024 * 1024)
+
+    scan_text(text[:10000])
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = scan_text(text)
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    return {
+        "rules": len(RULES),
+        "corpus_mb": round(size_mb, 2),
+        "findings": len(result["findings"]),
+        "best_seconds": round(best, 4),
+        "mb_per_second": round(size_mb / best, 2),
+        "median_mb_per_second": round(size_mb / sorted(timings)[len(timings) // 2], 2),
+    }
+
+
+FAKE_ANALYSIS = {
+    "document_type": "loan",
+    "summary": "A personal loan agreement with monthly repayments.",
+    "key_terms": [{"term": "Principal", "explanation": "The amount borrowed"}],
+    "calculations": {"has_calculations": False, "financial_details": []},
+    "risk_assessment": {"overall_risk": "medium", "risk_factors": [], "recommendations": []},
+    "fraud_indicators": [],
+    "unusual_clauses": [],
+    "suggested_questions": ["Can the loan be repaid early without a fee?"],
+}
+
+LOAN_TERMS = (
+    "The Lender agrees to lend the principal amount of $12,000.00 at an interest rate of 7.5% per annum, "
+    "repaid over a term of 36 months. An origination fee of $250 is payable at closing. "
+)
+
+
+class FakeLlmChat:
+    """Stand-in for LlmChat with configurable latency and failure rate"""
+
+    def __init__(self, latency=0.2, jitter=0.05, failure_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+    async def send_message(self, message):
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if random.random() < self.failure_rate:
+            # Worded like a provider error so the gateway treats it as transient
+            raise RuntimeError("503 model overloaded")
+        if "reply letter" in getattr(message, "text", ""):
+            return "Dear Lender,\n\nI am writing regarding the loan agreement.\n\nSincerely,\nBorrower"
+        return "```json\n" + json.dumps(FAKE_ANALYSIS) + "\n```"
+
+
+def stub_llm_sdk():
+    """Stand-in emergentintegrations module when the SDK is not installed; only the message types are used"""
+    try:
+        import emergentintegrations.llm.chat  # noqa: F401
+        return False
+    except ImportError:
+        pass
+    import types
+
+    class UserMessage:
+        def __init__(self, text, file_contents=None):
+            self.text = text
+            self.file_contents = file_contents or []
+
+    class FileContentWithMimeType:
+        def __init__(self, file_path, mime_type):
+            self.file_path = file_path
+            self.mime_type = mime_type
+
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.UserMessage = UserMessage
+    chat.FileContentWithMimeType = FileContentWithMimeType
+    # The gateway's chat_factory is replaced with FakeLlmChat, so LlmChat itself is never called
+    chat.LlmChat = lambda *args, **kwargs: FakeLlmChat()
+    package = types.ModuleType("emergentintegrations")
+    llm = types.ModuleType("emergentintegrations.llm")
+    package.llm, llm.chat = llm, chat
+    sys.modules.update({
+        "emergentintegrations": package,
+        "emergentintegrations.llm": llm,
+        "emergentintegrations.llm.chat": chat,
+    })
+    return True
+
+
+def load_app(llm_latency, llm_failure_rate):
+    """Import the backend against an in-memory Mongo (or a scratch local database) and a fake LLM"""
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = f"benchmark_{uuid.uuid4().hex[:8]}"
+    # The fake model needs no client-side throttling
+    os.environ.setdefault("LLM_RATE_PER_SECOND", "10000")
+    os.environ.setdefault("LLM_BURST", "10000")
+
+    try:
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+        motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+        mongo = "mongomock"
+    except ImportError:
+        mongo = os.environ["MONGO_URL"]
+    stub_llm_sdk()
+
+    import server
+    server.llm_gateway.chat_factory = lambda: FakeLlmChat(llm_latency, failure_rate=llm_failure_rate)
+    return server, mongo
+
+
+class InProcessBenchmark:
+    """Drives the FastAPI app in-process through httpx, recording latency per route"""
+
+    def __init__(self, server, users=20, concurrency=10, poll_interval=0.05, analysis_timeout=60.0):
+        self.server = server
+        self.users = users
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.analysis_timeout = analysis_timeout
+        self.samples = {}
+        self.errors = {}
+        self.elapsed = {}
+
+    async def timed(self, route, coro, expected=()):
+        started = time.perf_counter()
+        try:
+            response = await coro
+        except Exception:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            raise
+        self.samples.setdefault(route, []).append(time.perf_counter() - started)
+        if response.status_code >= 400 and response.status_code not in expected:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+    async def phase(self, name, func, items):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(item):
+            async with semaphore:
+                return await func(item)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run(item) for item in items))
+        self.elapsed[name] = time.perf_counter() - started
+        return results
+
+    async def run(self):
+        import httpx
+
+        app = self.server.app
+        password = "BenchPass123!"
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+                emails = [f"bench_{uuid.uuid4().hex[:12]}@example.com" for _ in range(self.users)]
+
+                async def register(email):
+                    await self.timed("POST /auth/register", client.post(
+                        "/api/auth/register", json={"email": email, "password": password}))
+
+                async def login(email):
+                    response = await self.timed("POST /auth/login", client.post(
+                        "/api/auth/login", json={"email": email, "password": password}))
+                    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+                async def upload(headers):
+                    # Unique content per user so every upload is analyzed rather than served from the cache
+                    content = (LOAN_TERMS + "".join(SAMPLE_CLAUSES) * 20 + uuid.uuid4().hex).encode()
+                    started = time.perf_counter()
+                    response = await self.timed("POST /documents/upload", client.post(
+                        "/api/documents/upload", headers=headers,
+                        files={"file": ("agreement.txt", content, "text/plain")}))
+                    if response.status_code != 202:
+                        # Counted as an upload error; nothing to analyze
+                        self.errors["analysis (end to end)"] = self.errors.get("analysis (end to end)", 0) + 1
+                        return None
+                    return headers, response.json()["document_id"], started
+
+                async def poll(upload_result):
+                    if upload_result is None:
+                        return None
+                    headers, document_id, started = upload_result
+                    deadline = started + self.analysis_timeout
+                    while time.perf_counter() < deadline:
+                        response = await self.timed("GET /documents/{id}/analysis", client.get(
+                            f"/api/documents/{document_id}/analysis", headers=headers), expected=(404,))
+                        # 404 until the analysis is stored
+                        if response.status_code == 200:
+                            # Upload to completed analysis, as a user would see it
+                            self.samples.setdefault("analysis (end to end)", []).append(time.perf_counter() - started)
+                            return headers, document_id
+                        await asyncio.sleep(self.poll_interval)
+                    self.errors["analysis (end to end)"] = self.errors.get("analysis (end to end)", 0) + 1
+                    return None
+
+                async def list_documents(headers):
+                    await self.timed("GET /documents", client.get("/api/documents", headers=headers))
+
+                async def reply(analyzed):
+                    headers, document_id = analyzed
+                    await self.timed("POST /documents/{id}/reply", client.post(
+                        f"/api/documents/{document_id}/reply", headers=headers,
+                        json={"Can the loan be repaid early without a fee?": "I plan to repay within a year."}))
+
+                await self.phase("POST /auth/register", register, emails)
+                tokens = await self.phase("POST /auth/login", login, emails)
+                uploads = await self.phase("POST /documents/upload", upload, tokens)
+                analyzed = await self.phase("GET /documents/{id}/analysis", poll, uploads)
+                self.elapsed["analysis (end to end)"] = self.elapsed["GET /documents/{id}/analysis"]
+                await self.phase("GET /documents", list_documents, tokens)
+                await self.phase("POST /documents/{id}/reply", reply, [item for item in analyzed if item])
+
+            await self.server.mongo.client.drop_database(os.environ["DB_NAME"])
+        return self.report()
+
+    def report(self):
+        report = {}
+        # Routes that only ever failed have errors but no samples
+        for route in list(self.samples) + [route for route in self.errors if route not in self.samples]:
+            samples = self.samples.get(route, [])
+            summary = summarize(samples)
+            summary["errors"] = self.errors.get(route, 0)
+            summary["rps"] = round(len(samples) / self.elapsed[route], 2) if self.elapsed.get(route) else 0.0
+            report[route] = summary
+        return report
+
+
+def compare_to_baseline(report, baseline, tolerance=0.2):
+    """Routes whose p95 grew or throughput fell by more than `tolerance` against the baseline"""
+    regressions = []
+    for route, current in report.items():
+        previous = baseline.get(route)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: rps {previous['rps']} -> {current['rps']}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{route}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def startup_probe():
+    """Cold start in this interpreter: import, lifespan startup, first response, readiness"""
+    # Importing must not need Mongo settings
+    mongo_url = os.environ.pop("MONGO_URL", None)
+    db_name = os.environ.pop("DB_NAME", None)
+    sys.path.insert(0, BACKEND_DIR)
+    started = time.perf_counter()
+    import server
+    imported = time.perf_counter()
+
+    os.environ["MONGO_URL"] = mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = db_name or f"benchmark_{uuid.uuid4().hex[:8]}"
+    try:
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+        motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+    except ImportError:
+        pass
+    stub_llm_sdk()
+
+    async def run():
+        import httpx
+
+        timings = {"import": imported - started}
+        app = server.app
+        async with app.router.lifespan_context(app):
+            timings["lifespan startup"] = time.perf_counter() - imported
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                await client.get("/api/health/live")
+                timings["first request"] = time.perf_counter() - imported
+                deadline = time.perf_counter() + 60
+                while (await client.get("/api/health/ready")).status_code != 200:
+                    if time.perf_counter() > deadline:
+                        raise RuntimeError("backend did not become ready within 60s")
+                    await asyncio.sleep(0.01)
+                timings["ready"] = time.perf_counter() - imported
+            await server.mongo.client.drop_database(os.environ["DB_NAME"])
+        return timings
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def startup_benchmark(rounds):
+    """Import and first-request times over fresh interpreters, as an autoscaled worker sees them"""
+    samples = {}
+    failures = 0
+    for _ in range(rounds):
+        result = subprocess.run(
+            [sys.executable, "-c", "import backend_benchmark; backend_benchmark.startup_probe()"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            failures += 1
+            print(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "startup probe failed")
+            continue
+        for phase, seconds in json.loads(result.stdout.strip().splitlines()[-1]).items():
+            samples.setdefault(phase, []).append(seconds)
+    report = {}
+    for phase, phase_samples in samples.items():
+        summary = summarize(phase_samples)
+        summary["errors"] = failures
+        summary["rps"] = 0.0
+        report[phase] = summary
+    return report
+
+
+def check_baseline(report, args):
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_to_baseline(report, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print(f"\n✅ No regressions against {args.baseline}")
+    return 0
+
+
+def app_benchmark(args):
+    server, mongo = load_app(args.llm_latency, args.llm_failure_rate)
+    print(f"   mongo: {mongo}, fake LLM latency {args.llm_latency}s, failure rate {args.llm_failure_rate}")
+    bench = InProcessBenchmark(server, users=args.users, concurrency=args.concurrency)
+    report = asyncio.run(bench.run())
+    for route, summary in report.items():
+        print_summary(route, summary)
+    status = check_baseline(report, args)
+    failed = {route: summary["errors"] for route, summary in report.items() if summary["errors"]}
+    if failed:
+        print(f"\n❌ Errors: {failed}")
+        return 1
+    return status
+
+
+def print_summary(title, summary):
+    print(f"\n📊 {title}")
+    for key, value in summary.items():
+        print(f"   {key}: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Legal AI backend benchmarks")
+    parser.add_argument("suite", nargs="?", choices=["login", "rules", "app", "startup"], default="login")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--megabytes", type=int, default=5)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--baseline", help="compare against a saved baseline and exit non-zero on regressions")
+    parser.add_argument("--save-baseline", help="write this run's results as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print("🚀 Starting Legal AI Backend Benchmarks")
+    print("=" * 50)
+
+    if args.suite == "rules":
+        print_summary("Rule engine throughput", rules_throughput(args.megabytes))
+        return 0
+
+    if args.suite == "app":
+        return app_benchmark(args)
+
+    if args.suite == "startup":
+        report = startup_benchmark(args.rounds)
+        for phase, summary in report.items():
+            print_summary(f"Cold start: {phase}", summary)
+        return check_baseline(report, args)
+
+    bench = LegalAIBenchmark(args.base_url)
+    print_summary("Idle GET /api/ latency", bench.measure_baseline())
+    print_summary("Login burst", bench.login_burst(args.logins, args.concurrency))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -186,7 +186,7 @@ class LegalAITester:
                     "Document Upload",
                     "POST",
                     "/documents/upload",
-                    200,
+                    202,
                     files=files
                 )
                 
@@ -242,7 +242,7 @@ class LegalAITester:
         )
         
         if success:
-            print(f"   Found {len(response)} documents")
+            print(f"   Found {len(response.get('documents', []))} documents")
             return True
         return False
 
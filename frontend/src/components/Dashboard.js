@@ -23,7 +23,9 @@ const API = `${BACKEND_URL}/api`;
 const Dashboard = ({ onLogout }) => {
   const navigate = useNavigate();
   const [documents, setDocuments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [uploading, setUploading] = useState(false);
   const [dragActive, setDragActive] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
@@ -33,10 +35,12 @@ const Dashboard = ({ onLogout }) => {
     fetchDocuments();
   }, []);
 
+  // The list is paginated newest first; next_cursor is null on the last page
   const fetchDocuments = async () => {
     try {
       const response = await axios.get(`${API}/documents`);
-      setDocuments(response.data);
+      setDocuments(response.data.documents);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching documents:', error);
     } finally {
@@ -44,6 +48,20 @@ const Dashboard = ({ onLogout }) => {
     }
   };
 
+  const loadMoreDocuments = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API}/documents`, { params: { cursor: nextCursor } });
+      setDocuments((loaded) => [...loaded, ...response.data.documents]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading more documents:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleFileUpload = async (files) => {
     if (!files || files.length === 0) return;
     
@@ -181,7 +199,7 @@ const Dashboard = ({ onLogout }) => {
             <div className="bg-blue-100 p-3 rounded-xl inline-block mb-3">
               <FileText className="h-6 w-6 text-blue-600" />
             </div>
-            <div className="text-2xl font-bold text-slate-800">{stats.total}</div>
+            <div className="text-2xl font-bold text-slate-800">{stats.total}{nextCursor ? '+' : ''}</div>
             <div className="text-slate-600 text-sm">Total Documents</div>
           </div>
           
@@ -350,7 +368,7 @@ const Dashboard = ({ onLogout }) => {
               <div className="text-center py-12">
                 <FileText className="h-16 w-16 text-slate-300 mx-auto mb-4" />
                 <h3 className="text-lg font-medium text-slate-600 mb-2">
-                  {documents.length === 0 ? 'No documents uploaded yet' : 'No documents match your search'}
+                  {documents.length === 0 ? 'No documents uploaded yet' : 'No loaded documents match your search'}
                 </h3>
                 <p className="text-slate-500 mb-6">
                   {documents.length === 0 
@@ -409,6 +427,18 @@ const Dashboard = ({ onLogout }) => {
               ))
             )}
           </div>
+
+          {nextCursor && (
+            <div className="mt-6 text-center">
+              <button
+                onClick={loadMoreDocuments}
+                disabled={loadingMore}
+                className="btn-secondary inline-flex items-center disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more documents'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -21,32 +21,149 @@ import {
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Analysis runs in the background after upload; follow its status over server-sent events,
+// falling back to polling when the stream is unavailable
+const STATUS_POLL_INTERVAL_MS = 2000;
+const STATUS_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
 const DocumentAnalysis = () => {
   const { documentId } = useParams();
   const navigate = useNavigate();
   const [data, setData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [analysisStatus, setAnalysisStatus] = useState('');
   const [activeTab, setActiveTab] = useState('summary');
   const [replyQuestions, setReplyQuestions] = useState({});
   const [generatingReply, setGeneratingReply] = useState(false);
   const [generatedReply, setGeneratedReply] = useState('');
 
   useEffect(() => {
-    fetchAnalysis();
-  }, [documentId]);
+    let cancelled = false;
+    let finished = false;
+    let timer = null;
+    let timeout = null;
+    let events = null;
+    const startedAt = Date.now();
 
-  const fetchAnalysis = async () => {
-    try {
-      const response = await axios.get(`${API}/documents/${documentId}/analysis`);
-      setData(response.data);
-    } catch (err) {
-      setError('Failed to load document analysis');
-      console.error('Error fetching analysis:', err);
-    } finally {
+    const stopWaiting = () => {
+      finished = true;
+      clearTimeout(timer);
+      clearTimeout(timeout);
+      if (events) {
+        events.close();
+        events = null;
+      }
+    };
+
+    const fail = (message, err) => {
+      if (cancelled || finished) return;
+      stopWaiting();
+      if (err) console.error('Error fetching analysis:', err);
+      setError(message);
       setLoading(false);
-    }
-  };
+    };
+
+    // Returns true once the status is final
+    const handleStatus = async (status) => {
+      if (finished) return true;
+      setAnalysisStatus(status);
+      if (status === 'completed') {
+        stopWaiting();
+        try {
+          const response = await axios.get(`${API}/documents/${documentId}/analysis`);
+          if (cancelled) return true;
+          setData(response.data);
+        } catch (err) {
+          if (cancelled) return true;
+          console.error('Error fetching analysis:', err);
+          setError('Failed to load document analysis');
+        }
+        setLoading(false);
+        return true;
+      }
+      if (status === 'failed') {
+        fail('The analysis of this document failed. Please upload it again.');
+        return true;
+      }
+      return false;
+    };
+
+    const pollStatus = async () => {
+      try {
+        const statusResponse = await axios.get(`${API}/documents/${documentId}/status`);
+        if (cancelled || finished) return;
+        if (await handleStatus(statusResponse.data.analysis_status)) return;
+        if (Date.now() - startedAt > STATUS_POLL_TIMEOUT_MS) {
+          fail('The analysis is taking longer than expected. Please check back later from your dashboard.');
+        } else {
+          timer = setTimeout(pollStatus, STATUS_POLL_INTERVAL_MS);
+        }
+      } catch (err) {
+        if (cancelled) return;
+        fail('Failed to load document analysis', err);
+      }
+    };
+
+    const fallBackToPolling = () => {
+      if (events) {
+        events.close();
+        events = null;
+      }
+      if (!cancelled && !finished) pollStatus();
+    };
+
+    const waitForAnalysis = async () => {
+      try {
+        const statusResponse = await axios.get(`${API}/documents/${documentId}/status`);
+        if (cancelled) return;
+        if (await handleStatus(statusResponse.data.analysis_status)) return;
+
+        if (typeof EventSource === 'undefined') {
+          fallBackToPolling();
+          return;
+        }
+        const tokenResponse = await axios.post(`${API}/documents/events/token`);
+        if (cancelled || finished) return;
+        events = new EventSource(`${API}/documents/events?token=${encodeURIComponent(tokenResponse.data.token)}`);
+        events.addEventListener('status', (event) => {
+          const update = JSON.parse(event.data);
+          if (update.document_id === documentId) handleStatus(update.analysis_status);
+        });
+        // The token is short-lived, so a dropped stream is not reconnected; polling takes over
+        events.onerror = fallBackToPolling;
+        // A status published before the stream opened would otherwise be missed
+        events.onopen = () => {
+          axios.get(`${API}/documents/${documentId}/status`)
+            .then((response) => {
+              if (!cancelled && !finished) handleStatus(response.data.analysis_status);
+            })
+            .catch(() => {});
+        };
+        timeout = setTimeout(() => {
+          fail('The analysis is taking longer than expected. Please check back later from your dashboard.');
+        }, STATUS_POLL_TIMEOUT_MS);
+      } catch (err) {
+        if (cancelled) return;
+        if (!err.response) {
+          fail('Failed to load document analysis', err);
+        } else {
+          // The status itself loaded; only the event stream could not be set up
+          fallBackToPolling();
+        }
+      }
+    };
+
+    setData(null);
+    setError('');
+    setLoading(true);
+    waitForAnalysis();
+
+    return () => {
+      cancelled = true;
+      stopWaiting();
+    };
+  }, [documentId]);
 
   const handleGenerateReply = async () => {
     if (Object.keys(replyQuestions).length === 0) {
@@ -95,7 +212,11 @@ const DocumentAnalysis = () => {
       <div className="min-h-screen bg-gradient-to-br from-slate-50 to-blue-50 flex items-center justify-center">
         <div className="text-center">
           <div className="animate-spin rounded-full h-16 w-16 border-b-2 border-blue-600 mx-auto mb-4"></div>
-          <p className="text-slate-600">Loading analysis...</p>
+          <p className="text-slate-600">
+            {analysisStatus === 'pending' || analysisStatus === 'analyzing'
+              ? 'Analyzing your document, this can take a minute...'
+              : 'Loading analysis...'}
+          </p>
         </div>
       </div>
     );
@@ -81,7 +81,7 @@ const UploadPage = () => {
       });
       setUploadSuccess(true);
       
-      // Redirect to analysis after a short delay
+      // Redirect after a short delay; the analysis page waits for the queued analysis to finish
       setTimeout(() => {
         navigate(`/document/${response.data.document_id}`);
       }, 3000);
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from starlette.responses import JSONResponse
+
+import ratelimit
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, retry_after_header
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def controller(**overrides):
+    options = dict(name="upload", user_rate=1.0, user_burst=3, global_rate=10.0, global_burst=5)
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_user_quota_rejects_with_retry_after(clock):
+    uploads = controller()
+    for _ in range(3):
+        uploads.admit("alice")
+    with pytest.raises(AdmissionRejected) as rejected:
+        uploads.admit("alice")
+    assert rejected.value.reason == "user_quota"
+    assert rejected.value.retry_after == pytest.approx(1.0)
+    # Other users have their own bucket
+    uploads.admit("bob")
+    clock[0] += 1.0
+    uploads.admit("alice")
+    assert uploads.stats()["rejected"] == {"user_quota": 1}
+
+
+def test_global_quota_refunds_the_user_bucket(clock):
+    uploads = controller(user_burst=10, global_burst=2)
+    uploads.admit("alice")
+    uploads.admit("bob")
+    with pytest.raises(AdmissionRejected) as rejected:
+        uploads.admit("carol")
+    assert rejected.value.reason == "global_quota"
+    assert uploads._users["carol"].tokens == 10
+
+
+def test_settle_charges_or_refunds_the_difference(clock):
+    uploads = controller(user_burst=10, global_burst=20)
+    uploads.admit("alice")
+    uploads.settle("alice", paid=1, cost=4)
+    assert uploads._users["alice"].tokens == 6
+    uploads.settle("alice", paid=4, cost=0)
+    assert uploads._users["alice"].tokens == 10
+    uploads.settle("alice", paid=0, cost=10)
+    with pytest.raises(AdmissionRejected):
+        uploads.settle("alice", paid=1, cost=2)
+
+
+def test_cost_above_burst_is_let_through_on_a_full_bucket(clock):
+    uploads = controller(user_burst=3, global_burst=50)
+    uploads.settle("alice", paid=0, cost=8)
+    assert uploads._users["alice"].tokens == 0
+
+
+def test_least_recent_users_are_forgotten(clock):
+    uploads = controller(max_users=2)
+    for user in ("a", "b", "c"):
+        uploads.admit(user)
+    assert list(uploads._users) == ["b", "c"]
+
+
+def test_retry_after_header_is_bounded():
+    assert retry_after_header(0.2) == "1"
+    assert retry_after_header(2.1) == "3"
+    assert retry_after_header(10**6) == "3600"
+
+
+class Queue:
+    def __init__(self, accept=True):
+        self.accept = accept
+
+    def can_accept(self, lane, weight=1):
+        return self.accept
+
+    def estimated_wait(self):
+        return 7.0
+
+
+def call(middleware, method="POST", path="/upload"):
+    sent = []
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]
+
+
+def app_returning(status):
+    async def app(scope, receive, send):
+        await JSONResponse({}, status_code=status)(scope, receive, send)
+    return app
+
+
+@pytest.mark.parametrize("status, tokens", [(202, 2), (400, 3), (413, 3), (422, 3), (429, 2)])
+def test_middleware_refunds_requests_the_route_rejects(clock, status, tokens):
+    uploads = controller()
+    middleware = AdmissionMiddleware(
+        app_returning(status), rules=[("POST", r"^/upload$", uploads, Queue())], identify=lambda scope: "alice"
+    )
+    assert call(middleware)["status"] == status
+    assert uploads._users["alice"].tokens == tokens
+
+
+def test_middleware_rejects_before_the_route(clock):
+    uploads = controller(user_burst=1)
+    routed = []
+
+    async def app(scope, receive, send):
+        routed.append(scope["path"])
+        await app_returning(202)(scope, receive, send)
+
+    middleware = AdmissionMiddleware(app, rules=[("POST", r"^/upload$", uploads, Queue())], identify=lambda scope: "alice")
+    assert call(middleware)["status"] == 202
+    response = call(middleware)
+    assert response["status"] == 429
+    assert (b"retry-after", b"1") in response["headers"]
+
+    full = AdmissionMiddleware(app, rules=[("POST", r"^/upload$", controller(), Queue(accept=False))], identify=lambda scope: "bob")
+    response = call(full)
+    assert response["status"] == 429
+    assert (b"retry-after", b"7") in response["headers"]
+
+    # Unmatched routes and anonymous callers go straight through
+    call(middleware, method="GET")
+    anonymous = AdmissionMiddleware(app, rules=[("POST", r"^/upload$", uploads, Queue())], identify=lambda scope: None)
+    assert call(anonymous)["status"] == 202
+    assert routed == ["/upload", "/upload", "/upload"]
@@ -0,0 +1,56 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from analysis_cache import CACHED_FIELDS, AnalysisCache
+
+ANALYSIS = {
+    "id": "analysis-1",
+    "document_id": "document-1",
+    "document_type": "lease",
+    "summary": "A residential lease.",
+    "key_terms": [],
+    "risk_assessment": {"overall_risk": "low"},
+}
+
+
+def test_hits_are_scoped_to_user_and_version():
+    async def main():
+        collection = AsyncMongoMockClient().test.analysis_cache
+        cache = AnalysisCache(collection, version="2:model:1")
+        await cache.put("alice", "hash-1", ANALYSIS)
+        hit = await cache.get("alice", "hash-1")
+        # Another user's upload of the same content must not reveal the first one
+        other_user = await cache.get("bob", "hash-1")
+        other_content = await cache.get("alice", "hash-2")
+        newer = await AnalysisCache(collection, version="3:model:1").get("alice", "hash-1")
+        return cache, hit, other_user, other_content, newer
+
+    cache, hit, other_user, other_content, newer = asyncio.run(main())
+    assert hit == {field: ANALYSIS.get(field) for field in CACHED_FIELDS}
+    assert "id" not in hit and "document_id" not in hit
+    assert other_user is None and other_content is None and newer is None
+    assert cache.stats() == {"version": "2:model:1", "hits": 1, "misses": 2, "stores": 1, "hit_ratio": 0.3333}
+
+
+def test_put_replaces_the_entry():
+    async def main():
+        collection = AsyncMongoMockClient().test.analysis_cache
+        cache = AnalysisCache(collection, version="v")
+        await cache.put("alice", "hash-1", ANALYSIS)
+        await cache.put("alice", "hash-1", {**ANALYSIS, "summary": "Updated."})
+        return await collection.count_documents({}), await cache.get("alice", "hash-1")
+
+    count, hit = asyncio.run(main())
+    assert count == 1
+    assert hit["summary"] == "Updated."
+
+
+def test_entries_expire_through_a_ttl_index():
+    cache = AnalysisCache(AsyncMongoMockClient().test.analysis_cache, version="v", ttl_seconds=600)
+    specs = {spec["name"]: spec for spec in cache.index_specs()}
+    assert specs["created_at_ttl"]["keys"] == [("created_at", 1)]
+    assert specs["created_at_ttl"]["expireAfterSeconds"] == 600
+    lookup = specs["user_id_content_hash_version"]
+    assert lookup["unique"]
+    assert lookup["keys"] == [("user_id", 1), ("content_hash", 1), ("analysis_version", 1)]
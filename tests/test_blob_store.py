@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from blob_store import BlobStore, mapped_file
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BlobStore(tmp_path / "blobs", AsyncMongoMockClient().test.blobs, gc_grace_seconds=3600)
+    store.prepare()
+    return store
+
+
+def upload(store, data: bytes) -> tuple:
+    sha256 = hashlib.sha256(data).hexdigest()
+    temp = store.tmp_dir / f"upload-{time.monotonic_ns()}"
+    temp.write_bytes(data)
+    return str(temp), sha256, len(data)
+
+
+def backdate(path, seconds=7200):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+async def age_records(store, seconds=7200):
+    await store.collection.update_many(
+        {}, {"$set": {"updated_at": datetime.now(timezone.utc) - timedelta(seconds=seconds)}}
+    )
+
+
+def test_identical_uploads_share_one_blob(store):
+    async def main():
+        first = await store.add(*upload(store, b"lease text"))
+        second = await store.add(*upload(store, b"lease text"))
+        record = await store.collection.find_one({}, {"_id": 0})
+        return first, second, record
+
+    first, second, record = asyncio.run(main())
+    assert first == second
+    assert open(first, "rb").read() == b"lease text"
+    assert record["refcount"] == 2 and record["size"] == 10
+    assert (store.stored, store.deduplicated) == (1, 1)
+    assert list(store.tmp_dir.iterdir()) == []
+
+
+def test_unreferenced_blobs_are_collected_after_the_grace_period(store):
+    async def main():
+        temp, sha256, size = upload(store, b"old contract")
+        path = await store.add(temp, sha256, size)
+        await store.release(sha256)
+        early = await store.collect_garbage()
+        await age_records(store)
+        late = await store.collect_garbage()
+        return path, early, late, await store.collection.count_documents({})
+
+    path, early, late, records = asyncio.run(main())
+    assert early["collected"] == 0
+    assert late["collected"] == 1 and late["bytes_freed"] == len(b"old contract")
+    assert not os.path.exists(path)
+    assert records == 0
+    assert list(store.trash_dir.iterdir()) == []
+
+
+def test_referenced_blobs_are_kept(store):
+    async def main():
+        path = await store.add(*upload(store, b"live contract"))
+        await age_records(store)
+        backdate(path)
+        return path, await store.collect_garbage()
+
+    path, report = asyncio.run(main())
+    assert report["collected"] == report["orphans"] == 0
+    assert os.path.exists(path)
+
+
+def test_orphans_and_abandoned_uploads_are_removed(store):
+    async def main():
+        # A blob without a record, as after a crash between the rename and the insert
+        data = b"orphan"
+        orphan = store.path_for(hashlib.sha256(data).hexdigest())
+        orphan.parent.mkdir(parents=True)
+        orphan.write_bytes(data)
+        backdate(orphan)
+        abandoned = store.tmp_dir / "upload-abandoned"
+        abandoned.write_bytes(b"partial")
+        backdate(abandoned)
+        fresh = store.tmp_dir / "upload-in-progress"
+        fresh.write_bytes(b"partial")
+        return orphan, abandoned, fresh, await store.collect_garbage()
+
+    orphan, abandoned, fresh, report = asyncio.run(main())
+    assert (report["orphans"], report["abandoned_uploads"]) == (1, 1)
+    assert not orphan.exists() and not abandoned.exists()
+    assert fresh.exists()
+
+
+def test_paths_only_for_digests(store):
+    with pytest.raises(ValueError):
+        store.path_for("../../etc/passwd")
+
+
+def test_mapped_file(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(b"abc")
+    with mapped_file(path) as data:
+        assert bytes(data[:]) == b"abc"
+    path.write_bytes(b"")
+    with mapped_file(path) as data:
+        assert data == b""
@@ -0,0 +1,70 @@
+from chunking import chunk_text, merge_analyses, split_sections
+
+
+CONTRACT = (
+    "Preamble text before any heading.\n"
+    "ARTICLE I\nThe parties agree as follows.\n"
+    "Section 2. Payment\nRent is due on the first of each month.\n"
+    "3.1 Termination\nEither party may terminate with notice.\n"
+)
+
+
+def test_split_sections_at_headings():
+    sections = split_sections(CONTRACT)
+    assert sections[0].startswith("Preamble")
+    assert [section.split("\n", 1)[0] for section in sections[1:]] == [
+        "ARTICLE I", "Section 2. Payment", "3.1 Termination"
+    ]
+    assert "".join(sections) == CONTRACT
+
+
+def test_chunk_text_keeps_sections_whole():
+    chunks = chunk_text(CONTRACT, max_chars=90)
+    assert "".join(chunks) == CONTRACT
+    assert all(len(chunk) <= 90 for chunk in chunks)
+    for section in split_sections(CONTRACT):
+        assert any(section in chunk for chunk in chunks)
+
+
+def test_chunk_text_splits_oversize_sections():
+    text = "ARTICLE I\n" + "word " * 500
+    chunks = chunk_text(text, max_chars=200)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_merge_single_partial_is_unchanged():
+    partial = {"document_type": "lease", "summary": "A lease."}
+    assert merge_analyses([partial]) is partial
+
+
+def test_merge_analyses():
+    merged = merge_analyses([
+        {
+            "document_type": "loan",
+            "summary": "First part.",
+            "key_terms": [{"term": "Principal", "explanation": "Amount borrowed"}],
+            "risk_assessment": {"overall_risk": "low", "risk_factors": ["Fee"], "recommendations": []},
+            "fraud_indicators": ["Wire transfer"],
+            "suggested_questions": ["Is there a prepayment penalty?"],
+        },
+        {
+            "document_type": "loan",
+            "summary": "Second part.",
+            "key_terms": [{"term": "principal ", "explanation": "Duplicate"}],
+            "calculations": {"has_calculations": True, "financial_details": [{"type": "apr", "amount": "7%"}]},
+            "risk_assessment": {"overall_risk": "high", "risk_factors": ["fee"], "recommendations": ["Ask"]},
+            "fraud_indicators": ["wire transfer"],
+            "suggested_questions": ["Is there a prepayment penalty?"],
+        },
+        {"document_type": "unknown", "summary": ""},
+    ])
+    assert merged["document_type"] == "loan"
+    assert merged["summary"] == "First part.\n\nSecond part."
+    assert len(merged["key_terms"]) == 1
+    assert merged["calculations"]["has_calculations"] is True
+    assert merged["risk_assessment"]["overall_risk"] == "high"
+    assert merged["risk_assessment"]["risk_factors"] == ["Fee"]
+    assert merged["fraud_indicators"] == ["Wire transfer"]
+    assert merged["suggested_questions"] == ["Is there a prepayment penalty?"]
@@ -0,0 +1,50 @@
+from conditional import SerializedBodyCache, etag_matches, json_body_response, make_etag, not_modified, render_json
+
+
+def test_etag_is_stable_and_sensitive_to_every_part():
+    etag = make_etag("doc-1", 3)
+    assert etag == make_etag("doc-1", 3)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag != make_etag("doc-1", 4)
+    # Parts are delimited, so shifting characters between them changes the tag
+    assert make_etag("ab", "c") != make_etag("a", "bc")
+
+
+def test_if_none_match_comparison():
+    etag = make_etag("doc-1", 3)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_responses_carry_validators():
+    etag = make_etag("x")
+    response = not_modified(etag, "private, no-cache")
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == etag
+    body = render_json({"b": 1, "a": [1.5, None]})
+    assert body == b'{"b":1,"a":[1.5,null]}'
+    response = json_body_response(body, etag, "private, no-cache")
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_body_cache_checks_versions_and_evicts_least_recent():
+    cache = SerializedBodyCache(max_entries=2)
+    cache.put("a", 1, b"A1")
+    cache.put("b", 1, b"B1")
+    assert cache.get("a", 1) == b"A1"
+    # Changed by another process: the stored version no longer matches
+    assert cache.get("b", 2) is None
+    cache.put("c", 1, b"C1")
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == b"A1"
+    cache.invalidate("a")
+    cache.invalidate("a")
+    assert cache.get("a", 1) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["invalidations"], stats["entries"]) == (2, 1, 1)
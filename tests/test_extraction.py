@@ -0,0 +1,68 @@
+import pytest
+
+from extraction import (
+    DOCX_TYPE,
+    PAGE_SEPARATOR,
+    TEXT_TYPE,
+    ExtractionError,
+    extract_text,
+    find_sections,
+    normalize_text,
+)
+
+
+def test_normalize_text():
+    raw = "Re-\npayment  of\tthe\r\nloan \x00is\n\n\n\n due\r ﬁnally "
+    assert normalize_text(raw) == "Repayment of the\nloan is\n\ndue\nfinally"
+
+
+def test_find_sections():
+    text = "Preamble\nARTICLE 1. Parties\nThe lender.\n2. Repayment\nMonthly."
+    sections = find_sections(text)
+    assert [section["title"] for section in sections] == ["ARTICLE 1. Parties", "2. Repayment"]
+    assert sections[0]["end"] == sections[1]["start"]
+    assert sections[-1]["end"] == len(text)
+
+
+def test_extracts_text_files(tmp_path):
+    path = tmp_path / "lease.txt"
+    path.write_text("SECTION 1. Rent\r\nThe tenant pays   monthly.\n", encoding="utf-8")
+    result = extract_text(str(path), TEXT_TYPE)
+    assert result["text"] == "SECTION 1. Rent\nThe tenant pays monthly."
+    assert result["char_count"] == len(result["text"])
+    assert result["pages"] == [{"page": 1, "start": 0, "end": len(result["text"])}]
+    assert result["sections"][0]["title"] == "SECTION 1. Rent"
+
+
+def test_text_falls_back_to_latin1(tmp_path):
+    path = tmp_path / "legacy.txt"
+    path.write_bytes("Caf\xe9 lease".encode("latin-1"))
+    assert extract_text(str(path), TEXT_TYPE)["text"] == "Café lease"
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    assert extract_text(str(path), TEXT_TYPE)["text"] == ""
+
+
+def test_docx_paragraphs_and_tables(tmp_path):
+    docx = pytest.importorskip("docx")
+    document = docx.Document()
+    document.add_paragraph("LOAN AGREEMENT")
+    document.add_paragraph("The borrower repays monthly.")
+    table = document.add_table(rows=1, cols=2)
+    table.rows[0].cells[0].text = "Principal"
+    table.rows[0].cells[1].text = "$12,000"
+    path = tmp_path / "loan.docx"
+    document.save(str(path))
+    result = extract_text(str(path), DOCX_TYPE)
+    assert result["text"] == "LOAN AGREEMENT\nThe borrower repays monthly.\nPrincipal | $12,000"
+    assert PAGE_SEPARATOR not in result["text"]
+
+
+def test_unsupported_type(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"\x89PNG")
+    with pytest.raises(ExtractionError):
+        extract_text(str(path), "image/png")
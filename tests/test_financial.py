@@ -0,0 +1,82 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from financial import amortization_schedule, analyze_financials, compute_scenarios, extract_loan_terms
+
+LOAN = (
+    "The Lender agrees to lend the principal amount of $12,000.00 at an interest rate of 7.5% per annum, "
+    "repaid over a term of 36 months. An origination fee of $250 is payable at closing."
+)
+
+
+def test_extract_loan_terms():
+    terms = extract_loan_terms(LOAN)
+    assert terms == {
+        "principal": 12000.0,
+        "annual_rate": 7.5,
+        "term_months": 36,
+        "fees": [{"name": "origination fee", "amount": 250.0}],
+    }
+    assert extract_loan_terms("The tenant pays rent monthly.") is None
+
+
+def test_extract_loan_terms_in_years_and_percent_fees():
+    terms = extract_loan_terms(
+        "Loan amount of $10,000 with interest at 5% for a period of 2 years. Processing fee of 1.5%."
+    )
+    assert terms["term_months"] == 24
+    assert terms["fees"] == [{"name": "processing fee", "amount": 150.0}]
+
+
+def test_compute_scenarios_payment():
+    result = compute_scenarios(12000, 7.5, 36)
+    assert float(result["monthly_payment"]) == pytest.approx(373.27, abs=0.01)
+    assert float(result["apr"]) == pytest.approx(7.5)
+
+
+def test_compute_scenarios_zero_rate():
+    result = compute_scenarios(1200, 0.0, 12)
+    assert float(result["monthly_payment"]) == pytest.approx(100.0)
+    assert float(result["total_interest"]) == pytest.approx(0.0)
+
+
+def test_apr_includes_fees():
+    result = compute_scenarios([12000, 12000], 7.5, 36, [0, 250])
+    assert result["apr"][0] == pytest.approx(7.5)
+    assert result["apr"][1] > 7.5
+
+
+def test_apr_is_nan_when_fees_reach_principal():
+    result = compute_scenarios([1000, 1000], 5.0, 12, [1000, 1500])
+    assert np.isnan(result["apr"]).all()
+
+
+def test_amortization_schedule_pays_off():
+    schedule = amortization_schedule(12000, 7.5, 36)
+    assert len(schedule) == 36
+    assert schedule[-1]["balance"] == 0
+    assert sum(row["principal"] for row in schedule) == pytest.approx(12000, abs=0.5)
+
+
+def test_analyze_financials():
+    result = analyze_financials(LOAN)
+    assert result["source"] == "local"
+    assert result["monthly_payment"] == pytest.approx(373.27, abs=0.01)
+    assert result["total_fees"] == 250.0
+    assert result["apr"] > 7.5
+    assert "apr" in [detail["type"] for detail in result["financial_details"]]
+
+
+def test_analyze_financials_never_stores_non_finite_values():
+    result = analyze_financials(
+        "The principal amount of $1,000 at an interest rate of 5% for a term of 12 months. "
+        "Origination fee of $1,200."
+    )
+    assert result["apr"] is None
+    assert "apr" not in [detail["type"] for detail in result["financial_details"]]
+    # Stored analyses are served with allow_nan=False
+    json.dumps(result, allow_nan=False)
+    assert all(math.isfinite(value) for value in (result["monthly_payment"], result["total_cost"]))
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from job_queue import JobQueue, QueueFullError, current_lane
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_jobs_run_and_drain():
+    async def main():
+        queue = JobQueue(workers=2, max_depth=10)
+        queue.start()
+        done = []
+
+        async def job(value):
+            await asyncio.sleep(0)
+            done.append((value, current_lane.get()))
+
+        for value in range(5):
+            queue.submit(job, value, lane="user")
+        await queue.drain(timeout=5)
+        return queue, done
+
+    queue, done = run(main())
+    assert sorted(done) == [(value, "user") for value in range(5)]
+    assert queue.stats()["completed"] == 5
+    assert not queue.running
+
+
+def test_lanes_are_served_round_robin():
+    async def main():
+        queue = JobQueue(workers=1, max_depth=10)
+        queue.start()
+        order = []
+
+        async def job(name):
+            order.append(name)
+
+        for index in range(3):
+            queue.submit(job, f"a{index}", lane="a")
+        queue.submit(job, "b0", lane="b")
+        await queue.drain(timeout=5)
+        return order
+
+    assert run(main()) == ["a0", "b0", "a1", "a2"]
+
+
+def test_failed_jobs_are_counted():
+    async def main():
+        queue = JobQueue(workers=1)
+        queue.start()
+
+        async def job():
+            raise ValueError("boom")
+
+        queue.submit(job)
+        await queue.drain(timeout=5)
+        return queue.stats()
+
+    stats = run(main())
+    assert stats["failed"] == 1
+    assert stats["completed"] == 0
+
+
+def test_depth_and_lane_limits():
+    async def main():
+        queue = JobQueue(workers=1, max_depth=3, max_per_lane=2)
+        queue.start()
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        queue.submit(job, lane="busy")
+        await asyncio.sleep(0)
+        queue.submit(job, lane="a")
+        queue.submit(job, lane="a")
+        with pytest.raises(QueueFullError):
+            queue.submit(job, lane="a")
+        assert queue.can_accept("b")
+        queue.submit(job, lane="b")
+        assert not queue.can_accept("c")
+        with pytest.raises(QueueFullError):
+            queue.submit(job, lane="c")
+        rejected = queue.rejected
+        release.set()
+        await queue.drain(timeout=5)
+        return rejected
+
+    assert run(main()) == 2
+
+
+def test_weighted_jobs_count_per_slot():
+    async def main():
+        queue = JobQueue(workers=1, max_depth=10, max_per_lane=5)
+        queue.start()
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        queue.submit(job, lane="busy")
+        await asyncio.sleep(0)
+        queue.submit(job, lane="a", weight=4)
+        assert queue.depth == 4
+        assert queue.can_accept("a")
+        assert not queue.can_accept("a", weight=2)
+        with pytest.raises(QueueFullError):
+            queue.submit(job, lane="a", weight=2)
+        # Heavier than a whole lane still fits an empty one
+        queue.submit(job, lane="b", weight=50)
+        depth = queue.depth
+        release.set()
+        await queue.drain(timeout=5)
+        return depth, queue.depth
+
+    assert run(main()) == (9, 0)
+
+
+def test_drain_stops_accepting():
+    async def main():
+        queue = JobQueue(workers=1)
+        queue.start()
+        await queue.drain(timeout=1)
+
+        async def job():
+            pass
+
+        with pytest.raises(QueueFullError):
+            queue.submit(job)
+
+    run(main())
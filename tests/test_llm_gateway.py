@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from llm_gateway import LLMGateway, is_transient_error
+
+
+class ProviderError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RateLimitError(Exception):
+    pass
+
+
+@pytest.mark.parametrize("error", [
+    asyncio.TimeoutError(),
+    ConnectionResetError(),
+    ProviderError("busy", status_code=503),
+    ProviderError("slow down", status_code=429),
+    RateLimitError("quota"),
+    Exception("Error code: 529 - overloaded"),
+    Exception("upstream request timed out"),
+])
+def test_transient_errors(error):
+    assert is_transient_error(error)
+
+
+@pytest.mark.parametrize("error", [
+    ProviderError("Service unavailable in your region", status_code=400),
+    ProviderError("bad key", status_code=401),
+    Exception("Loan amount of $500 exceeds the limit"),
+    Exception("Clause 429 of the agreement"),
+    ValueError("invalid message"),
+])
+def test_permanent_errors(error):
+    assert not is_transient_error(error)
+
+
+class FlakyChat:
+    def __init__(self, failures, calls):
+        self.failures = failures
+        self.calls = calls
+
+    async def send_message(self, message):
+        self.calls.append(message)
+        if len(self.calls) <= self.failures:
+            raise ProviderError("overloaded", status_code=529)
+        return f"reply to {message}"
+
+
+def gateway(chat_factory, **options):
+    options = {"max_concurrency": 1, "rate_per_second": 1000, "burst": 1000, "backoff_base": 0.05, **options}
+    return LLMGateway(chat_factory, **options)
+
+
+def test_send_retries_transient_errors():
+    calls = []
+    llm = gateway(lambda: FlakyChat(2, calls))
+    assert asyncio.run(llm.send("hello", operation="analysis")) == "reply to hello"
+    stats = llm.stats()["operations"]["analysis"]
+    assert (len(calls), stats["calls"], stats["retries"], stats["failures"]) == (3, 1, 2, 0)
+
+
+def test_send_gives_up_on_permanent_errors():
+    class BrokenChat:
+        async def send_message(self, message):
+            raise ProviderError("bad request", status_code=400)
+
+    llm = gateway(BrokenChat)
+    with pytest.raises(ProviderError):
+        asyncio.run(llm.send("hello"))
+    assert llm.stats()["operations"]["default"]["retries"] == 0
+
+
+def test_backoff_frees_the_slot_for_other_callers():
+    async def main():
+        calls = []
+        order = []
+        llm = gateway(lambda: FlakyChat(1, calls), backoff_base=10.0)
+        llm._backoff = lambda attempt: 0.2
+
+        async def call(name):
+            await llm.send(name)
+            order.append(name)
+
+        retried = asyncio.create_task(call("first"))
+        await asyncio.sleep(0.05)
+        assert llm.in_flight == 0
+        await call("second")
+        await retried
+        return order
+
+    assert asyncio.run(main()) == ["second", "first"]
@@ -0,0 +1,65 @@
+import json
+
+from llm_parsing import AnalysisParser, extract_balanced_object, repair_json, strip_fences
+
+ANALYSIS = {
+    "document_type": "lease",
+    "summary": "A residential lease.",
+    "key_terms": [{"term": "Rent", "explanation": "Paid monthly"}],
+    "risk_assessment": {"overall_risk": "low", "risk_factors": [], "recommendations": []},
+    "fraud_indicators": [],
+    "suggested_questions": ["Who pays for repairs?"],
+    "unusual_clauses": [],
+}
+
+
+def test_strip_fences():
+    assert strip_fences('Here you go:\n```json\n{"a": 1}\n```\nThanks') == '{"a": 1}\n'
+    assert strip_fences('{"a": 1}') == '{"a": 1}'
+
+
+def test_extract_balanced_object_ignores_braces_in_strings():
+    text = 'prefix {"a": "}", "b": {"c": 1}} suffix {"d": 2}'
+    assert extract_balanced_object(text) == '{"a": "}", "b": {"c": 1}}'
+    assert extract_balanced_object("no json here") is None
+
+
+def test_repair_json():
+    broken = "{document_type: 'x', \"flag\": True, \"items\": [1, 2,], // note\n \"summary\": \"cut off"
+    repaired = json.loads(repair_json(broken.replace("'x'", '"x"')))
+    assert repaired == {"document_type": "x", "flag": True, "items": [1, 2], "summary": "cut off"}
+
+
+def test_repair_json_leaves_strings_alone():
+    text = '{"summary": "True, None, and {unquoted: keys} stay as written",}'
+    assert json.loads(repair_json(text))["summary"] == "True, None, and {unquoted: keys} stay as written"
+
+
+def test_parse_steps_are_counted():
+    parser = AnalysisParser()
+    assert parser.parse(json.dumps(ANALYSIS))["document_type"] == "lease"
+    assert parser.parse("```json\n" + json.dumps(ANALYSIS) + "\n```")["summary"] == "A residential lease."
+    assert parser.parse(json.dumps(ANALYSIS)[:-40]) is not None
+    assert parser.parse("I cannot analyze this document.") is None
+    assert parser.stats() == {
+        "direct": 1, "cleaned": 1, "repaired": 1, "retried": 0, "retry_succeeded": 0, "failed": 0,
+        "analyses_saved": 2,
+    }
+
+
+def test_payload_coerces_near_misses():
+    parser = AnalysisParser()
+    data = parser.parse(json.dumps({
+        "document_type": None,
+        "summary": ["First.", "Second."],
+        "key_terms": ["Deposit", {"term": "Rent", "explanation": None}],
+        "risk_assessment": "HIGH",
+        "fraud_indicators": "Wire transfer demanded",
+        "unusual_clauses": [{"clause": "Auto renewal"}],
+    }))
+    assert data["document_type"] == ""
+    assert data["summary"] == "First.\n\nSecond."
+    assert data["key_terms"] == [{"term": "Deposit", "explanation": ""}, {"term": "Rent", "explanation": ""}]
+    assert data["risk_assessment"]["overall_risk"] == "high"
+    assert data["fraud_indicators"] == ["Wire transfer demanded"]
+    assert data["unusual_clauses"] == ['{"clause": "Auto renewal"}']
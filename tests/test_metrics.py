@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+
+import metrics
+from metrics import Counter, Histogram, RouteMetricsMiddleware, render_gauge
+
+
+@pytest.fixture
+def registry():
+    before = list(metrics.REGISTRY)
+    yield
+    metrics.REGISTRY[:] = before
+
+
+def test_counter_sums_shards_across_threads(registry):
+    counter = Counter("test_events_total", "Events", ["kind"])
+
+    def record():
+        for _ in range(1000):
+            counter.inc("a")
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc("b", amount=2.5)
+    assert counter.collect() == {("a",): 4000.0, ("b",): 2.5}
+    assert counter.render() == [
+        "# HELP test_events_total Events",
+        "# TYPE test_events_total counter",
+        'test_events_total{kind="a"} 4000',
+        'test_events_total{kind="b"} 2.5',
+    ]
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = Histogram("test_seconds", "Latency", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, '/a"b')
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{route="/a\\"b",le="0.1"} 2',
+        'test_seconds_bucket{route="/a\\"b",le="1"} 3',
+        'test_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+        'test_seconds_sum{route="/a\\"b"} 3.65',
+        'test_seconds_count{route="/a\\"b"} 4',
+    ]
+
+
+def test_render_includes_registered_metrics_and_gauges(registry):
+    Counter("test_render_total", "Rendered").inc()
+    text = metrics.render(render_gauge("test_depth", "Depth", [], {(): 3}))
+    assert "test_render_total 1\n" in text
+    assert text.endswith("# TYPE test_depth gauge\ntest_depth 3\n")
+
+
+def test_route_middleware_labels_by_template(registry, monkeypatch):
+    histogram = Histogram("test_http_seconds", "HTTP", ["method", "route", "status"])
+    monkeypatch.setattr(metrics, "HTTP_REQUEST_DURATION", histogram)
+    app = FastAPI()
+
+    @app.get("/documents/{document_id}")
+    async def get_document(document_id: str):
+        return {"id": document_id}
+
+    wrapped = RouteMetricsMiddleware(app, routes=app.routes)
+
+    async def request(path):
+        scope = {
+            "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+            "headers": [], "http_version": "1.1", "scheme": "http", "server": ("t", 80), "root_path": "",
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        await wrapped(scope, receive, send)
+
+    async def main():
+        for path in ("/documents/1", "/documents/2", "/missing"):
+            await request(path)
+
+    asyncio.run(main())
+    counts = {labels: series[-1] for labels, series in histogram.collect().items()}
+    assert counts == {("GET", "/documents/{document_id}", "200"): 2, ("GET", "unmatched", "404"): 1}
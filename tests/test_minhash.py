@@ -0,0 +1,49 @@
+import numpy as np
+
+import minhash
+
+WORDS = [f"word{i}" for i in range(400)]
+
+
+def document(words):
+    return " ".join(words)
+
+
+def test_shingles_are_stable_and_distinct():
+    text = document(WORDS[:100])
+    first, second = minhash.shingle_hashes(text), minhash.shingle_hashes(text.upper())
+    assert np.array_equal(first, second)
+    assert first.size == 100 - minhash.SHINGLE_WORDS + 1
+
+
+def test_identical_texts_are_fully_similar():
+    text = document(WORDS[:200])
+    assert minhash.similarity(minhash.signature(text), minhash.signature(text)) == 1.0
+
+
+def test_similarity_tracks_overlap():
+    base = minhash.signature(document(WORDS[:300]))
+    near = minhash.signature(document(WORDS[:280] + [f"other{i}" for i in range(20)]))
+    far = minhash.signature(document(WORDS[300:] + [f"other{i}" for i in range(200)]))
+    assert minhash.similarity(base, near) > 0.75
+    assert minhash.similarity(base, far) < 0.1
+
+
+def test_short_texts_have_no_signature():
+    assert minhash.signature("") is None
+    assert minhash.signature("Lease agreement. Rent is due monthly.") is None
+    assert minhash.signature(document(WORDS[:minhash.MIN_SHINGLES + minhash.SHINGLE_WORDS - 1])) is not None
+
+
+def test_signature_round_trips_through_bytes():
+    sig = minhash.signature(document(WORDS))
+    assert sig.shape == (minhash.NUM_PERM,)
+    assert np.array_equal(minhash.from_bytes(minhash.to_bytes(sig)), sig)
+
+
+def test_band_keys():
+    text = document(WORDS[:200])
+    keys = minhash.band_keys(minhash.signature(text))
+    assert len(keys) == minhash.BANDS
+    assert keys == minhash.band_keys(minhash.signature(text))
+    assert [key.split(":")[0] for key in keys] == [str(band) for band in range(minhash.BANDS)]
@@ -0,0 +1,33 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from indexes import INDEX_SPECS, ensure_indexes, explain_route_queries
+
+# Explain output only means something against a real server; mongomock has no planner
+MONGO_URL = os.environ.get("TEST_MONGO_URL")
+
+pytestmark = pytest.mark.skipif(not MONGO_URL, reason="TEST_MONGO_URL is not set")
+
+
+def test_route_queries_use_indexes():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def main():
+        client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=5000)
+        name = f"test_query_plans_{uuid.uuid4().hex[:8]}"
+        try:
+            db = client[name]
+            report = await ensure_indexes(db, INDEX_SPECS)
+            assert not report["failed"]
+            return await explain_route_queries(db)
+        finally:
+            await client.drop_database(name)
+            client.close()
+
+    plans = asyncio.run(main())
+    assert plans
+    scans = {route: stages for route, stages in plans.items() if "COLLSCAN" in stages}
+    assert not scans, f"Route queries without an index: {scans}"
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import ratelimit
+from ratelimit import FairSemaphore, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_spends_and_refills(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4)
+    assert all(bucket.try_acquire() for _ in range(4))
+    assert not bucket.try_acquire()
+    assert bucket.seconds_until_available() == pytest.approx(0.5)
+    clock[0] += 1.0
+    assert bucket.try_acquire(2)
+    assert not bucket.try_acquire()
+
+
+def test_token_bucket_caps_refill_and_refund(clock):
+    bucket = TokenBucket(rate=1.0, capacity=3)
+    bucket.try_acquire(3)
+    clock[0] += 100
+    bucket._refill()
+    assert bucket.tokens == 3
+    bucket.refund(5)
+    assert bucket.tokens == 3
+
+
+def test_token_bucket_acquire_waits():
+    async def main():
+        bucket = TokenBucket(rate=100.0, capacity=1)
+        await bucket.acquire()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await bucket.acquire()
+        return loop.time() - started
+
+    assert asyncio.run(main()) >= 0.005
+
+
+def test_fair_semaphore_serves_keys_in_turn():
+    async def main():
+        semaphore = FairSemaphore(1)
+        order = []
+
+        async def worker(key, index):
+            await semaphore.acquire(key)
+            order.append(f"{key}{index}")
+            await asyncio.sleep(0)
+            semaphore.release()
+
+        await semaphore.acquire("holder")
+        tasks = [asyncio.create_task(worker("a", i)) for i in range(3)]
+        tasks.append(asyncio.create_task(worker("b", 0)))
+        await asyncio.sleep(0)
+        assert semaphore.waiting == 4
+        semaphore.release()
+        await asyncio.gather(*tasks)
+        return order, semaphore.in_use
+
+    order, in_use = asyncio.run(main())
+    assert order == ["a0", "b0", "a1", "a2"]
+    assert in_use == 0
+
+
+def test_fair_semaphore_cancelled_waiter_gives_up_its_place():
+    async def main():
+        semaphore = FairSemaphore(1)
+        await semaphore.acquire()
+        waiter = asyncio.create_task(semaphore.acquire("a"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        semaphore.release()
+        return semaphore.waiting, semaphore.in_use
+
+    assert asyncio.run(main()) == (0, 0)
@@ -0,0 +1,210 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from reanalysis import ReanalysisJobRunning, ReanalysisJobs
+
+TARGET = {"prompt_version": "2", "model": "m"}
+
+
+def database():
+    return AsyncMongoMockClient().test
+
+
+async def seed(db, count=6):
+    await db.document_analyses.insert_many(
+        [{"document_id": f"d{i}", "prompt_version": "1", "model": "m"} for i in range(count)]
+        # Analyses stored before they were stamped
+        + [{"document_id": "legacy"}]
+        + [{"document_id": "current", **TARGET}]
+        + [{"document_id": "fast", "prompt_version": "1", "model": "m", "analysis_mode": "fast"}]
+    )
+
+
+def jobs_for(db, reanalyze, **options):
+    options = {"batch_size": 2, "pause_seconds": 0, **options}
+    return ReanalysisJobs(db.reanalysis_jobs, db.document_analyses, reanalyze, target=TARGET, **options)
+
+
+async def wait_for(predicate, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not await predicate():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_stale_versions_include_unstamped_analyses():
+    async def main():
+        db = database()
+        await seed(db)
+        return await jobs_for(db, None).stale_versions()
+
+    versions = asyncio.run(main())
+    assert sorted(versions, key=str) == sorted(
+        [{"prompt_version": "1", "model": "m"}, {"prompt_version": None, "model": None}], key=str
+    )
+
+
+def test_job_visits_every_stale_full_analysis_once():
+    async def main():
+        db = database()
+        await seed(db)
+        seen = []
+
+        async def reanalyze(analysis):
+            seen.append(analysis["document_id"])
+            return "cached" if analysis["document_id"] == "legacy" else "reanalyzed"
+
+        jobs = jobs_for(db, reanalyze)
+        job = await jobs.start("admin")
+        await wait_for(lambda: _status(jobs, job["id"], "completed"))
+        return seen, await jobs.get(job["id"])
+
+    seen, job = asyncio.run(main())
+    assert sorted(seen) == [f"d{i}" for i in range(6)] + ["legacy"]
+    assert job["total"] == 7
+    assert (job["reanalyzed"], job["cached"], job["failed"], job["processed"]) == (6, 1, 0, 7)
+    assert job["lease_expires_at"] is None
+
+
+def test_failures_are_recorded_and_the_job_goes_on():
+    async def main():
+        db = database()
+        await seed(db, count=3)
+
+        async def reanalyze(analysis):
+            if analysis["document_id"] == "d1":
+                raise ValueError("unparseable")
+            return "reanalyzed"
+
+        jobs = jobs_for(db, reanalyze)
+        job = await jobs.start("admin")
+        await wait_for(lambda: _status(jobs, job["id"], "completed"))
+        return await jobs.get(job["id"])
+
+    job = asyncio.run(main())
+    assert job["failed"] == 1
+    assert job["errors"] == [{"document_id": "d1", "error": "unparseable"}]
+
+
+async def _status(jobs, job_id, status):
+    job = await jobs.get(job_id)
+    return job["status"] == status
+
+
+def test_only_one_job_runs_across_processes():
+    async def main():
+        db = database()
+        await seed(db)
+        gate = asyncio.Event()
+
+        async def reanalyze(analysis):
+            await gate.wait()
+            return "reanalyzed"
+
+        first, second = jobs_for(db, reanalyze), jobs_for(db, reanalyze)
+        job = await first.start("admin")
+        with pytest.raises(ReanalysisJobRunning):
+            await second.start("admin")
+        gate.set()
+        await wait_for(lambda: _status(first, job["id"], "completed"))
+        # Finished jobs no longer block a new one
+        again = await second.start("admin")
+        await wait_for(lambda: _status(second, again["id"], "completed"))
+        return job, again
+
+    job, again = asyncio.run(main())
+    assert again["id"] != job["id"]
+
+
+def test_interrupted_job_resumes_after_its_checkpoint_in_one_process():
+    async def main():
+        db = database()
+        await seed(db)
+        seen = []
+        gate = asyncio.Event()
+
+        async def reanalyze(analysis):
+            seen.append(analysis["document_id"])
+            if len(seen) > 2:
+                await gate.wait()
+            return "reanalyzed"
+
+        crashed = jobs_for(db, reanalyze)
+        job = await crashed.start("admin")
+        await wait_for(lambda: _checkpointed(db, job["id"]))
+        # The process stops; on shutdown its lease is released for the others
+        await crashed.stop()
+        gate.set()
+        resumed_seen = len(seen)
+
+        survivors = [jobs_for(db, reanalyze), jobs_for(db, reanalyze)]
+        await asyncio.gather(*(survivor.resume() for survivor in survivors))
+        runners = [survivor.stats()["running"] for survivor in survivors]
+        await wait_for(lambda: _status(survivors[0], job["id"], "completed"))
+        return seen, resumed_seen, runners, await survivors[0].get(job["id"])
+
+    seen, resumed_seen, runners, job = asyncio.run(main())
+    assert sorted(runners, key=len) == [[], [job["id"]]]
+    # The batch in flight at the stop is redone; nothing before the checkpoint is
+    assert sorted(seen[resumed_seen:]) == sorted(set(seen[resumed_seen:]))
+    assert seen[:2] == ["d0", "d1"] and "d0" not in seen[2:] and "d1" not in seen[2:]
+    assert job["processed"] == 7
+
+
+async def _checkpointed(db, job_id):
+    job = await db.reanalysis_jobs.find_one({"id": job_id})
+    return job["last_document_id"] is not None
+
+
+def test_jobs_for_another_target_are_superseded():
+    async def main():
+        db = database()
+        await db.reanalysis_jobs.insert_one({
+            "id": "old", "status": "running", "target": {"prompt_version": "1", "model": "m"},
+            "last_document_id": None, "lease_expires_at": None,
+        })
+        jobs = jobs_for(db, None)
+        await jobs.resume()
+        return await db.reanalysis_jobs.find_one({"id": "old"}), jobs.stats()["running"]
+
+    job, running = asyncio.run(main())
+    assert job["status"] == "superseded"
+    assert running == []
+
+
+def test_cancel_from_another_process_stops_the_run():
+    async def main():
+        db = database()
+        await seed(db)
+
+        async def reanalyze(analysis):
+            await asyncio.sleep(0.02)
+            return "reanalyzed"
+
+        owner, other = jobs_for(db, reanalyze, lease_seconds=0.15), jobs_for(db, reanalyze, lease_seconds=0.15)
+        job = await owner.start("admin")
+        cancelled = await other.cancel(job["id"])
+        await wait_for(lambda: _stopped(owner))
+        return cancelled, await owner.get(job["id"])
+
+    cancelled, job = asyncio.run(main())
+    assert cancelled["status"] == job["status"] == "cancelled"
+    assert job["processed"] < job["total"]
+
+
+async def _stopped(jobs):
+    return not jobs.stats()["running"]
+
+
+def test_progress_estimates():
+    job = {
+        "status": "running", "total": 10, "reanalyzed": 3, "cached": 1, "skipped": 0, "failed": 0,
+        "elapsed_seconds": 8.0,
+    }
+    progress = ReanalysisJobs.progress(job)
+    assert (progress["processed"], progress["remaining"]) == (4, 6)
+    assert progress["throughput_per_minute"] == 30.0
+    assert progress["eta_seconds"] == 12
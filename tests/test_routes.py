@@ -0,0 +1,233 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+from backend_benchmark import FakeLlmChat, stub_llm_sdk
+
+MAX_UPLOAD_BYTES = 4096
+UPLOAD_BURST = 4
+
+CONTRACT = (
+    "LOAN AGREEMENT\n"
+    "The Borrower shall repay the principal amount together with interest at the rate stated above.\n"
+    "Any dispute shall be resolved by binding arbitration.\n"
+)
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """The app against an in-memory Mongo and a fake model, inside one lifespan for the whole module.
+
+    The lifespan shuts down module-level executors, so it cannot be entered twice in a process.
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        from mongomock_motor import AsyncMongoMockClient
+        import motor.motor_asyncio
+
+        patch.setattr(motor.motor_asyncio, "AsyncIOMotorClient", lambda *args, **kwargs: AsyncMongoMockClient())
+        for name, value in {
+            "MONGO_URL": "mongodb://localhost:27017",
+            "DB_NAME": f"test_routes_{uuid.uuid4().hex[:8]}",
+            "BLOB_STORE_DIR": str(tmp_path_factory.mktemp("blobs")),
+            "MAX_UPLOAD_BYTES": str(MAX_UPLOAD_BYTES),
+            "UPLOAD_BURST_PER_USER": str(UPLOAD_BURST),
+            # Slow enough that no token comes back during a test
+            "UPLOAD_RATE_PER_USER": "0.0001",
+            "LLM_RATE_PER_SECOND": "10000",
+            "LLM_BURST": "10000",
+            "BLOB_GC_INTERVAL": "0",
+        }.items():
+            patch.setenv(name, value)
+        stub_llm_sdk()
+        import server
+
+        server.llm_gateway.chat_factory = lambda: FakeLlmChat(latency=0.01, jitter=0.0)
+        loop = asyncio.new_event_loop()
+        lifespan = server.app.router.lifespan_context(server.app)
+        loop.run_until_complete(lifespan.__aenter__())
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test/api")
+        try:
+            yield Api(loop, client, server)
+        finally:
+            loop.run_until_complete(client.aclose())
+            loop.run_until_complete(lifespan.__aexit__(None, None, None))
+            loop.close()
+
+
+class Api:
+    def __init__(self, loop, client, server):
+        self.loop = loop
+        self.client = client
+        self.server = server
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def request(self, method, url, **kwargs):
+        return self.run(self.client.request(method, url, **kwargs))
+
+    def register(self):
+        response = self.request(
+            "POST", "/auth/register", json={"email": f"{uuid.uuid4().hex[:12]}@example.com", "password": "pw"}
+        )
+        body = response.json()
+        return body["user_id"], {"Authorization": f"Bearer {body['access_token']}"}
+
+    def upload(self, headers, content=CONTRACT, filename="loan.txt", content_type="text/plain"):
+        files = {"file": (filename, content.encode() if isinstance(content, str) else content, content_type)}
+        return self.request("POST", "/documents/upload", files=files, headers=headers)
+
+    def wait_for_analysis(self, document_id, headers, timeout=10.0):
+        async def wait():
+            deadline = self.loop.time() + timeout
+            while True:
+                response = await self.client.get(f"/documents/{document_id}/status", headers=headers)
+                if response.json()["analysis_status"] in ("completed", "failed"):
+                    return response.json()
+                assert self.loop.time() < deadline
+                await asyncio.sleep(0.02)
+
+        return self.run(wait())
+
+    def user_tokens(self, user_id):
+        return self.server.upload_admission._user_bucket(user_id).tokens
+
+
+def test_upload_is_accepted_and_analyzed(api):
+    _, headers = api.register()
+    response = api.upload(headers)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["analysis_status"] == "pending"
+
+    status = api.wait_for_analysis(body["document_id"], headers)
+    assert status["analysis_status"] == "completed"
+
+    response = api.request("GET", f"/documents/{body['document_id']}/analysis", headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["document"]["id"] == body["document_id"]
+    assert result["analysis"]["summary"]
+
+
+def test_other_users_cannot_read_a_document(api):
+    _, owner = api.register()
+    _, other = api.register()
+    document_id = api.upload(owner).json()["document_id"]
+    assert api.request("GET", f"/documents/{document_id}/status", headers=other).status_code == 404
+    assert api.request("GET", f"/documents/{document_id}/analysis", headers=other).status_code == 404
+
+
+def test_analysis_revalidates_with_etag(api):
+    _, headers = api.register()
+    document_id = api.upload(headers).json()["document_id"]
+    api.wait_for_analysis(document_id, headers)
+
+    first = api.request("GET", f"/documents/{document_id}/analysis", headers=headers)
+    etag = first.headers["etag"]
+    repeat = api.request("GET", f"/documents/{document_id}/analysis", headers={**headers, "If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == etag
+
+    stale = api.request("GET", f"/documents/{document_id}/analysis", headers={**headers, "If-None-Match": '"old"'})
+    assert stale.status_code == 200
+    assert stale.content == first.content
+
+
+def test_document_list_revalidates_until_a_document_changes(api):
+    _, headers = api.register()
+    document_id = api.upload(headers).json()["document_id"]
+    api.wait_for_analysis(document_id, headers)
+
+    etag = api.request("GET", "/documents", headers=headers).headers["etag"]
+    assert api.request("GET", "/documents", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    api.upload(headers, content=CONTRACT + "Schedule A\n")
+    response = api.request("GET", "/documents", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()["documents"]) == 2
+
+
+def test_oversize_upload_is_rejected_without_spending_quota(api):
+    user_id, headers = api.register()
+    response = api.upload(headers, content=b"x" * (MAX_UPLOAD_BYTES * 4))
+    assert response.status_code == 413
+    assert api.user_tokens(user_id) == pytest.approx(UPLOAD_BURST)
+
+
+def test_unsupported_upload_is_refunded(api):
+    user_id, headers = api.register()
+    response = api.upload(headers, filename="loan.exe", content_type="application/octet-stream")
+    assert response.status_code == 400
+    assert api.user_tokens(user_id) == pytest.approx(UPLOAD_BURST)
+
+
+def test_uploads_over_the_user_quota_get_429(api):
+    _, headers = api.register()
+    for i in range(UPLOAD_BURST):
+        assert api.upload(headers, content=f"{CONTRACT}Copy {i}\n").status_code == 202
+    response = api.upload(headers, content=f"{CONTRACT}One too many\n")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+    # Other users keep their own quota
+    _, other = api.register()
+    assert api.upload(other).status_code == 202
+
+
+def test_batch_is_charged_per_accepted_file(api):
+    user_id, headers = api.register()
+    files = [
+        ("files", ("a.txt", f"{CONTRACT}A\n".encode(), "text/plain")),
+        ("files", ("b.txt", f"{CONTRACT}B\n".encode(), "text/plain")),
+        ("files", ("c.exe", b"MZ", "application/octet-stream")),
+    ]
+    response = api.request("POST", "/documents/batch", files=files, headers=headers)
+    assert response.status_code == 202
+    body = response.json()
+    assert (body["total"], body["accepted"]) == (3, 2)
+    assert api.user_tokens(user_id) == pytest.approx(UPLOAD_BURST - 2)
+
+    for document in body["files"][:2]:
+        api.wait_for_analysis(document["document_id"], headers)
+    batch = api.request("GET", f"/documents/batch/{body['batch_id']}", headers=headers).json()
+    assert batch["status_counts"] == {"completed": 2, "rejected": 1}
+
+
+def test_batch_over_the_user_quota_is_refunded(api):
+    user_id, headers = api.register()
+    files = [("files", (f"{i}.txt", f"{CONTRACT}{i}\n".encode(), "text/plain")) for i in range(UPLOAD_BURST + 1)]
+    api.upload(headers)
+    response = api.request("POST", "/documents/batch", files=files, headers=headers)
+    assert response.status_code == 429
+    assert api.user_tokens(user_id) == pytest.approx(UPLOAD_BURST - 1)
+
+
+def test_identical_upload_reuses_the_analysis(api):
+    _, headers = api.register()
+    first = api.upload(headers).json()
+    api.wait_for_analysis(first["document_id"], headers)
+    second = api.upload(headers).json()
+    assert second["analysis_status"] == "completed"
+
+    analyses = api.request(
+        "POST", "/documents/analyses", json={"document_ids": [first["document_id"], second["document_id"]]},
+        headers=headers
+    ).json()
+    summaries = {result["analysis"]["summary"] for result in analyses["results"]}
+    assert len(analyses["results"]) == 2 and len(summaries) == 1
+
+
+def test_events_token_only_opens_the_event_stream(api):
+    _, headers = api.register()
+    response = api.request("POST", "/documents/events/token", headers=headers)
+    assert response.status_code == 200
+    token = response.json()["token"]
+
+    assert api.request("GET", "/documents", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    assert api.request("GET", "/documents/events", params={"token": "forged"}).status_code == 401
+    bearer = headers["Authorization"].split()[1]
+    assert api.request("GET", "/documents/events", params={"token": bearer}).status_code == 401
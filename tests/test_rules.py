@@ -0,0 +1,53 @@
+from rules import RULES, RULES_VERSION, classify_document, compile_rules, finding_labels, scan_text
+
+
+def test_scan_finds_each_rule_once_with_counts():
+    text = (
+        "Payment must be made by wire transfer of the funds. Act now! "
+        "Any dispute is settled by binding arbitration. Another binding arbitration clause applies."
+    )
+    scan = scan_text(text)
+    assert scan["version"] == RULES_VERSION
+    findings = {finding["rule_id"]: finding for finding in scan["findings"]}
+    assert set(findings) == {"wire_transfer_demand", "pressure_tactics", "arbitration_waiver"}
+    assert findings["arbitration_waiver"]["count"] == 2
+    assert scan["risk"] == "high"
+    assert text[findings["arbitration_waiver"]["start"]:].lower().startswith("binding arbitration")
+
+
+def test_scan_is_case_insensitive():
+    scan = scan_text("THIS LEASE RENEWS AUTOMATICALLY EACH YEAR.")
+    assert [finding["rule_id"] for finding in scan["findings"]] == ["auto_renewal"]
+    assert scan["risk"] == "medium"
+
+
+def test_scan_offsets_survive_length_changing_lowercase():
+    # "İ" lowercases to two characters
+    text = "İİİ The loan ends with a balloon payment."
+    finding = scan_text(text)["findings"][0]
+    assert text[finding["start"]:finding["start"] + len("balloon payment")] == "balloon payment"
+
+
+def test_scan_clean_text():
+    assert scan_text("The parties agree to the terms below.") == {"version": RULES_VERSION, "risk": "low", "findings": []}
+
+
+def test_every_rule_has_a_named_group():
+    matcher = compile_rules(RULES)
+    assert set(matcher.groupindex) == {rule["id"] for rule in RULES}
+
+
+def test_classify_document():
+    assert classify_document("The Tenant shall pay rent to the Landlord for the premises.") == "lease"
+    assert classify_document("The Borrower repays the principal to the Lender.") == "loan"
+    assert classify_document("Hello world.") == "unknown"
+
+
+def test_finding_labels():
+    scan = scan_text("Guaranteed approval. Includes a prepayment penalty.")
+    assert finding_labels(scan, "fraud") == [
+        'Promises guaranteed approval or no credit check: "Guaranteed approval. Includes a prepayment penalty."'
+    ]
+    assert finding_labels(scan, "unusual") == [
+        'Charges a penalty for paying off early: "Guaranteed approval. Includes a prepayment penalty."'
+    ]
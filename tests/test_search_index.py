@@ -0,0 +1,122 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from search_index import SearchIndex, UserIndex, snippet, tokenize
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("The Tenant shall pay THE rent, in 2024.") == ["tenant", "pay", "rent", "2024"]
+
+
+def test_bm25_prefers_weighted_fields_and_rarer_terms():
+    index = UserIndex()
+    index.add("a", {"filename": "arbitration.txt", "text": "rent"}, {})
+    index.add("b", {"text": "arbitration clause and rent"}, {})
+    index.add("c", {"text": "rent rent"}, {})
+    top, total = index.search(["arbitration"], limit=10)
+    assert [doc_id for doc_id, _ in top] == ["a", "b"]
+    assert total == 2
+    top, total = index.search(["rent", "arbitration"], limit=1)
+    assert len(top) == 1 and total == 3
+
+
+def test_replacing_and_removing_touch_only_the_document():
+    index = UserIndex()
+    index.add("a", {"text": "alpha beta"}, {})
+    index.add("b", {"text": "beta gamma"}, {})
+    assert index.posting_count == 4
+    index.add("a", {"text": "delta"}, {})
+    assert sorted(index.postings) == ["beta", "delta", "gamma"]
+    assert index.posting_count == 3
+    index.remove("b")
+    index.remove("missing")
+    assert sorted(index.postings) == ["delta"]
+    assert index.posting_count == 1
+    assert index.total_length == index.lengths["a"]
+    assert set(index.terms) == set(index.documents) == {"a"}
+
+
+def test_snippet_highlights_matches():
+    text = "Preamble. " * 20 + "Any dispute goes to binding arbitration in Delaware."
+    found = snippet(text, ["arbitration", "dispute"], width=60)
+    assert found["text"].startswith("…")
+    for start, end in found["highlights"]:
+        assert found["text"][start:end].lower() in ("arbitration", "dispute")
+    assert snippet(text, ["absent"]) is None
+
+
+def documents_loader(store):
+    async def loader(user_id):
+        for doc_id, fields in list(store.get(user_id, {}).items()):
+            await asyncio.sleep(0)
+            yield doc_id, fields, {"filename": f"{doc_id}.txt"}
+    return loader
+
+
+def test_search_loads_once_and_applies_updates():
+    async def main():
+        store = {"alice": {"1": {"summary": "Binding arbitration.", "text": "binding arbitration"}}}
+        index = SearchIndex(documents_loader(store))
+        first = await index.search("alice", "arbitration")
+        store["alice"]["2"] = {"text": "arbitration again"}
+        await index.update("alice", "2", store["alice"]["2"], {"filename": "2.txt"})
+        second = await index.search("alice", "arbitration")
+        # Users whose index is not loaded pick documents up on load
+        await index.update("bob", "3", {"text": "arbitration"}, {})
+        return index, first, second
+
+    index, first, second = asyncio.run(main())
+    assert first["total"] == 1 and first["results"][0]["filename"] == "1.txt"
+    # Body text is not kept in memory, so snippets come from the stored fields
+    assert first["results"][0]["snippet"]["field"] == "summary"
+    assert second["total"] == 2
+    assert index.stats()["loads"] == 1
+    assert index.stats()["loaded_users"] == 1
+
+
+def test_concurrent_first_searches_share_one_load():
+    async def main():
+        store = {"alice": {str(i): {"text": f"clause {i}"} for i in range(20)}}
+        index = SearchIndex(documents_loader(store))
+        await asyncio.gather(*(index.search("alice", "clause") for _ in range(5)))
+        return index
+
+    assert asyncio.run(main()).loads == 1
+
+
+def test_eviction_by_users_and_postings():
+    async def main():
+        store = {user: {"1": {"text": "one two three four"}} for user in ("a", "b", "c")}
+        by_users = SearchIndex(documents_loader(store), max_users=2)
+        by_postings = SearchIndex(documents_loader(store), max_postings=6)
+        for user in ("a", "b", "c"):
+            await by_users.search(user, "one")
+            await by_postings.search(user, "one")
+        return list(by_users._users), list(by_postings._users)
+
+    by_users, by_postings = asyncio.run(main())
+    assert by_users == ["b", "c"]
+    assert by_postings == ["c"]
+
+
+def test_version_stamps_keep_processes_in_step():
+    async def main():
+        stamps = AsyncMongoMockClient().test.search_index_versions
+        store = {"alice": {"1": {"text": "alpha"}}}
+        first = SearchIndex(documents_loader(store), stamps=stamps)
+        second = SearchIndex(documents_loader(store), stamps=stamps)
+        await first.search("alice", "alpha")
+        await second.search("alice", "alpha")
+        # Stored and applied by the first process only
+        store["alice"]["2"] = {"text": "alpha beta"}
+        await first.update("alice", "2", store["alice"]["2"], {})
+        seen_by_first = await first.search("alice", "beta")
+        seen_by_second = await second.search("alice", "beta")
+        return first, second, seen_by_first, seen_by_second
+
+    first, second, seen_by_first, seen_by_second = asyncio.run(main())
+    assert seen_by_first["total"] == seen_by_second["total"] == 1
+    assert first.stats()["reloads"] == 0 and first.stats()["loads"] == 1
+    assert second.stats()["reloads"] == 1 and second.stats()["loads"] == 2
+    assert first.index_specs()[0]["unique"]
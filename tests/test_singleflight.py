@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "letter"
+
+        results = await asyncio.gather(*(flights.run("key", work) for _ in range(5)))
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["letter"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+    assert flights.coalesced == 4
+    assert flights._inflight == {}
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flights = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0)
+            return value
+
+        return await asyncio.gather(flights.run("a", lambda: work(1)), flights.run("b", lambda: work(2)))
+
+    assert asyncio.run(main()) == [(1, False), (2, False)]
+
+
+def test_failure_reaches_every_caller_and_is_not_kept():
+    async def main():
+        flights = SingleFlight()
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("model error")
+
+        results = await asyncio.gather(*(flights.run("key", failing) for _ in range(3)), return_exceptions=True)
+        # The next call runs again rather than replaying the failure
+        retried = await flights.run("key", lambda: asyncio.sleep(0, result="ok"))
+        return results, attempts, retried
+
+    results, attempts, retried = asyncio.run(main())
+    assert len(attempts) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == ("ok", False)
+
+
+def test_cancelled_leader_cancels_followers():
+    async def main():
+        flights = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        leader = asyncio.create_task(flights.run("key", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.run("key", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return flights
+
+    assert asyncio.run(main())._inflight == {}